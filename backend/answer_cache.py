@@ -0,0 +1,87 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from backend.bm25 import BM25_ENCODER_PATH
+from backend.manifest import MANIFEST_PATH
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return _WHITESPACE.sub(" ", question).strip().rstrip("?!. ").casefold()
+
+
+def corpus_version() -> Tuple[float, float]:
+    """
+    Identify the indexed corpus by the modification times of the BM25 encoder
+    and the index manifest, which the indexing job rewrites on every rebuild.
+    """
+    version = []
+    for path in (BM25_ENCODER_PATH, MANIFEST_PATH):
+        try:
+            version.append(os.stat(path).st_mtime)
+        except FileNotFoundError:
+            version.append(0.0)
+    return tuple(version)
+
+
+class AnswerCache:
+    """
+    LRU cache of streamed answers, stored as the list of chunks so a hit can
+    be replayed frame by frame. Entries expire after ``ttl`` seconds or when
+    the corpus version they were produced against changes. ``scope`` keeps
+    answers to the same question in different modes or under different
+    search filters apart.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple, Tuple[float, object, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question: str, version: object = None, scope: Hashable = None) -> Optional[List[str]]:
+        key = (scope, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_version, chunks = entry
+                if expires_at > self._clock() and entry_version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return chunks
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, chunks: List[str], version: object = None, scope: Hashable = None) -> None:
+        key = (scope, normalize_question(question))
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, version, list(chunks))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,192 @@
+"""
+Answer many questions in one run, for offline evaluation and reports.
+
+    python -m backend.batch questions.jsonl --output answers.jsonl
+    python -m backend.batch questions.jsonl --url http://localhost:8000 --concurrency 4
+
+Each input line is an ``/ask`` request body (``question`` and optionally
+``mode``, ``filters`` and an ``id`` echoed back in the result). The results
+are written as JSON lines in the order the answers finish. Without
+``--url`` the questions are answered in this process, otherwise they are
+sent to a running server's ``/ask/batch`` endpoint.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from backend import metrics
+from backend.answer_cache import corpus_version
+from backend.filters import filter_key
+from backend.generator import generate_chat, generate_direct, resolve_mode
+from backend.retreiver import request_filters, retrieve_many
+from backend.schemas import BatchQuestion
+
+# Answers generated at once; a request may ask for fewer
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+# Vector queries in flight at once while retrieving for a batch
+BATCH_RETRIEVAL_CONCURRENCY = int(os.getenv("BATCH_RETRIEVAL_CONCURRENCY", "16"))
+
+logger = logging.getLogger(__name__)
+
+
+async def answer_batch(
+    questions: List[BatchQuestion],
+    concurrency: Optional[int] = None,
+    answer_cache: Any = None,
+) -> AsyncIterator[Dict]:
+    """
+    Answer ``questions`` and yield one result per question as it finishes.
+
+    The questions answered in direct mode are retrieved together up front:
+    their queries are embedded in batched calls and the vector queries run
+    concurrently, ``BATCH_RETRIEVAL_CONCURRENCY`` at a time. In agent mode
+    the model writes its own search queries while answering, so those
+    questions are not retrieved up front and each embeds its queries on its
+    own. Generation then
+    runs for at most ``concurrency`` questions at a time. A failed question
+    yields a result with an ``error`` and is not cached.
+    """
+    concurrency = min(concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    modes = [resolve_mode(q.mode) for q in questions]
+    version = corpus_version() if answer_cache is not None else None
+
+    cached = {}
+    if answer_cache is not None:
+        for i, q in enumerate(questions):
+            chunks = answer_cache.get(q.question, version, (modes[i], filter_key(q.filters)))
+            if chunks is not None:
+                cached[i] = chunks
+
+    direct = [i for i, mode in enumerate(modes) if mode == "direct" and i not in cached]
+    retrieval = None
+    if direct:
+        retrieval = asyncio.create_task(retrieve_many(
+            [questions[i].question for i in direct], [questions[i].filters for i in direct],
+            BATCH_RETRIEVAL_CONCURRENCY,
+        ))
+    position = {i: n for n, i in enumerate(direct)}
+
+    async def answer(i: int) -> Dict:
+        question = questions[i]
+        request_filters.set(question.filters)
+        timings = metrics.start_timings()
+        start = time.perf_counter()
+        result = {"index": i, "id": question.id, "question": question.question, "mode": modes[i]}
+        try:
+            if i in cached:
+                chunks, result["source"] = cached[i], "cache"
+            else:
+                documents = None
+                if i in position:
+                    with metrics.span("retrieval"):
+                        documents = (await retrieval)[position[i]]
+                queued = time.perf_counter()
+                async with semaphore:
+                    timings["queued"] = time.perf_counter() - queued
+                    stream = generate_direct(question.question, documents) if modes[i] == "direct" \
+                        else generate_chat(question.question)
+                    chunks = [chunk async for chunk in stream]
+                if answer_cache is not None and chunks:
+                    answer_cache.put(question.question, chunks, version, (modes[i], filter_key(question.filters)))
+                result["source"] = "generated"
+            result["answer"] = "".join(chunks)
+        except Exception as e:
+            logger.error(f"✗ Batch question {i} failed: {str(e)}")
+            result["error"] = str(e)
+        timings["total"] = time.perf_counter() - start
+        result["timings_ms"] = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+        return result
+
+    tasks = [asyncio.create_task(answer(i)) for i in range(len(questions))]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The client went away or the caller stopped reading: stop the rest
+        for task in tasks:
+            task.cancel()
+        if retrieval is not None:
+            retrieval.cancel()
+
+
+def load_questions(path: str) -> List[BatchQuestion]:
+    """Read ``/ask`` request bodies, one JSON object per line (``-`` reads stdin)."""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [BatchQuestion.model_validate_json(line) for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+async def answer_locally(questions: List[BatchQuestion], concurrency: Optional[int]) -> AsyncIterator[Dict]:
+    from backend.resources import aclose_resources, load_resources
+
+    await asyncio.to_thread(load_resources)
+    try:
+        async for result in answer_batch(questions, concurrency):
+            yield result
+    finally:
+        await aclose_resources()
+
+
+async def answer_remotely(
+    questions: List[BatchQuestion], concurrency: Optional[int], url: str
+) -> AsyncIterator[Dict]:
+    import httpx
+
+    body = {"questions": [q.model_dump(mode="json", exclude_none=True) for q in questions]}
+    if concurrency:
+        body["concurrency"] = concurrency
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        async with client.stream("POST", "/ask/batch", json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+async def run(args) -> int:
+    questions = load_questions(args.input)
+    if args.url:
+        results = answer_remotely(questions, args.concurrency, args.url.rstrip("/"))
+    else:
+        results = answer_locally(questions, args.concurrency)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    errors = 0
+    try:
+        async for result in results:
+            errors += "error" in result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    logger.info(
+        f"{'✗' if errors else '✓'} Answered {len(questions) - errors}/{len(questions)} questions "
+        f"in {time.perf_counter() - start:.1f} s"
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="JSONL file of /ask request bodies, or - for stdin")
+    parser.add_argument("--output", default=None, help="Write the results here instead of stdout")
+    parser.add_argument("--url", default=None, help="Send the batch to this server's /ask/batch")
+    parser.add_argument(
+        "--concurrency", type=int, default=None,
+        help=f"Answers generated at once (at most BATCH_CONCURRENCY, {BATCH_CONCURRENCY})",
+    )
+    sys.exit(asyncio.run(run(parser.parse_args())))
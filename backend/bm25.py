@@ -0,0 +1,410 @@
+import json
+import os
+import struct
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
+
+import mmh3
+import numpy as np
+
+if TYPE_CHECKING:
+    from pinecone_text.sparse import SparseVector
+    from pinecone_text.sparse.bm25_tokenizer import BM25Tokenizer
+
+BM25_ENCODER_PATH = "backend/bm25_encoder.bin"
+# JSON dump written by pinecone_text's BM25Encoder before the binary format
+LEGACY_BM25_ENCODER_PATH = "backend/bm25_encoder.json"
+
+MAGIC = b"BM25BIN1"
+TOKEN_CACHE_LIMIT = 1_000_000
+
+_DROPPED = -1
+
+
+def _tokenizer_module():
+    # Importing pinecone_text's tokenizer loads NLTK (and SciPy), so it is
+    # deferred until the first text is encoded
+    from pinecone_text.sparse import bm25_tokenizer
+    return bm25_tokenizer
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+@dataclass
+class BM25Stats:
+    """
+    Corpus statistics BM25 is fitted from. Statistics of disjoint shards of a
+    corpus add up to those of the whole corpus, and subtracting a shard's
+    statistics removes it again.
+    """
+    indices: np.ndarray      # sorted uint32 token hashes
+    doc_freq: np.ndarray     # int64 document frequency per token
+    n_docs: int = 0
+    sum_doc_len: int = 0
+
+    @classmethod
+    def empty(cls) -> "BM25Stats":
+        return cls(np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def from_counter(cls, doc_freq: Dict[int, int], n_docs: int, sum_doc_len: int) -> "BM25Stats":
+        indices = np.fromiter(doc_freq.keys(), dtype=np.uint32, count=len(doc_freq))
+        values = np.fromiter(doc_freq.values(), dtype=np.int64, count=len(doc_freq))
+        order = np.argsort(indices)
+        return cls(indices[order], values[order], n_docs, sum_doc_len)
+
+    @property
+    def avgdl(self) -> float:
+        return self.sum_doc_len / self.n_docs if self.n_docs else 0.0
+
+    def __add__(self, other: "BM25Stats") -> "BM25Stats":
+        return merge_stats([self, other])
+
+    def __sub__(self, other: "BM25Stats") -> "BM25Stats":
+        negated = BM25Stats(other.indices, -other.doc_freq, -other.n_docs, -other.sum_doc_len)
+        result = merge_stats([self, negated])
+        if result.n_docs < 0 or result.sum_doc_len < 0 or (result.doc_freq < 0).any():
+            raise ValueError("Subtracted statistics are not part of these statistics")
+        return result
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            indices=self.indices,
+            doc_freq=self.doc_freq,
+            totals=np.array([self.n_docs, self.sum_doc_len], dtype=np.int64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Stats":
+        with np.load(path) as data:
+            n_docs, sum_doc_len = data["totals"].tolist()
+            return cls(data["indices"], data["doc_freq"], n_docs, sum_doc_len)
+
+
+def merge_stats(shards: Iterable[BM25Stats]) -> BM25Stats:
+    """Reduce step: sum the statistics of several shards, dropping zero counts."""
+    shards = list(shards)
+    if not shards:
+        return BM25Stats.empty()
+    indices, inverse = np.unique(
+        np.concatenate([shard.indices for shard in shards]), return_inverse=True
+    )
+    doc_freq = np.zeros(len(indices), dtype=np.int64)
+    np.add.at(doc_freq, inverse, np.concatenate([shard.doc_freq for shard in shards]))
+    keep = doc_freq != 0
+    return BM25Stats(
+        indices[keep].astype(np.uint32),
+        doc_freq[keep],
+        sum(shard.n_docs for shard in shards),
+        sum(shard.sum_doc_len for shard in shards),
+    )
+
+
+class FastBM25Encoder:
+    """
+    Drop-in replacement for ``pinecone_text``'s ``BM25Encoder`` that produces
+    the same sparse vectors, only faster.
+
+    Tokenization is unchanged (NLTK ``word_tokenize``, lower-casing,
+    punctuation and stopword removal, Snowball stemming, mmh3 hashing), but
+    the lower-case/stopword/stem/hash result is memoized per raw token, which
+    removes most of the per-token cost. Document frequencies are kept in two
+    sorted arrays looked up with ``np.searchsorted`` rather than a dict, and
+    are saved in a binary file that ``load`` memory-maps instead of parsing
+    a large JSON document.
+    """
+
+    def __init__(
+        self,
+        b: float = 0.75,
+        k1: float = 1.2,
+        lower_case: bool = True,
+        remove_punctuation: bool = True,
+        remove_stopwords: bool = True,
+        stem: bool = True,
+        language: str = "english",
+    ):
+        if stem and not lower_case:
+            raise ValueError(
+                "Stemming applying lower case to tokens, so lower_case must be True if stem is True"
+            )
+        self.b = b
+        self.k1 = k1
+        self.lower_case = lower_case
+        self.remove_punctuation = remove_punctuation
+        self.remove_stopwords = remove_stopwords
+        self.stem = stem
+        self.language = language
+
+        self._tokenizer: Optional["BM25Tokenizer"] = None
+        self._token_cache: Dict[str, int] = {}
+
+        self.n_docs: Optional[int] = None
+        self.avgdl: Optional[float] = None
+        self.sum_doc_len: Optional[int] = None
+        # Average length the stored document vectors were encoded with, if it
+        # differs from the current statistics (see ``set_stats``)
+        self.doc_avgdl: Optional[float] = None
+        # Caller-defined identifier of the corpus the statistics describe
+        self.corpus_key: Optional[str] = None
+        self._df_indices = np.zeros(0, dtype=np.uint32)
+        self._df_values = np.zeros(0, dtype=np.uint32)
+
+    # -- tokenization ---------------------------------------------------
+
+    def _hash_token(self, raw: str) -> int:
+        """Apply BM25Tokenizer's per-token steps and mmh3 hashing to one token."""
+        if self._tokenizer is None:
+            self._tokenizer = _tokenizer_module().BM25Tokenizer(
+                lower_case=self.lower_case,
+                remove_punctuation=self.remove_punctuation,
+                remove_stopwords=self.remove_stopwords,
+                stem=self.stem,
+                language=self.language,
+            )
+        word = raw.lower() if self.lower_case else raw
+        if self.remove_punctuation and word in self._tokenizer._punctuation:
+            return _DROPPED
+        if self.remove_stopwords and word.lower() in self._tokenizer._stop_words:
+            return _DROPPED
+        if self.stem:
+            word = self._tokenizer._stemmer.stem(word)
+        return mmh3.hash(word, signed=False)
+
+    def _token_hashes(self, text: str) -> List[int]:
+        cache = self._token_cache
+        if len(cache) > TOKEN_CACHE_LIMIT:
+            cache.clear()
+        hashes = []
+        for raw in _tokenizer_module().word_tokenize(text, self.language):
+            token_hash = cache.get(raw)
+            if token_hash is None:
+                token_hash = cache[raw] = self._hash_token(raw)
+            if token_hash != _DROPPED:
+                hashes.append(token_hash)
+        return hashes
+
+    def _tf(self, text: str) -> Tuple[List[int], List[int]]:
+        # Counter keeps first-occurrence order, matching BM25Encoder._tf
+        counts = Counter(self._token_hashes(text))
+        return list(counts.keys()), list(counts.values())
+
+    # -- fitting --------------------------------------------------------
+
+    def fit(self, corpus: Iterable[str]) -> "FastBM25Encoder":
+        """Calculate document frequencies, document count and average length."""
+        return self.set_stats(self.compute_stats(corpus))
+
+    def compute_stats(self, corpus: Iterable[str]) -> BM25Stats:
+        """Map step: statistics of one shard of the corpus, to be merged later."""
+        n_docs = 0
+        sum_doc_len = 0
+        doc_freq_counter: Counter = Counter()
+
+        for doc in corpus:
+            if not isinstance(doc, str):
+                raise ValueError("corpus must be a list of strings")
+            indices, tf = self._tf(doc)
+            if len(indices) == 0:
+                continue
+            n_docs += 1
+            sum_doc_len += sum(tf)
+            doc_freq_counter.update(indices)
+
+        return BM25Stats.from_counter(doc_freq_counter, n_docs, sum_doc_len)
+
+    def set_stats(self, stats: BM25Stats, doc_avgdl: Optional[float] = None) -> "FastBM25Encoder":
+        """
+        Use ``stats`` for encoding. Queries always use them as they are;
+        documents are normalized by ``doc_avgdl`` when given, so vectors added
+        to an index stay consistent with those already encoded.
+        """
+        if stats.n_docs <= 0:
+            raise ValueError("Cannot fit BM25 on a corpus without any tokens")
+        self._df_indices = stats.indices.astype(np.uint32)
+        self._df_values = stats.doc_freq.astype(np.uint32)
+        self.n_docs = int(stats.n_docs)
+        self.sum_doc_len = int(stats.sum_doc_len)
+        self.avgdl = stats.avgdl
+        self.doc_avgdl = doc_avgdl
+        return self
+
+    @property
+    def stats(self) -> BM25Stats:
+        self._check_fitted("stats")
+        return BM25Stats(
+            np.asarray(self._df_indices, dtype=np.uint32),
+            np.asarray(self._df_values, dtype=np.int64),
+            self.n_docs,
+            self.sum_doc_len,
+        )
+
+    @property
+    def doc_freq(self) -> Dict[int, int]:
+        return dict(zip(self._df_indices.tolist(), self._df_values.tolist()))
+
+    # -- encoding -------------------------------------------------------
+
+    def _check_fitted(self, what: str) -> None:
+        if self.n_docs is None or self.avgdl is None:
+            raise ValueError(f"BM25 must be fit before encoding {what}")
+
+    def encode_documents(
+        self, texts: Union[str, List[str]]
+    ) -> Union["SparseVector", List["SparseVector"]]:
+        self._check_fitted("documents")
+        if isinstance(texts, str):
+            return self._encode_single_document(texts)
+        elif isinstance(texts, list):
+            return [self._encode_single_document(text) for text in texts]
+        else:
+            raise ValueError("texts must be a string or list of strings")
+
+    def _encode_single_document(self, text: str) -> "SparseVector":
+        indices, doc_tf = self._tf(text)
+        tf = np.array(doc_tf)
+        tf_sum = sum(tf)
+
+        avgdl = self.doc_avgdl or self.avgdl
+        tf_normed = tf / (
+            self.k1 * (1.0 - self.b + self.b * (tf_sum / avgdl)) + tf
+        )
+        return {"indices": indices, "values": tf_normed.tolist()}
+
+    def encode_queries(
+        self, texts: Union[str, List[str]]
+    ) -> Union["SparseVector", List["SparseVector"]]:
+        self._check_fitted("queries")
+        if isinstance(texts, str):
+            return self._encode_single_query(texts)
+        elif isinstance(texts, list):
+            return [self._encode_single_query(text) for text in texts]
+        else:
+            raise ValueError("texts must be a string or list of strings")
+
+    def _lookup_doc_freq(self, indices: List[int]) -> np.ndarray:
+        """Document frequency per token, 1 for unseen tokens (as BM25Encoder)."""
+        query = np.asarray(indices, dtype=np.uint32)
+        if len(self._df_indices) == 0:
+            return np.ones(len(query), dtype=np.float64)
+        slots = np.minimum(np.searchsorted(self._df_indices, query), len(self._df_indices) - 1)
+        found = self._df_indices[slots] == query
+        return np.where(found, self._df_values[slots], 1).astype(np.float64)
+
+    def _encode_single_query(self, text: str) -> "SparseVector":
+        indices, _ = self._tf(text)
+
+        df = self._lookup_doc_freq(indices)
+        idf = np.log((self.n_docs + 1) / (df + 0.5))
+        idf_norm = idf / idf.sum()
+        return {"indices": indices, "values": idf_norm.tolist()}
+
+    # -- persistence ----------------------------------------------------
+
+    def _header(self) -> Dict:
+        return {
+            "avgdl": self.avgdl,
+            "n_docs": self.n_docs,
+            "b": self.b,
+            "k1": self.k1,
+            "lower_case": self.lower_case,
+            "remove_punctuation": self.remove_punctuation,
+            "remove_stopwords": self.remove_stopwords,
+            "stem": self.stem,
+            "language": self.language,
+        }
+
+    def get_params(self) -> Dict:
+        """Parameters in the JSON layout used by ``BM25Encoder.dump``."""
+        self._check_fitted("params")
+        return {
+            **self._header(),
+            "doc_freq": {
+                "indices": self._df_indices.tolist(),
+                "values": self._df_values.astype(np.float64).tolist(),
+            },
+        }
+
+    def dump(self, path: str) -> None:
+        """
+        Save to ``path`` atomically: the binary format by default, or
+        ``BM25Encoder``-compatible JSON if the path ends in ``.json``.
+        """
+        self._check_fitted("params")
+        tmp_path = f"{path}.tmp"
+        if path.endswith(".json"):
+            with open(tmp_path, "w") as f:
+                json.dump(self.get_params(), f)
+        else:
+            header = json.dumps({
+                **self._header(),
+                "sum_doc_len": self.sum_doc_len,
+                "doc_avgdl": self.doc_avgdl,
+                "corpus_key": self.corpus_key,
+                "n_terms": len(self._df_indices),
+            }).encode("utf-8")
+            indices_offset = _align(len(MAGIC) + 4 + len(header))
+            values_offset = _align(indices_offset + self._df_indices.nbytes)
+            with open(tmp_path, "wb") as f:
+                f.write(MAGIC + struct.pack("<I", len(header)) + header)
+                f.seek(indices_offset)
+                f.write(self._df_indices.astype("<u4").tobytes())
+                f.seek(values_offset)
+                f.write(self._df_values.astype("<u4").tobytes())
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> "FastBM25Encoder":
+        """Load a binary file (memory-mapped) or a ``BM25Encoder`` JSON dump."""
+        with open(path, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                f.seek(0)
+                return self.set_params(**json.load(f))
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+
+        n_terms = header.pop("n_terms")
+        self._apply_header(header)
+        indices_offset = _align(len(MAGIC) + 4 + header_len)
+        values_offset = _align(indices_offset + n_terms * 4)
+        if n_terms:
+            self._df_indices = np.memmap(path, dtype="<u4", mode="r", offset=indices_offset, shape=(n_terms,))
+            self._df_values = np.memmap(path, dtype="<u4", mode="r", offset=values_offset, shape=(n_terms,))
+        else:
+            self._df_indices = np.zeros(0, dtype=np.uint32)
+            self._df_values = np.zeros(0, dtype=np.uint32)
+        return self
+
+    def _apply_header(self, header: Dict) -> None:
+        self.avgdl = header["avgdl"]
+        self.n_docs = header["n_docs"]
+        self.b = header["b"]
+        self.k1 = header["k1"]
+        self.lower_case = header["lower_case"]
+        self.remove_punctuation = header["remove_punctuation"]
+        self.remove_stopwords = header["remove_stopwords"]
+        self.stem = header["stem"]
+        self.language = header["language"]
+        # Older files lack these; the length total is then reconstructed
+        self.sum_doc_len = header.get("sum_doc_len", round(self.avgdl * self.n_docs))
+        self.doc_avgdl = header.get("doc_avgdl")
+        self.corpus_key = header.get("corpus_key")
+        self._tokenizer = None
+        self._token_cache = {}
+
+    def set_params(self, doc_freq: Dict[str, List], **header) -> "FastBM25Encoder":
+        self._apply_header(header)
+        stats = BM25Stats.from_counter(
+            dict(zip(doc_freq["indices"], (int(v) for v in doc_freq["values"]))),
+            header["n_docs"],
+            self.sum_doc_len,
+        )
+        self._df_indices = stats.indices
+        self._df_values = stats.doc_freq.astype(np.uint32)
+        return self
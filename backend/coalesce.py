@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+
+class _Run:
+    """One upstream generation and the chunks it has produced so far."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        # Wake every waiting subscriber; later waits use a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class RequestCoalescer:
+    """
+    Share one upstream generation between concurrent requests with the same
+    key. The first request starts the run; later ones replay the chunks
+    produced so far and then follow the live tail. An upstream error is
+    raised in every subscriber. The run is cancelled once its last
+    subscriber disconnects and is forgotten when it ends, so a request
+    arriving afterwards starts a new one.
+    """
+
+    def __init__(self):
+        self._runs: Dict[Hashable, _Run] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def _drive(self, key: Hashable, run: _Run, stream: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in stream:
+                run.chunks.append(chunk)
+                run.notify()
+        except Exception as e:
+            run.error = e
+        finally:
+            run.done = True
+            if self._runs.get(key) is run:
+                del self._runs[key]
+            run.notify()
+
+    async def stream(self, key: Hashable, generate: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        run = self._runs.get(key)
+        if run is None:
+            run = self._runs[key] = _Run()
+            run.task = asyncio.create_task(self._drive(key, run, generate()))
+            self.started += 1
+        else:
+            self.joined += 1
+
+        run.subscribers += 1
+        try:
+            position = 0
+            while True:
+                changed = run._changed
+                while position < len(run.chunks):
+                    yield run.chunks[position]
+                    position += 1
+                if run.done:
+                    if run.error is not None:
+                        raise run.error
+                    return
+                await changed.wait()
+        finally:
+            run.subscribers -= 1
+            if run.subscribers == 0 and not run.done:
+                logger.info("All subscribers left, cancelling the shared generation")
+                if self._runs.get(key) is run:
+                    del self._runs[key]
+                run.task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {"started": self.started, "joined": self.joined, "in_flight": len(self._runs)}
@@ -1,10 +1,41 @@
 import os
-from pinecone import Pinecone, ServerlessSpec
+from typing import Any, Callable, Optional
+
+from backend.local_index import LOCAL_INDEX_PATH, LocalHybridIndex
+from backend.upstream import UpstreamIndex, vector_query_policy
+from backend.utils import EMBEDDING_DIMENSION, FULL_EMBEDDING_DIMENSION, validate_key
+
+# Pinecone index dimensions are fixed, so each embedding size gets its own
+# index; changing EMBEDDING_DIMENSION and re-running the indexer migrates
+INDEX_NAME = os.getenv(
+    "PINECONE_INDEX_NAME",
+    "isi-data-test" if EMBEDDING_DIMENSION == FULL_EMBEDDING_DIMENSION
+    else f"isi-data-test-{EMBEDDING_DIMENSION}",
+)
+
+# "pinecone" (serverless, default) or "local" (in-process, see local_index.py)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+
+# Keep-alive connections per Pinecone client; the SDK defaults to 5 per CPU
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "32"))
+
+
+def index_identity() -> str:
+    """Name the configured vector store, so the indexing manifest can tell them apart."""
+    if VECTOR_STORE == "local":
+        return f"local:{LOCAL_INDEX_PATH}@{EMBEDDING_DIMENSION}"
+    return INDEX_NAME
 
-from backend.utils import validate_key
 
 def get_index():
-    index_name = "isi-data-test"
+    if VECTOR_STORE == "local":
+        return LocalHybridIndex.open(LOCAL_INDEX_PATH)
+    if VECTOR_STORE != "pinecone":
+        raise ValueError(f"Unknown VECTOR_STORE: {VECTOR_STORE}")
+
+    from pinecone import Pinecone, ServerlessSpec
+
+    index_name = INDEX_NAME
 
     validate_key("PINECONE_API_KEY")
 
@@ -13,9 +44,32 @@ def get_index():
     if index_name not in pc.list_indexes().names():
         pc.create_index(
             name=index_name,
-            dimension=3072,  
+            dimension=EMBEDDING_DIMENSION,
             metric="dotproduct",
             spec=ServerlessSpec(cloud="aws", region="us-east-1"),
         )
 
-    return pc.Index(index_name)
+    return pc.Index(index_name, connection_pool_maxsize=PINECONE_POOL_SIZE)
+
+
+def async_index_factory(index: Any) -> Optional[Callable[[], Any]]:
+    """
+    Return a function that opens a Pinecone asyncio client for the same
+    index as ``index``, or None if it is not a Pinecone index. The client
+    must be created inside the event loop that will use it. Its queries go
+    through the vector-query ``UpstreamPolicy`` (deadline, retries, hedging).
+    """
+    if isinstance(index, LocalHybridIndex):
+        return None
+    from pinecone import Pinecone
+    from pinecone.db_data import Index
+
+    if not isinstance(index, Index):
+        return None
+    host = index._config.host
+    api_key = os.getenv("PINECONE_API_KEY")
+    # One policy for every loop's client, so latencies and failures are pooled
+    policy = vector_query_policy()
+    return lambda: UpstreamIndex(
+        Pinecone(api_key=api_key).IndexAsyncio(host=host, connection_pool_maxsize=PINECONE_POOL_SIZE), policy
+    )
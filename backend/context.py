@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+MAX_TITLE_LENGTH = 80
+SEPARATOR = "\n\n---\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token for English text."""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class Passage:
+    """Consecutive text from one page, built from one or more retrieved chunks."""
+    text: str
+    metadata: Dict
+    rank: int
+    start: Optional[int] = None
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+    def header(self) -> str:
+        title = self.metadata.get("title") or os.path.basename(str(self.metadata.get("source", "")))
+        if not title:
+            return ""
+        if len(title) > MAX_TITLE_LENGTH:
+            title = title[:MAX_TITLE_LENGTH - 1].rstrip() + "…"
+        page = self.metadata.get("page")
+        return f"[{title}, p. {int(page) + 1}]" if page is not None else f"[{title}]"
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    raw_tokens: int
+    passages: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.raw_tokens - self.tokens)
+
+
+def merge_passages(documents: List[Document]) -> List[Passage]:
+    """
+    Merge chunks from the same page whose ``start_index`` ranges overlap or
+    touch into one passage, and drop chunks whose text was already seen.
+    Passages keep the rank of their best chunk.
+    """
+    groups: Dict[tuple, List[Passage]] = {}
+    seen = set()
+    for rank, doc in enumerate(documents):
+        text = doc.page_content
+        if text.strip() in seen:
+            continue
+        seen.add(text.strip())
+        metadata = doc.metadata
+        key = (metadata.get("uuid") or metadata.get("source"), metadata.get("page"))
+        start = metadata.get("start_index")
+        passage = Passage(text=text, metadata=metadata, rank=rank, start=None if start is None else int(start))
+        groups.setdefault(key, []).append(passage)
+
+    passages = []
+    for key, group in groups.items():
+        if key == (None, None):
+            passages.extend(group)
+            continue
+        positioned = sorted((p for p in group if p.start is not None), key=lambda p: p.start)
+        passages.extend(p for p in group if p.start is None)
+        current = None
+        for passage in positioned:
+            if current is not None and passage.start <= current.end:
+                if passage.end > current.end:
+                    current.text += passage.text[current.end - passage.start:]
+                current.rank = min(current.rank, passage.rank)
+            else:
+                if current is not None:
+                    passages.append(current)
+                current = Passage(passage.text, passage.metadata, passage.rank, passage.start)
+        if current is not None:
+            passages.append(current)
+
+    return sorted(passages, key=lambda p: p.rank)
+
+
+def pack_context(documents: List[Document], budget: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """
+    Assemble retrieved chunks into the context sent to the LLM: merge
+    overlapping chunks, then add passages in rank order, each prefixed with
+    its source title and page, while they fit in ``budget`` tokens.
+    """
+    raw_tokens = estimate_tokens(SEPARATOR.join(doc.page_content for doc in documents))
+
+    parts = []
+    tokens = 0
+    for passage in merge_passages(documents):
+        header = passage.header()
+        part = f"{header}\n{passage.text}" if header else passage.text
+        cost = estimate_tokens(part) + (estimate_tokens(SEPARATOR) if parts else 0)
+        if tokens + cost > budget:
+            if parts:
+                continue
+            # Always send something: cut the best passage down to the budget
+            part = part[:budget * 4]
+            cost = estimate_tokens(part)
+        parts.append(part)
+        tokens += cost
+
+    packed = PackedContext(text=SEPARATOR.join(parts), tokens=tokens, raw_tokens=raw_tokens, passages=len(parts))
+    context_stats.record(packed)
+    return packed
+
+
+class ContextStats:
+    """Running totals of the context sent to the LLM versus the raw hits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.raw_tokens = 0
+        self.packed_tokens = 0
+
+    def record(self, packed: PackedContext) -> None:
+        with self._lock:
+            self.requests += 1
+            self.raw_tokens += packed.raw_tokens
+            self.packed_tokens += packed.tokens
+        logger.info(
+            f"Packed {packed.passages} passage(s) into ~{packed.tokens} tokens "
+            f"(~{packed.tokens_saved} saved)"
+        )
+
+    def stats(self) -> Dict[str, int]:
+        saved = max(0, self.raw_tokens - self.packed_tokens)
+        return {
+            "requests": self.requests,
+            "raw_tokens": self.raw_tokens,
+            "packed_tokens": self.packed_tokens,
+            "tokens_saved": saved,
+            "tokens_saved_per_request": saved // self.requests if self.requests else 0,
+        }
+
+
+context_stats = ContextStats()
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DOCSTORE_PATH = os.getenv("DOCSTORE_PATH", "backend/docstore.sqlite")
+
+# The only metadata stored on the vectors: what search filters match on
+# (see filters.build_filter). Everything else lives in the docstore.
+FILTER_FIELDS = ("industries", "country_codes", "date_int")
+
+# SQLite's default limit on parameters per statement is 999
+LOOKUP_BATCH = 900
+
+logger = logging.getLogger(__name__)
+
+
+def vector_metadata(metadata: Dict) -> Dict:
+    """The part of a chunk's metadata that is stored with its vector."""
+    return {field: metadata[field] for field in FILTER_FIELDS if field in metadata}
+
+
+class DocStore:
+    """
+    Chunk text and full metadata keyed by chunk ID, in a SQLite file, so the
+    vector index only holds IDs and filterable fields. Each thread gets its
+    own connection. WAL mode lets server workers read while the indexer
+    writes.
+    """
+
+    def __init__(self, path: str = DOCSTORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text TEXT, metadata TEXT)")
+
+    @classmethod
+    def open(cls, path: str = DOCSTORE_PATH) -> Optional["DocStore"]:
+        """Open an existing docstore, or return None if the indexer has not written one."""
+        if not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+        return conn
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def put_many(self, records: Iterable[Tuple[str, str, Dict]]) -> None:
+        """Insert or replace ``(chunk_id, text, metadata)`` records in one transaction."""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, text, metadata) VALUES (?, ?, ?)",
+                ((doc_id, text, json.dumps(metadata)) for doc_id, text, metadata in records),
+            )
+
+    def delete_many(self, ids: List[str]) -> None:
+        with self._connect() as conn:
+            for start in range(0, len(ids), LOOKUP_BATCH):
+                batch = ids[start:start + LOOKUP_BATCH]
+                conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+    def get_many(self, ids: List[str]) -> Dict[str, Tuple[str, Dict]]:
+        """Text and metadata of the given chunks; unknown IDs are left out."""
+        conn = self._connect()
+        found = {}
+        unique = list(dict.fromkeys(ids))
+        for start in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[start:start + LOOKUP_BATCH]
+            rows = conn.execute(
+                f"SELECT id, text, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+            )
+            for doc_id, text, metadata in rows:
+                found[doc_id] = (text, json.loads(metadata))
+        return found
@@ -0,0 +1,361 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backend.embeddings import aembed_queries
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "backend/embedding_cache")
+# Disk budget of a model's whole cache, split evenly between its document
+# and query stores
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+
+KEY_BYTES = 16
+EVICT_TO_FRACTION = 0.9
+
+logger = logging.getLogger(__name__)
+
+
+def text_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+
+def _write_at(path: Path, offset: int, data: bytes) -> None:
+    with open(path, "r+b" if path.exists() else "wb") as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+
+
+class EmbeddingStore:
+    """
+    Append-only store of float32 vectors on disk, keyed by a 16-byte text
+    hash. Vectors live in a memory-mapped ``vectors.f32`` file and the keys
+    in ``keys.bin``; ``meta.json`` holds the dimension, row count and a
+    generation number. Eviction writes the kept rows to files of the next
+    generation (``vectors.1.f32``, ...) and switches to them through
+    ``meta.json``, so readers, which do not take the lock, never pair one
+    generation's row count with another's files. Writers take an exclusive
+    file lock, so several processes can share a directory and pick up each
+    other's rows.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._dim: Optional[int] = None
+        self._count = 0
+        self._generation = 0
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._tick = 0
+
+        with self._lock:
+            self._sync()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.path / "meta.json"
+
+    def _keys_path(self, generation: int) -> Path:
+        return self.path / ("keys.bin" if generation == 0 else f"keys.{generation}.bin")
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.path / ("vectors.f32" if generation == 0 else f"vectors.{generation}.f32")
+
+    @property
+    def vectors_path(self) -> Path:
+        """The file holding the current generation's vectors."""
+        return self._vectors_path(self._generation)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path / "lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._meta_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"dim": None, "count": 0, "generation": 0}
+
+    def _write_meta(self) -> None:
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self._dim, "count": self._count, "generation": self._generation}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _map_vectors(self) -> None:
+        if self._dim is None or self._count == 0:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            self._vectors_path(self._generation), dtype=np.float32, mode="r", shape=(self._count, self._dim)
+        )
+
+    def _sync(self) -> None:
+        """Pick up rows written by other processes since the last look."""
+        while True:
+            meta = self._read_meta()
+            try:
+                self._load(meta)
+                return
+            except FileNotFoundError:
+                # An eviction removed this generation's files after meta was
+                # read: start over from the generation that replaced them
+                if self._read_meta()["generation"] == meta["generation"]:
+                    raise
+
+    def _load(self, meta: Dict) -> None:
+        if meta["generation"] != self._generation:
+            self._rows = {}
+            self._count = 0
+            self._last_used = np.zeros(0, dtype=np.int64)
+            self._generation = meta["generation"]
+        if meta["count"] <= self._count:
+            return
+
+        self._dim = meta["dim"]
+        with open(self._keys_path(self._generation), "rb") as f:
+            f.seek(self._count * KEY_BYTES)
+            new_keys = f.read((meta["count"] - self._count) * KEY_BYTES)
+        for i in range(len(new_keys) // KEY_BYTES):
+            self._rows[new_keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]] = self._count + i
+
+        self._last_used = np.concatenate(
+            [self._last_used, np.zeros(meta["count"] - self._count, dtype=np.int64)]
+        )
+        self._count = meta["count"]
+        self._map_vectors()
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._sync()
+            results = []
+            for key in keys:
+                row = self._rows.get(key)
+                if row is None:
+                    results.append(None)
+                else:
+                    self._tick += 1
+                    self._last_used[row] = self._tick
+                    results.append(np.array(self._vectors[row]))
+            return results
+
+    def put_many(self, keys: List[bytes], vectors: List[List[float]]) -> None:
+        if not keys:
+            return
+        with self._lock, self._file_lock():
+            self._sync()
+
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows:
+                    new_rows[key] = vector
+            if not new_rows:
+                return
+
+            block = np.asarray(list(new_rows.values()), dtype=np.float32)
+            if self._dim is None:
+                self._dim = block.shape[1]
+            elif block.shape[1] != self._dim:
+                raise ValueError(f"Expected {self._dim}-dimensional vectors, got {block.shape[1]}")
+
+            # Write at the committed row count, not at end of file, so rows
+            # left over from an interrupted write are overwritten
+            _write_at(self._vectors_path(self._generation), self._count * self._dim * 4, block.tobytes())
+            _write_at(self._keys_path(self._generation), self._count * KEY_BYTES, b"".join(new_rows))
+
+            for i, key in enumerate(new_rows):
+                self._rows[key] = self._count + i
+            self._tick += 1
+            self._last_used = np.concatenate(
+                [self._last_used, np.full(len(new_rows), self._tick, dtype=np.int64)]
+            )
+            self._count += len(new_rows)
+            self._write_meta()
+            self._map_vectors()
+
+            if self._count * self._dim * 4 > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Rewrite the files keeping only the most recently used rows."""
+        keep_count = int(self.max_bytes * EVICT_TO_FRACTION) // (self._dim * 4)
+        # Order by last use, then by row so older rows go first on ties
+        by_recency = np.lexsort((np.arange(self._count), self._last_used))
+        keep = np.sort(by_recency[len(by_recency) - keep_count:])
+        keys_by_row = [None] * self._count
+        for key, row in self._rows.items():
+            keys_by_row[row] = key
+
+        # The next generation gets its own files; readers only move to them
+        # once meta.json says so, and the old ones go after that
+        previous = self._generation
+        np.array(self._vectors[keep]).tofile(self._vectors_path(previous + 1))
+        with open(self._keys_path(previous + 1), "wb") as f:
+            f.write(b"".join(keys_by_row[row] for row in keep))
+
+        logger.info(f"Embedding cache {self.path}: evicted {self._count - len(keep)} vectors")
+        self._rows = {keys_by_row[row]: i for i, row in enumerate(keep)}
+        self._last_used = self._last_used[keep]
+        self._count = len(keep)
+        self._generation = previous + 1
+        self._write_meta()
+        self._map_vectors()
+        self._vectors_path(previous).unlink(missing_ok=True)
+        self._keys_path(previous).unlink(missing_ok=True)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a disk store per task type (documents and
+    queries embed differently) and an in-memory LRU in front of queries.
+    ``max_bytes`` covers both stores, half each.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        cache_dir: str = EMBEDDING_CACHE_DIR,
+        max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+        query_cache_size: int = QUERY_CACHE_SIZE,
+    ):
+        self.underlying = underlying
+        self.model = model
+        model_dir = Path(cache_dir) / model.replace("/", "_")
+        self.document_store = EmbeddingStore(str(model_dir / "document"), max_bytes // 2)
+        self.query_store = EmbeddingStore(str(model_dir / "query"), max_bytes // 2)
+        self.query_cache_size = query_cache_size
+
+        self._query_lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self.counters = {
+            "query_memory_hits": 0,
+            "query_disk_hits": 0,
+            "query_misses": 0,
+            "document_hits": 0,
+            "document_misses": 0,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "query_memory_size": len(self._query_lru),
+            "query_disk_size": len(self.query_store),
+            "document_disk_size": len(self.document_store),
+        }
+
+    def _lookup_documents(self, texts: List[str]):
+        keys = [text_key(self.model, text) for text in texts]
+        cached = self.document_store.get_many(keys)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        self.counters["document_hits"] += len(texts) - len(missing)
+        self.counters["document_misses"] += len(missing)
+        return keys, cached, missing
+
+    def _store_documents(self, keys, cached, missing, vectors) -> List[List[float]]:
+        self.document_store.put_many([keys[i] for i in missing], vectors)
+        for i, vector in zip(missing, vectors):
+            cached[i] = vector
+        return [list(map(float, vector)) for vector in cached]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._lookup_documents(texts)
+        vectors = self.underlying.embed_documents([texts[i] for i in missing]) if missing else []
+        return self._store_documents(keys, cached, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = await asyncio.to_thread(self._lookup_documents, texts)
+        vectors = await self.underlying.aembed_documents([texts[i] for i in missing]) if missing else []
+        return await asyncio.to_thread(self._store_documents, keys, cached, missing, vectors)
+
+    def _lookup_query(self, text: str) -> Optional[List[float]]:
+        with self._lru_lock:
+            vector = self._query_lru.get(text)
+            if vector is not None:
+                self._query_lru.move_to_end(text)
+                self.counters["query_memory_hits"] += 1
+                return vector
+
+        stored = self.query_store.get_many([text_key(self.model, text)])[0]
+        if stored is None:
+            self.counters["query_misses"] += 1
+            return None
+        self.counters["query_disk_hits"] += 1
+        vector = [float(v) for v in stored]
+        self._remember_query(text, vector)
+        return vector
+
+    def _remember_query(self, text: str, vector: List[float]) -> None:
+        with self._lru_lock:
+            self._query_lru[text] = vector
+            self._query_lru.move_to_end(text)
+            while len(self._query_lru) > self.query_cache_size:
+                self._query_lru.popitem(last=False)
+
+    def _store_query(self, text: str, vector: List[float]) -> None:
+        self.query_store.put_many([text_key(self.model, text)], [vector])
+        self._remember_query(text, vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._lookup_query(text)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self._store_query(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # A disk lookup waits on the store lock while another thread writes
+        vector = await asyncio.to_thread(self._lookup_query, text)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            await asyncio.to_thread(self._store_query, text, vector)
+        return vector
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed the queries that are not cached in batched calls."""
+        vectors = await asyncio.to_thread(lambda: [self._lookup_query(text) for text in texts])
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = await aembed_queries(self.underlying, [texts[i] for i in missing])
+
+            def store():
+                for i, vector in zip(missing, embedded):
+                    self._store_query(texts[i], vector)
+                    vectors[i] = vector
+
+            await asyncio.to_thread(store)
+        return vectors
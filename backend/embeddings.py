@@ -0,0 +1,68 @@
+import asyncio
+import inspect
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# Gemini's task type for search queries; its embed_documents defaults to documents
+QUERY_TASK_TYPE = "RETRIEVAL_QUERY"
+
+
+async def aembed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embed several search queries in as few calls as the model allows:
+    batched for models that take a ``task_type`` (Gemini), one call per
+    query otherwise.
+    """
+    if not texts:
+        return []
+    if hasattr(embeddings, "aembed_queries"):
+        return await embeddings.aembed_queries(texts)
+    if "task_type" in inspect.signature(embeddings.aembed_documents).parameters:
+        return await embeddings.aembed_documents(texts, task_type=QUERY_TASK_TYPE)
+    return list(await asyncio.gather(*(embeddings.aembed_query(text) for text in texts)))
+
+
+def l2_normalize(vectors: List[List[float]]) -> List[List[float]]:
+    array = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    return (array / np.where(norms == 0, 1, norms)).tolist()
+
+
+class DimensionedEmbeddings(Embeddings):
+    """
+    Asks a Gemini embeddings model for ``output_dimensionality``-sized
+    vectors and optionally L2-normalizes them. Gemini only normalizes the
+    full 3072-dimensional output, so reduced sizes should be normalized
+    before dot-product search.
+    """
+
+    def __init__(self, underlying: Embeddings, dimension: Optional[int] = None, normalize: bool = False):
+        self.underlying = underlying
+        self.dimension = dimension
+        self.normalize = normalize
+
+    def _kwargs(self):
+        return {"output_dimensionality": self.dimension} if self.dimension else {}
+
+    def _finish(self, vectors: List[List[float]]) -> List[List[float]]:
+        return l2_normalize(vectors) if self.normalize and vectors else vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._finish(self.underlying.embed_documents(texts, **self._kwargs()))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._finish([self.underlying.embed_query(text, **self._kwargs())])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._finish(await self.underlying.aembed_documents(texts, **self._kwargs()))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._finish([await self.underlying.aembed_query(text, **self._kwargs())])[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._finish(
+            await self.underlying.aembed_documents(texts, task_type=QUERY_TASK_TYPE, **self._kwargs())
+        )
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.schemas import SearchFilters
+
+METADATA_INDEX_PATH = "backend/metadata_index.json"
+
+# Chunk metadata fields that filters match against
+LIST_FIELDS = ("industries", "country_codes")
+
+logger = logging.getLogger(__name__)
+
+
+def date_to_int(value: Any) -> Optional[int]:
+    """
+    ``2024-10-01`` (or a ``date``) as ``20241001``. Pinecone range operators
+    only work on numbers, so chunks store the date in this form as well.
+    """
+    if isinstance(value, date):
+        return value.year * 10000 + value.month * 100 + value.day
+    try:
+        return int(str(value)[:10].replace("-", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_filter(filters: Optional[SearchFilters]) -> Optional[Dict]:
+    """Translate request filters into a Pinecone metadata filter."""
+    if filters is None:
+        return None
+    conditions = []
+    for field in LIST_FIELDS:
+        values = getattr(filters, field)
+        if values:
+            conditions.append({field: {"$in": list(values)}})
+    date_range = {}
+    if filters.date_from is not None:
+        date_range["$gte"] = date_to_int(filters.date_from)
+    if filters.date_to is not None:
+        date_range["$lte"] = date_to_int(filters.date_to)
+    if date_range:
+        conditions.append({"date_int": date_range})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def merge_filters(base: Optional[SearchFilters], override: Optional[SearchFilters]) -> Optional[SearchFilters]:
+    """Combine two sets of filters; fields set in ``override`` win."""
+    if base is None or override is None:
+        return override or base
+    return base.model_copy(update=override.model_dump(exclude_none=True))
+
+
+def filter_key(filters: Optional[SearchFilters]) -> Optional[str]:
+    """Stable string for caching or coalescing requests by their filters."""
+    metadata_filter = build_filter(filters)
+    return None if metadata_filter is None else json.dumps(metadata_filter, sort_keys=True)
+
+
+class MetadataIndex:
+    """
+    Document-level inverted index over the filterable metadata, written by
+    the indexing job. Every chunk carries its document's metadata, so the
+    number of chunks matching a filter is the sum of the chunk counts of the
+    matching documents. The server uses it to skip the vector query when no
+    chunk can match.
+    """
+
+    def __init__(self, documents: List[Dict]):
+        self.documents = documents
+        self.chunk_counts = np.array([d["n_chunks"] for d in documents], dtype=np.int64)
+        self.dates = np.array([d.get("date_int") or 0 for d in documents], dtype=np.int64)
+        self.postings: Dict[str, Dict[str, np.ndarray]] = {}
+        for field in LIST_FIELDS:
+            postings: Dict[str, List[int]] = {}
+            for row, document in enumerate(documents):
+                for value in document.get(field) or []:
+                    postings.setdefault(value, []).append(row)
+            self.postings[field] = {v: np.asarray(rows, dtype=np.int64) for v, rows in postings.items()}
+
+    @classmethod
+    def build(cls, indexed: Dict[str, Dict], metadata_lookup: Dict[str, Dict]) -> "MetadataIndex":
+        """Build from the manifest's ``files`` entries and the metadata.jsonl lookup."""
+        documents = []
+        for name, entry in sorted(indexed.items()):
+            metadata = metadata_lookup.get(os.path.splitext(name)[0], {})
+            documents.append({
+                "uuid": metadata.get("uuid"),
+                "n_chunks": len(entry.get("chunk_ids", [])),
+                "industries": metadata.get("industries") or [],
+                "country_codes": metadata.get("country_codes") or [],
+                "date_int": date_to_int(metadata.get("date")),
+            })
+        return cls(documents)
+
+    def save(self, path: str = METADATA_INDEX_PATH) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = METADATA_INDEX_PATH) -> Optional["MetadataIndex"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f)["documents"])
+        except FileNotFoundError:
+            return None
+
+    def values(self, field: str) -> List[str]:
+        return sorted(self.postings[field])
+
+    def _mask(self, filters: SearchFilters) -> np.ndarray:
+        mask = np.ones(len(self.documents), dtype=bool)
+        for field in LIST_FIELDS:
+            values = getattr(filters, field)
+            if values:
+                any_mask = np.zeros(len(self.documents), dtype=bool)
+                for value in values:
+                    rows = self.postings[field].get(value)
+                    if rows is not None:
+                        any_mask[rows] = True
+                mask &= any_mask
+        if filters.date_from is not None:
+            mask &= self.dates >= date_to_int(filters.date_from)
+        if filters.date_to is not None:
+            mask &= self.dates <= date_to_int(filters.date_to)
+        return mask
+
+    def count(self, filters: Optional[SearchFilters]) -> int:
+        """Number of indexed chunks that match ``filters``."""
+        if filters is None:
+            return int(self.chunk_counts.sum())
+        return int(self.chunk_counts[self._mask(filters)].sum())
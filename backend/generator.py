@@ -1,33 +1,134 @@
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain.prompts import ChatPromptTemplate
-from typing import AsyncGenerator
+import os
+import threading
+import time
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from typing import TYPE_CHECKING, AsyncGenerator, List, Optional
 
+from backend.metrics import record, span
 from backend.utils import get_llm
-from backend.system_prompt import system_prompt
-from backend.retreiver import retrieve_context
+from backend.system_prompt import direct_system_prompt, system_prompt
+from backend.retreiver import format_documents, request_filters, retrieve_context, retrieve_documents
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+
+# "agent" lets the model decide to call retrieve_context (two LLM calls);
+# "direct" retrieves first and answers in a single LLM call
+GENERATION_MODES = ("agent", "direct")
+GENERATION_MODE = os.getenv("GENERATION_MODE", "agent").lower()
+
+_agent_executor: Optional["AgentExecutor"] = None
+_direct_chain: Optional[Runnable] = None
+_lock = threading.Lock()
+
+
+def resolve_mode(mode: Optional[str] = None) -> str:
+    """Return the requested generation mode, or the server default."""
+    mode = mode or GENERATION_MODE
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode '{mode}', expected one of {GENERATION_MODES}")
+    return mode
+
+
+def build_agent_executor(llm=None) -> "AgentExecutor":
+    """
+    Assemble the prompt, LLM and tool-calling agent into an executor.
+    ``langchain.agents`` takes about a second to import, so it is imported
+    here, in the lifespan warm-up, rather than with this module.
+    """
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
 
-async def generate_chat(input: str) -> AsyncGenerator[str, None]:
     prompt = ChatPromptTemplate.from_messages([
             ("system", system_prompt),
             ("human", "{input}"),
             ("placeholder", "{agent_scratchpad}"),
         ])
-    
-    llm = get_llm()
-        
+
+    if llm is None:
+        llm = get_llm()
+
     agent = create_tool_calling_agent(llm=llm, tools=[retrieve_context], prompt=prompt)
-    agent_executor = AgentExecutor(
+    return AgentExecutor(
         agent=agent,
         tools=[retrieve_context],
-        verbose=True,
+        verbose=False,
         handle_parsing_errors=True
     )
 
+
+def get_agent_executor() -> "AgentExecutor":
+    """
+    Return the process-wide executor, building it on first use. The executor
+    keeps no per-run state, so concurrent requests can share it.
+    """
+    global _agent_executor
+    if _agent_executor is None:
+        with _lock:
+            if _agent_executor is None:
+                _agent_executor = build_agent_executor()
+    return _agent_executor
+
+
+def build_direct_chain(llm=None) -> Runnable:
+    """Assemble the prompt with the retrieved context and the LLM, without tools."""
+    prompt = ChatPromptTemplate.from_messages([
+            ("system", direct_system_prompt),
+            ("human", "{input}"),
+        ])
+
+    if llm is None:
+        llm = get_llm()
+
+    return prompt | llm
+
+
+def get_direct_chain() -> Runnable:
+    """Return the process-wide direct-mode chain, building it on first use."""
+    global _direct_chain
+    if _direct_chain is None:
+        with _lock:
+            if _direct_chain is None:
+                _direct_chain = build_direct_chain()
+    return _direct_chain
+
+
+async def generate_direct(input: str, documents: Optional[List[Document]] = None) -> AsyncGenerator[str, None]:
+    """
+    Retrieve context for the question up front (unless ``documents`` were
+    already retrieved for it), then stream the answer from a single LLM call
+    instead of the agent's tool-call round trip. Errors are raised, so
+    callers can report them instead of streaming (and caching) them as text.
+    """
+    chain = get_direct_chain()
+
+    if documents is None:
+        documents = await retrieve_documents(input, request_filters.get())
+
+    context = format_documents(documents)
+    with span("llm_answer"):
+        async for chunk in chain.astream({"input": input, "context": context}):
+            if chunk.content:
+                yield chunk.content
+
+
+async def generate_chat(input: str) -> AsyncGenerator[str, None]:
+    agent_executor = get_agent_executor()
+
     # Track if async is working
     has_content = False
+    # Start time of each LLM call, to time the planning and answering turns
+    llm_started = {}
 
     async for event in agent_executor.astream_events({"input": input}, version="v2"):
-        if event["event"] == "on_chat_model_stream":
+        if event["event"] == "on_chat_model_start":
+            llm_started[event["run_id"]] = time.perf_counter()
+        elif event["event"] == "on_chat_model_end" and event["run_id"] in llm_started:
+            output = event["data"].get("output")
+            stage = "llm_planning" if getattr(output, "tool_calls", None) else "llm_answer"
+            record(stage, time.perf_counter() - llm_started.pop(event["run_id"]))
+        elif event["event"] == "on_chat_model_stream":
             chunk = event["data"]["chunk"]
             if hasattr(chunk, "content") and chunk.content:
                 has_content = True
@@ -35,11 +136,7 @@ async def generate_chat(input: str) -> AsyncGenerator[str, None]:
 
     # Fallback: if nothing was yielded at all
     if not has_content:
-        try:
-            result = await agent_executor.ainvoke({"input": input})
-            output = result.get("output", "")
-            if output:
-                yield output
-        except Exception as e:
-            yield f"Error generating response: {str(e)}"
-
+        result = await agent_executor.ainvoke({"input": input})
+        output = result.get("output", "")
+        if output:
+            yield output
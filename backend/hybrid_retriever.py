@@ -0,0 +1,182 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_community.retrievers import PineconeHybridSearchRetriever
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from pydantic import PrivateAttr
+
+from backend.embeddings import aembed_queries
+from backend.metrics import span, timed
+
+logger = logging.getLogger(__name__)
+
+class AsyncHybridSearchRetriever(PineconeHybridSearchRetriever):
+    """
+    ``PineconeHybridSearchRetriever`` with a native async query path.
+
+    The query embedding is requested with ``aembed_query`` while the BM25
+    query vector is encoded in a worker thread, and the index is queried
+    through Pinecone's asyncio client when ``async_index_factory`` is set
+    (otherwise, e.g. for the local index, in a worker thread).
+
+    ``top_k`` and ``alpha`` can be overridden per call, e.g.
+    ``ainvoke(query, top_k=50, alpha=0.3)``.
+
+    Vectors written by the indexer only carry the chunk ID and the filter
+    fields; the text and metadata of the hits are read from ``docstore`` in
+    one lookup per search. Hits that carry their text (vectors uploaded
+    before the docstore, or by ``add_texts``) are used as they are.
+    """
+    # Creates a Pinecone asyncio index client; it binds to the running loop
+    async_index_factory: Optional[Callable[[], Any]] = None
+    # Chunk text and metadata by ID (backend.docstore.DocStore)
+    docstore: Optional[Any] = None
+
+    # (loop, client) by loop ID; a client only works on the loop it was created on
+    _async_indexes: Dict[int, Tuple[asyncio.AbstractEventLoop, Any]] = PrivateAttr(default_factory=dict)
+
+    def _async_index(self) -> Optional[Any]:
+        if self.async_index_factory is None:
+            return None
+        loop = asyncio.get_running_loop()
+        entry = self._async_indexes.get(id(loop))
+        if entry is None or entry[0] is not loop:
+            # Forget the clients of closed loops; a new loop may reuse their ID
+            for key, (other, _) in list(self._async_indexes.items()):
+                if other.is_closed():
+                    del self._async_indexes[key]
+            entry = self._async_indexes[id(loop)] = (loop, self.async_index_factory())
+        return entry[1]
+
+    def adopt_async_clients(self, previous: "AsyncHybridSearchRetriever") -> None:
+        """Keep using ``previous``'s asyncio index clients, for a rebuild over the same index."""
+        self._async_indexes = previous._async_indexes
+
+    def close_async_clients(self) -> None:
+        """
+        Close the asyncio index clients of a retriever that has been replaced.
+        Callable from any thread: each close is scheduled on its client's loop.
+        """
+        entries, self._async_indexes = list(self._async_indexes.values()), {}
+        for loop, client in entries:
+            if not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, alpha: Optional[float] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        dense_vec, sparse_vec = self._scale(
+            self.embeddings.embed_query(query), self.sparse_encoder.encode_queries(query), alpha
+        )
+        result = self.index.query(**self._query_kwargs(dense_vec, sparse_vec, **kwargs))
+        return self._to_documents([result])[0]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, alpha: Optional[float] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        dense_vec, sparse_vec = await asyncio.gather(
+            timed("embed_query", self.embeddings.aembed_query(query)),
+            timed("bm25_encode", asyncio.to_thread(self.sparse_encoder.encode_queries, query)),
+        )
+        result = await self._aquery(*self._scale(dense_vec, sparse_vec, alpha), **kwargs)
+        return (await self._ato_documents([result]))[0]
+
+    async def asearch_many(
+        self, queries: List[str], filters: Optional[List[Optional[Dict]]] = None, concurrency: Optional[int] = None
+    ) -> List[List[Document]]:
+        """
+        Search for several queries at once, each with its own metadata filter.
+        Distinct queries are embedded in batched calls and BM25-encoded in one
+        worker thread, then the vector queries run concurrently, at most
+        ``concurrency`` at a time when given.
+        """
+        if not queries:
+            return []
+        unique = list(dict.fromkeys(queries))
+        dense_vecs, sparse_vecs = await asyncio.gather(
+            timed("embed_query", aembed_queries(self.embeddings, unique)),
+            timed("bm25_encode", asyncio.to_thread(lambda: [self.sparse_encoder.encode_queries(q) for q in unique])),
+        )
+        vectors = {q: self._scale(d, s) for q, d, s in zip(unique, dense_vecs, sparse_vecs)}
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+        async def query(text: str, f: Optional[Dict]) -> Any:
+            kwargs = {"filter": f} if f else {}
+            if semaphore is None:
+                return await self._aquery(*vectors[text], **kwargs)
+            async with semaphore:
+                return await self._aquery(*vectors[text], **kwargs)
+
+        results = await asyncio.gather(*(
+            query(text, f) for text, f in zip(queries, filters or [None] * len(queries))
+        ))
+        return await self._ato_documents(list(results))
+
+    def _scale(self, dense_vec: List[float], sparse_vec: Dict, alpha: Optional[float] = None) -> tuple:
+        # pinecone_text imports NLTK; the encoder has loaded it by the time a query runs
+        from pinecone_text.hybrid import hybrid_convex_scale
+
+        dense_vec, sparse_vec = hybrid_convex_scale(dense_vec, sparse_vec, self.alpha if alpha is None else alpha)
+        sparse_vec["values"] = [float(s1) for s1 in sparse_vec["values"]]
+        return dense_vec, sparse_vec
+
+    def _query_kwargs(self, dense_vec: List[float], sparse_vec: Dict, **kwargs: Any) -> Dict:
+        return {
+            "vector": dense_vec,
+            "sparse_vector": sparse_vec,
+            "top_k": self.top_k,
+            "include_metadata": True,
+            "namespace": self.namespace,
+            **kwargs,
+        }
+
+    async def _aquery(self, dense_vec: List[float], sparse_vec: Dict, **kwargs: Any) -> Any:
+        query_kwargs = self._query_kwargs(dense_vec, sparse_vec, **kwargs)
+        async_index = self._async_index()
+        with span("vector_query"):
+            if async_index is not None:
+                return await async_index.query(**query_kwargs)
+            return await asyncio.to_thread(self.index.query, **query_kwargs)
+
+    async def _ato_documents(self, results: List[Any]) -> List[List[Document]]:
+        if self.docstore is None:
+            return self._to_documents(results)
+        with span("hydrate"):
+            return await asyncio.to_thread(self._to_documents, results)
+
+    def _to_documents(self, results: List[Any]) -> List[List[Document]]:
+        """Turn query results into documents, reading the hits without text from the docstore."""
+        missing = [
+            res["id"] for result in results for res in result["matches"]
+            if self.text_key not in (res["metadata"] or {})
+        ]
+        stored = self.docstore.get_many(missing) if missing and self.docstore is not None else {}
+
+        documents = []
+        for result in results:
+            hits = []
+            for res in result["matches"]:
+                metadata = res["metadata"] or {}
+                if self.text_key in metadata:
+                    context = metadata.pop(self.text_key)
+                elif res["id"] in stored:
+                    context, full_metadata = stored[res["id"]]
+                    metadata = {**full_metadata, **metadata}
+                else:
+                    logger.warning(f"Chunk {res['id']} has no text in the index or the docstore, skipping it")
+                    continue
+                if "score" not in metadata and "score" in res:
+                    metadata["score"] = res["score"]
+                hits.append(Document(id=res["id"], page_content=context, metadata=metadata))
+            documents.append(hits)
+        return documents
+
+    async def aclose(self) -> None:
+        """Close the asyncio index client created on the running loop."""
+        entry = self._async_indexes.pop(id(asyncio.get_running_loop()), None)
+        if entry is not None:
+            await entry[1].close()
@@ -1,28 +1,61 @@
+import argparse
 import logging
 import json
+import os
 import traceback
+import hashlib
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import pymupdf
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.retrievers import PineconeHybridSearchRetriever
-from pinecone_text.sparse import BM25Encoder
 
-from backend.connect_db import get_index
+from backend.bm25 import (
+    BM25_ENCODER_PATH,
+    LEGACY_BM25_ENCODER_PATH,
+    BM25Stats,
+    FastBM25Encoder,
+    merge_stats,
+)
+from backend.connect_db import get_index, index_identity
+from backend.docstore import DOCSTORE_PATH, DocStore, vector_metadata
+from backend.filters import METADATA_INDEX_PATH, MetadataIndex, date_to_int
+from backend.local_index import LocalHybridIndex
+from backend import metrics
+from backend.manifest import (
+    MANIFEST_PATH,
+    PUBLISHED_PATH,
+    chunk_id,
+    diff_manifest,
+    file_fingerprint,
+    load_manifest,
+    publish_artifacts,
+    save_manifest,
+)
+from backend.pipeline import AdaptiveLimiter, Checkpoint, Spool, batched, run_batches
 from backend.utils import get_embedding_model
 
-index = get_index()
-embedding_model = get_embedding_model()
-
 DOCUMENTS_PATH = Path("data")
 METADATA_PATH = Path("data/metadata.jsonl")
-BM25_ENCODER_PATH = "backend/bm25_encoder.json"
-BATCH_SIZE = 100
+CHECKPOINT_PATH = "backend/index_checkpoint.log"
+# Per-file BM25 statistics, merged into the corpus-wide encoder
+BM25_SHARDS_DIR = "backend/bm25_shards"
+# Relative change in average chunk length that triggers re-encoding all sparse vectors
+BM25_DRIFT_THRESHOLD = float(os.getenv("BM25_DRIFT_THRESHOLD", "0.05"))
+# Where parsed chunks are spooled between passes (default: system temp dir)
+SPOOL_DIR = os.getenv("INDEX_SPOOL_DIR")
+EMBED_BATCH_SIZE = int(os.getenv("INDEX_EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("INDEX_UPSERT_BATCH_SIZE", "100"))
+UPLOAD_CONCURRENCY = int(os.getenv("INDEX_CONCURRENCY", "4"))
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 MIN_CHUNK_LENGTH = 10
+PARSE_WORKERS = os.cpu_count() or 1
+# Optional Prometheus textfile (e.g. for node_exporter) with the run's stage timings
+INDEX_METRICS_PATH = os.getenv("INDEX_METRICS_PATH")
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +102,7 @@ def load_pdf_with_metadata(
                     "title": doc_metadata["title"],
                     "industries": doc_metadata["industries"],
                     "date": doc_metadata["date"],
+                    "date_int": date_to_int(doc_metadata["date"]),
                     "country_codes": doc_metadata["country_codes"],
                 })
         else:
@@ -83,20 +117,77 @@ def load_pdf_with_metadata(
         return [], f"{type(e).__name__} - {str(e)}"
 
 
+def list_pdf_files(folder_path: Path) -> List[Path]:
+    """List PDFs in a stable order so runs are reproducible."""
+    return sorted(folder_path.glob("*.pdf"))
+
+
+def _load_pdf_task(task: Tuple[Path, Dict[str, Dict]]) -> Tuple[List, str]:
+    pdf_file, metadata_lookup = task
+    return load_pdf_with_metadata(pdf_file, metadata_lookup)
+
+
+def _chunk_pdf_task(
+    task: Tuple[Path, Dict[str, Dict]],
+) -> Tuple[List, Optional[BM25Stats], int, Optional[str]]:
+    """Parse, split and filter one PDF and compute its BM25 shard statistics."""
+    documents, error = _load_pdf_task(task)
+    if error:
+        return [], None, 0, error
+    chunks = [
+        doc for doc in make_text_splitter(CHUNK_SIZE, CHUNK_OVERLAP).split_documents(documents)
+        if is_valid_chunk(doc, MIN_CHUNK_LENGTH)
+    ]
+    stats = FastBM25Encoder().compute_stats(doc.page_content for doc in chunks)
+    return chunks, stats, len(documents), None
+
+
+def iter_parsed_pdfs(
+    pdf_files: List[Path],
+    metadata_lookup: Dict[str, Dict],
+    workers: int = 1,
+    task_fn=_load_pdf_task,
+) -> Iterator[Tuple]:
+    """
+    Yield ``(pdf_file, *task_fn(task))`` in the order of ``pdf_files`` (by
+    default ``(pdf_file, pages, error)``), running in a process pool when
+    ``workers > 1``. At most ``2 * workers`` files are processed ahead of the
+    consumer, so memory does not grow with the corpus.
+    """
+    logger.info(f"Loading {len(pdf_files)} PDF files with {workers} worker(s)...")
+
+    # Ship each worker only the metadata entry for its own file
+    tasks = []
+    for pdf_file in pdf_files:
+        file_metadata = metadata_lookup.get(pdf_file.stem)
+        tasks.append((pdf_file, {pdf_file.stem: file_metadata} if file_metadata else {}))
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            in_flight = deque()
+            for task in tasks:
+                in_flight.append((task[0], executor.submit(task_fn, task)))
+                if len(in_flight) >= 2 * workers:
+                    pdf_file, future = in_flight.popleft()
+                    yield (pdf_file, *future.result())
+            while in_flight:
+                pdf_file, future = in_flight.popleft()
+                yield (pdf_file, *future.result())
+    else:
+        for task in tasks:
+            yield (task[0], *task_fn(task))
+
+
 def load_all_pdfs(
-    folder_path: Path,
-    metadata_lookup: Dict[str, Dict]
+    pdf_files: List[Path],
+    metadata_lookup: Dict[str, Dict],
+    workers: int = 1,
 ) -> Tuple[List, List[str]]:
-    logger.info(f"Loading PDFs from {folder_path}...")
-    pdf_files = list(folder_path.glob("*.pdf"))
-    logger.info(f"Found {len(pdf_files)} PDF files")
-
+    """Parse the given PDFs and return all their pages plus per-file errors."""
     all_documents = []
     errors = []
 
-    for pdf_file in pdf_files:
-        documents, error = load_pdf_with_metadata(pdf_file, metadata_lookup)
-        
+    for pdf_file, documents, error in iter_parsed_pdfs(pdf_files, metadata_lookup, workers):
         if error:
             error_msg = f"{pdf_file.name}: {error}"
             errors.append(error_msg)
@@ -107,63 +198,192 @@ def load_all_pdfs(
     return all_documents, errors
 
 
-def split_documents(documents: List, chunk_size: int, chunk_overlap: int) -> List:
-    logger.info("Splitting documents into chunks...")
-    
-    text_splitter = RecursiveCharacterTextSplitter(
+def make_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         add_start_index=True,
     )
-    
-    splits = text_splitter.split_documents(documents)
-    logger.info(f"Created {len(splits)} text chunks")
-    
-    return splits
 
 
-def filter_valid_chunks(splits: List, min_length: int) -> List:
-    """Filter out empty or very short text chunks."""
-    logger.info("Filtering valid chunks...")
-    
-    valid_splits = [
-        doc for doc in splits 
-        if doc.page_content.strip() and len(doc.page_content.strip()) > min_length
-    ]
-    
-    logger.info(f"Valid chunks after filtering: {len(valid_splits)}")
-    
-    if len(valid_splits) == 0:
-        raise ValueError("No valid text chunks found after filtering!")
-    
-    return valid_splits
+def is_valid_chunk(doc, min_length: int) -> bool:
+    return len(doc.page_content.strip()) > min_length
 
 
-def create_and_save_bm25_encoder(corpus_texts: List[str], save_path: str) -> BM25Encoder:
-    logger.info("Initializing and fitting BM25 encoder...")
-    
-    bm25_encoder = BM25Encoder()
-    bm25_encoder.fit(corpus_texts)
-    bm25_encoder.dump(save_path)
-    
-    logger.info(f"✓ BM25 encoder fitted and saved to {save_path}")
-    return bm25_encoder
+def shard_path(name: str, fingerprint: str) -> str:
+    return os.path.join(BM25_SHARDS_DIR, f"{Path(name).stem}-{fingerprint[:16]}.npz")
 
 
-def upload_to_pinecone(retriever: PineconeHybridSearchRetriever, documents: List) -> None:
-    logger.info(f"Uploading {len(documents)} chunks to Pinecone...")
-    
+def corpus_key(fingerprints: Dict[str, str]) -> str:
+    """Identify the set of files a BM25 encoder was fitted on."""
+    return hashlib.sha256(json.dumps(fingerprints, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_previous_encoder() -> Optional[FastBM25Encoder]:
+    for path in (BM25_ENCODER_PATH, LEGACY_BM25_ENCODER_PATH):
+        if os.path.exists(path):
+            return FastBM25Encoder().load(path)
+    return None
+
+
+def spool_pdf_chunks(
+    spool: Spool,
+    pdf_files: List[Path],
+    metadata_lookup: Dict[str, Dict],
+    fingerprints: Dict[str, str],
+    upload_files: set,
+    workers: int = 1,
+) -> Tuple[Dict[str, List[str]], Dict[str, BM25Stats], List[str], int]:
+    """
+    Parse, split and filter ``pdf_files`` (in a process pool when
+    ``workers > 1``) and stream their chunks to ``spool``. Returns the chunk
+    IDs and BM25 shard statistics of every file with chunks, the errors and
+    the number of pages loaded.
+    """
+    ids_by_file = {}
+    shards = {}
+    errors = []
+    total_pages = 0
+
+    for pdf_file, chunks, stats, n_pages, error in iter_parsed_pdfs(
+        pdf_files, metadata_lookup, workers, task_fn=_chunk_pdf_task
+    ):
+        if error:
+            error_msg = f"{pdf_file.name}: {error}"
+            errors.append(error_msg)
+            logger.error(error_msg)
+            continue
+        total_pages += n_pages
+        if not chunks:
+            continue
+        ids, file_ids = assign_chunk_ids(chunks, fingerprints)
+        ids_by_file.update(file_ids)
+        shards[pdf_file.name] = stats
+        upload = pdf_file.name in upload_files
+        for doc, doc_id in zip(chunks, ids):
+            spool.write({
+                "id": doc_id,
+                "text": doc.page_content,
+                "metadata": doc.metadata,
+                "upload": upload,
+            })
+
+    return ids_by_file, shards, errors, total_pages
+
+
+def assign_chunk_ids(
+    splits: List,
+    fingerprints: Dict[str, str],
+) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Give every chunk a deterministic ID derived from its file's fingerprint
+    and its position within the file. Returns the IDs aligned with
+    ``splits`` and the IDs grouped by file name.
+    """
+    ids = []
+    ids_by_file = defaultdict(list)
+
+    for doc in splits:
+        pdf_file = Path(doc.metadata["source"])
+        position = len(ids_by_file[pdf_file.name])
+        doc_id = chunk_id(pdf_file, fingerprints[pdf_file.name], position)
+        ids.append(doc_id)
+        ids_by_file[pdf_file.name].append(doc_id)
+
+    return ids, dict(ids_by_file)
+
+
+def delete_from_pinecone(index, ids: List[str], batch_size: int = UPSERT_BATCH_SIZE) -> None:
+    if not ids:
+        return
+
+    logger.info(f"Deleting {len(ids)} stale vectors from Pinecone...")
+    for start in range(0, len(ids), batch_size):
+        index.delete(ids=ids[start:start + batch_size])
+
+
+def upload_chunks(
+    index,
+    embeddings,
+    sparse_encoder,
+    records: Iterable[Dict],
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    upsert_batch_size: int = UPSERT_BATCH_SIZE,
+    concurrency: int = UPLOAD_CONCURRENCY,
+    checkpoint: Optional[Checkpoint] = None,
+    docstore: Optional[DocStore] = None,
+) -> int:
+    """
+    Embed and upsert spooled chunk records with up to ``concurrency`` batches
+    in flight, so one batch is embedded while another is being upserted.
+    Embedding and upsert calls each adapt their own concurrency to rate
+    limits. With a ``docstore``, each batch's text and metadata are written
+    to it before the upsert and the vectors only carry the filter fields;
+    without one, vectors are laid out as
+    ``PineconeHybridSearchRetriever.add_texts`` writes them. Returns the
+    number of batches uploaded.
+    """
+    embed_limiter = AdaptiveLimiter(concurrency)
+    upsert_limiter = AdaptiveLimiter(concurrency)
+
+    def process(batch: List[Dict]) -> None:
+        texts = [record["text"] for record in batch]
+        with metrics.span("index_embed"):
+            dense_embeds = embed_limiter.call(embeddings.embed_documents, texts)
+        with metrics.span("index_bm25_encode"):
+            sparse_embeds = sparse_encoder.encode_documents(texts)
+
+        if docstore is not None:
+            # Stored first, so every vector a query can return can be hydrated
+            with metrics.span("index_docstore"):
+                docstore.put_many((record["id"], record["text"], record["metadata"]) for record in batch)
+
+        vectors = []
+        for record, dense, sparse in zip(batch, dense_embeds, sparse_embeds):
+            if docstore is not None:
+                metadata = vector_metadata(record["metadata"])
+            else:
+                metadata = {"context": record["text"], **record["metadata"]}
+            vectors.append({
+                "id": record["id"],
+                "sparse_values": {
+                    "indices": sparse["indices"],
+                    "values": [float(v) for v in sparse["values"]],
+                },
+                "values": dense,
+                "metadata": metadata,
+            })
+        for start in range(0, len(vectors), upsert_batch_size):
+            with metrics.span("index_upsert"):
+                upsert_limiter.call(index.upsert, vectors[start:start + upsert_batch_size])
+
+    logger.info(f"Uploading chunks to Pinecone ({concurrency} batch(es) in flight)...")
     try:
-        retriever.add_texts(
-            texts=[doc.page_content for doc in documents],
-            metadatas=[doc.metadata for doc in documents],
-        )
-        logger.info("✓ Upload complete!")
+        uploaded = run_batches(batched(records, embed_batch_size), process, concurrency, checkpoint)
     except Exception as e:
         logger.error(f"✗ Upload failed: {str(e)}")
         logger.error(traceback.format_exc())
         raise
 
+    if embed_limiter.throttled or upsert_limiter.throttled:
+        logger.info(
+            f"Rate limited {embed_limiter.throttled} embedding and "
+            f"{upsert_limiter.throttled} upsert call(s)"
+        )
+    logger.info(f"✓ Upload complete! {uploaded} batch(es) uploaded")
+    return uploaded
+
+
+def upload_run_key(fingerprints: Dict[str, str], upload_files: List[str], embed_batch_size: int) -> str:
+    """Identify an upload by its inputs, so a checkpoint only resumes the same run."""
+    key = {
+        "index": index_identity(),
+        "fingerprints": fingerprints,
+        "upload": sorted(upload_files),
+        "embed_batch_size": embed_batch_size,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
 
 
 def print_summary(total_files: int, errors: List[str], total_pages: int) -> None:
@@ -177,36 +397,208 @@ def print_summary(total_files: int, errors: List[str], total_pages: int) -> None
     print(f"  Total pages loaded: {total_pages}")
     print(f"{separator}\n")
 
-def main():
+def main(
+    workers: int = PARSE_WORKERS,
+    full: bool = False,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    upsert_batch_size: int = UPSERT_BATCH_SIZE,
+    concurrency: int = UPLOAD_CONCURRENCY,
+):
+    timings = metrics.start_timings()
     try:
         metadata_lookup = load_metadata(METADATA_PATH)
 
-        all_documents, errors = load_all_pdfs(DOCUMENTS_PATH, metadata_lookup)
-        
-        pdf_files = list(DOCUMENTS_PATH.glob("*.pdf"))
-        print_summary(len(pdf_files), errors, len(all_documents))
-
-        if not all_documents:
-            logger.error("No documents were loaded successfully. Exiting.")
-            return
+        logger.info(f"Loading PDFs from {DOCUMENTS_PATH}...")
+        pdf_files = list_pdf_files(DOCUMENTS_PATH)
+        logger.info(f"Found {len(pdf_files)} PDF files")
 
-        all_splits = split_documents(all_documents, CHUNK_SIZE, CHUNK_OVERLAP)
+        fingerprints = {
+            pdf_file.name: file_fingerprint(pdf_file, metadata_lookup.get(pdf_file.stem))
+            for pdf_file in pdf_files
+        }
 
-        valid_splits = filter_valid_chunks(all_splits, MIN_CHUNK_LENGTH)
+        manifest = load_manifest(MANIFEST_PATH)
+        migrate = manifest.get("index_name") != index_identity()
+        if migrate:
+            # New index (e.g. a different embedding dimension): index everything
+            manifest = {"index_name": index_identity(), "files": {}}
 
-        corpus_texts = [doc.page_content for doc in valid_splits]
+        changed, removed = diff_manifest(manifest, fingerprints)
+        if full:
+            changed = sorted(fingerprints)
 
-        bm25_encoder = create_and_save_bm25_encoder(corpus_texts, BM25_ENCODER_PATH)
+        logger.info(f"{len(changed)} new or changed, {len(removed)} removed PDF files")
+        if not changed and not removed and os.path.exists(BM25_ENCODER_PATH):
+            logger.info("✓ Index is up to date, nothing to do")
+            return
 
-        retriever = PineconeHybridSearchRetriever(
-            embeddings=embedding_model, 
-            sparse_encoder=bm25_encoder, 
-            index=index
+        indexed = manifest["files"]
+        changed_files = set(changed)
+        unchanged = [name for name in fingerprints if name not in changed_files]
+        # Shard statistics of file versions that are being replaced or removed
+        old_shards = [
+            shard_path(name, indexed[name]["fingerprint"])
+            for name in removed + changed if name in indexed
+        ]
+
+        # BM25 statistics can be updated in place if the saved encoder was
+        # fitted on exactly the files in the manifest; otherwise they are
+        # merged again from the per-file shards
+        previous = None if migrate or full else load_previous_encoder()
+        incremental = (
+            previous is not None
+            and previous.corpus_key == corpus_key({n: e["fingerprint"] for n, e in indexed.items()})
+            and all(os.path.exists(path) for path in old_shards)
         )
-
-        upload_to_pinecone(retriever, valid_splits)
+        parse = list(changed)
+        if not incremental:
+            parse += [n for n in unchanged if not os.path.exists(shard_path(n, fingerprints[n]))]
+
+        with Spool(SPOOL_DIR) as spool:
+            # Pass 1: parse, split and filter file by file, spooling chunks to
+            # disk; workers compute each file's BM25 shard statistics
+            with metrics.span("index_parse"):
+                ids_by_file, shards, errors, total_pages = spool_pdf_chunks(
+                    spool, [DOCUMENTS_PATH / n for n in sorted(parse)],
+                    metadata_lookup, fingerprints, changed_files, workers,
+                )
+            print_summary(len(parse), errors, total_pages)
+            if not total_pages and not unchanged:
+                logger.error("No documents were loaded successfully. Exiting.")
+                return
+
+            # Reduce: merge the shards into corpus-wide statistics
+            if incremental:
+                logger.info(f"Updating BM25 statistics in place ({len(shards)} added, {len(old_shards)} removed shards)")
+                stats = (
+                    previous.stats
+                    - merge_stats(BM25Stats.load(path) for path in old_shards)
+                    + merge_stats(shards.values())
+                )
+            else:
+                logger.info(f"Merging BM25 statistics of {len(fingerprints)} files")
+                stats = merge_stats(
+                    list(shards.values())
+                    + [BM25Stats.load(shard_path(n, fingerprints[n])) for n in unchanged if n not in shards and n in indexed]
+                )
+            if stats.n_docs == 0:
+                raise ValueError("No valid text chunks found after filtering!")
+
+            # Stored document vectors depend on the average chunk length, so
+            # they are only re-encoded once it drifts past the threshold
+            doc_avgdl = (previous.doc_avgdl or previous.avgdl) if previous else None
+            if doc_avgdl is None:
+                reencode = bool(unchanged)
+            else:
+                drift = abs(stats.avgdl - doc_avgdl) / doc_avgdl
+                reencode = drift > BM25_DRIFT_THRESHOLD
+                logger.info(f"BM25 average length drift {drift:.2%} (threshold {BM25_DRIFT_THRESHOLD:.2%})")
+            if reencode:
+                logger.info("Re-encoding the sparse vectors of every file")
+                remaining = [n for n in unchanged if n not in shards]
+                with metrics.span("index_parse"):
+                    more_ids, more_shards, more_errors, _ = spool_pdf_chunks(
+                        spool, [DOCUMENTS_PATH / n for n in remaining],
+                        metadata_lookup, fingerprints, set(remaining), workers,
+                    )
+                ids_by_file.update(more_ids)
+                shards.update(more_shards)
+                errors.extend(more_errors)
+                changed = sorted(fingerprints)
+                doc_avgdl = None
+
+            os.makedirs(BM25_SHARDS_DIR, exist_ok=True)
+            for name, shard in shards.items():
+                shard.save(shard_path(name, fingerprints[name]))
+
+            bm25_encoder = FastBM25Encoder().set_stats(stats, doc_avgdl)
+            upload_count = sum(
+                len(ids_by_file[name]) for name in changed if name in ids_by_file
+            )
+
+            stale_ids = []
+            for name in removed + changed:
+                current_ids = set(ids_by_file.get(name, []))
+                old_ids = indexed.get(name, {}).get("chunk_ids", [])
+                stale_ids.extend(doc_id for doc_id in old_ids if doc_id not in current_ids)
+
+            index = get_index()
+            if migrate and index.describe_index_stats()["total_vector_count"]:
+                # Vectors the manifest does not describe, e.g. a local index
+                # of the old size or a Pinecone index filled before manifests
+                # existed, would otherwise be served next to the new chunks
+                logger.warning(f"Clearing vectors not recorded in the manifest from {index_identity()}")
+                index.delete(delete_all=True)
+            docstore = DocStore(DOCSTORE_PATH)
+            with metrics.span("index_delete"):
+                delete_from_pinecone(index, stale_ids, upsert_batch_size)
+
+            # Pass 2: embed and upsert the changed files' chunks. Local index
+            # writes only persist on save(), so only Pinecone runs checkpoint.
+            checkpoint = None
+            if upload_count and not isinstance(index, LocalHybridIndex):
+                checkpoint = Checkpoint(
+                    CHECKPOINT_PATH, upload_run_key(fingerprints, changed, embed_batch_size)
+                )
+                if checkpoint.committed:
+                    logger.info(f"Resuming upload, skipping {len(checkpoint.committed)} committed batch(es)")
+
+            if upload_count:
+                logger.info(f"{upload_count} chunks from {len(changed)} file(s) to upload")
+                with metrics.span("index_upload"):
+                    upload_chunks(
+                        index,
+                        get_embedding_model(),
+                        bm25_encoder,
+                        (record for record in spool if reencode or record["upload"]),
+                        embed_batch_size=embed_batch_size,
+                        upsert_batch_size=upsert_batch_size,
+                        concurrency=concurrency,
+                        checkpoint=checkpoint,
+                        docstore=docstore,
+                    )
+
+        if isinstance(index, LocalHybridIndex):
+            index.save()
+
+        for name in removed:
+            indexed.pop(name, None)
+        for name in changed:
+            if name in ids_by_file:
+                indexed[name] = {
+                    "fingerprint": fingerprints[name],
+                    "chunk_ids": ids_by_file[name],
+                }
+            else:
+                # Failed to parse: leave it out so the next run retries it
+                indexed.pop(name, None)
+
+        MetadataIndex.build(indexed, metadata_lookup).save(METADATA_INDEX_PATH)
+
+        # Publish the encoder only once its vectors are uploaded, tagged with
+        # the files it describes so the next run can update it in place
+        bm25_encoder.corpus_key = corpus_key({n: e["fingerprint"] for n, e in indexed.items()})
+        bm25_encoder.dump(BM25_ENCODER_PATH)
+        logger.info(f"✓ BM25 encoder saved to {BM25_ENCODER_PATH}")
+        save_manifest(manifest, MANIFEST_PATH)
+        publish_artifacts(PUBLISHED_PATH, corpus_key=bm25_encoder.corpus_key)
+        if checkpoint is not None:
+            checkpoint.clear()
+        # Workers still serving the previous version look these chunks up
+        # until they reload, so they only leave the docstore once it is replaced
+        docstore.delete_many(stale_ids)
+
+        current_shards = {shard_path(n, e["fingerprint"]) for n, e in indexed.items()}
+        for path in old_shards:
+            if path not in current_shards and os.path.exists(path):
+                os.remove(path)
 
         logger.info("✓ All operations completed successfully!")
+        # index_embed and index_upsert add up the time of every batch in flight
+        logger.info(f"Stage timings: {metrics.summary(timings)}")
+        if INDEX_METRICS_PATH:
+            with open(INDEX_METRICS_PATH, "w", encoding="utf-8") as f:
+                f.write(metrics.render())
 
     except Exception as e:
         logger.error(f"Fatal error in main execution: {str(e)}")
@@ -215,4 +607,32 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index the PDFs in data/ into Pinecone")
+    parser.add_argument(
+        "--workers", type=int, default=PARSE_WORKERS,
+        help="Number of processes used to parse PDFs (1 disables the pool)",
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Re-embed and re-upload every file, not only new or changed ones",
+    )
+    parser.add_argument(
+        "--embed-batch-size", type=int, default=EMBED_BATCH_SIZE,
+        help="Chunks per embedding request",
+    )
+    parser.add_argument(
+        "--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE,
+        help="Vectors per upsert request",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=UPLOAD_CONCURRENCY,
+        help="Maximum embedding/upsert batches in flight",
+    )
+    args = parser.parse_args()
+    main(
+        workers=args.workers,
+        full=args.full,
+        embed_batch_size=args.embed_batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        concurrency=args.concurrency,
+    )
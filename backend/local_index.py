@@ -0,0 +1,413 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "backend/local_index")
+
+logger = logging.getLogger(__name__)
+
+_RANGE_OPS = {
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+# Names the saved version that open() loads; replaced atomically by save()
+CURRENT_FILE = "current"
+POSTINGS_FILES = ("postings_tokens.npy", "postings_bounds.npy", "postings_rows.npy", "postings_values.npy")
+
+
+class _MappedRows:
+    """
+    Read-only rows of a saved index (IDs, or metadata as JSON), kept in a
+    memory-mapped file and decoded on access. Worker processes opening the
+    same index share the file's pages instead of each holding the rows.
+    """
+
+    def __init__(self, data_path: Path, offsets_path: Path, as_json: bool):
+        self._offsets = np.load(offsets_path, mmap_mode="r")
+        self._data = (
+            np.memmap(data_path, dtype=np.uint8, mode="r") if self._offsets[-1] else np.zeros(0, dtype=np.uint8)
+        )
+        self._as_json = as_json
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> Any:
+        raw = self._data[self._offsets[row]:self._offsets[row + 1]].tobytes()
+        return json.loads(raw) if self._as_json else raw.decode("utf-8")
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in range(len(self)):
+            yield self[row]
+
+    @staticmethod
+    def write(data_path: Path, offsets_path: Path, rows: Iterable[str]) -> None:
+        encoded = [row.encode("utf-8") for row in rows]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        with open(data_path, "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(offsets_path, offsets)
+
+
+def _invert(indptr: np.ndarray, indices: np.ndarray, values: np.ndarray):
+    """Invert a CSR sparse matrix into per-dimension posting lists."""
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    tokens = np.asarray(indices)[order]
+    unique_tokens, starts = np.unique(tokens, return_index=True)
+    bounds = np.append(starts, len(tokens))
+    return unique_tokens, bounds, rows[order], np.asarray(values)[order]
+
+
+class LocalHybridIndex:
+    """
+    In-process replacement for a Pinecone ``dotproduct`` index with sparse
+    values. It implements the subset of the Pinecone ``Index`` API that
+    ``PineconeHybridSearchRetriever`` and the indexing job use (``upsert``,
+    ``query``, ``delete``, ``describe_index_stats``), so either backend can
+    be plugged in.
+
+    A match scores ``dense · query_dense + sparse · query_sparse``, which is
+    what Pinecone computes for hybrid queries; the retriever applies the
+    alpha weighting to the query vectors before calling ``query``.
+
+    Dense vectors are one float32 matrix and sparse vectors are stored in
+    CSR form, with an inverted posting list over the sparse dimensions for
+    querying. ``save`` writes the arrays, the postings, the IDs and the
+    metadata to a new version directory and then switches the ``current``
+    pointer to it. ``open`` memory-maps all of them, so every server worker
+    opening the index shares one copy in the page cache. An opened index is
+    copied into memory on its first write.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.RLock()
+
+        self._ids: List[str] = []
+        # None until the first write to an opened index (see _writable)
+        self._rows: Optional[Dict[str, int]] = {}
+        self._metadata: List[Dict] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._dense = np.zeros((0, 0), dtype=np.float32)
+        self._sparse_indptr = np.zeros(1, dtype=np.int64)
+        self._sparse_indices = np.zeros(0, dtype=np.uint32)
+        self._sparse_values = np.zeros(0, dtype=np.float32)
+
+        self._postings = None
+        self._field_index: Dict[str, Dict] = {}
+
+    @classmethod
+    def open(cls, path: str = LOCAL_INDEX_PATH) -> "LocalHybridIndex":
+        """Load a saved index with everything memory-mapped, or start an empty one."""
+        root = Path(path)
+        for attempt in range(3):
+            index = cls(path)
+            try:
+                if not (root / CURRENT_FILE).exists():
+                    return index
+                index._open_version(root / (root / CURRENT_FILE).read_text().strip())
+                break
+            except FileNotFoundError:
+                # A concurrent save replaced the version between reading the pointer and its files
+                if attempt == 2:
+                    raise
+        logger.info(f"Opened local index at {path} with {len(index._ids)} vectors")
+        return index
+
+    def _open_version(self, root: Path) -> None:
+        self._ids = _MappedRows(root / "ids.bin", root / "ids_offsets.npy", as_json=False)
+        self._metadata = _MappedRows(root / "metadata.bin", root / "metadata_offsets.npy", as_json=True)
+        self._rows = None
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._dense = np.load(root / "dense.npy", mmap_mode="r")
+        self._sparse_indptr = np.load(root / "sparse_indptr.npy", mmap_mode="r")
+        self._sparse_indices = np.load(root / "sparse_indices.npy", mmap_mode="r")
+        self._sparse_values = np.load(root / "sparse_values.npy", mmap_mode="r")
+        self._postings = tuple(np.load(root / name, mmap_mode="r") for name in POSTINGS_FILES)
+
+    # -- writes ---------------------------------------------------------
+
+    def _writable(self) -> None:
+        """Copy the memory-mapped IDs and metadata of an opened index into memory."""
+        if self._rows is None:
+            self._ids = list(self._ids)
+            self._metadata = list(self._metadata)
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+    def _invalidate(self) -> None:
+        self._postings = None
+        self._field_index = {}
+
+    def upsert(self, vectors: Iterable, namespace: Optional[str] = None, **kwargs) -> Dict:
+        """Insert or replace vectors given as Pinecone-style dicts or tuples."""
+        records = [self._as_record(v) for v in vectors]
+        if not records:
+            return {"upserted_count": 0}
+
+        dense = np.asarray([r["values"] for r in records], dtype=np.float32)
+        if self._dense.shape[0] and dense.shape[1] != self._dense.shape[1]:
+            raise ValueError(
+                f"Vector dimension {dense.shape[1]} does not match index dimension {self._dense.shape[1]}"
+            )
+
+        with self._lock:
+            self._writable()
+            for record in records:
+                old_row = self._rows.get(record["id"])
+                if old_row is not None:
+                    self._alive[old_row] = False
+
+            start = len(self._ids)
+            lengths = [len(r["sparse_values"]["indices"]) for r in records]
+            indptr = self._sparse_indptr[-1] + np.cumsum(lengths, dtype=np.int64)
+
+            self._dense = np.concatenate([self._dense, dense]) if self._dense.shape[0] else dense
+            self._sparse_indptr = np.concatenate([self._sparse_indptr, indptr])
+            self._sparse_indices = np.concatenate(
+                [self._sparse_indices] + [np.asarray(r["sparse_values"]["indices"], dtype=np.uint32) for r in records]
+            )
+            self._sparse_values = np.concatenate(
+                [self._sparse_values] + [np.asarray(r["sparse_values"]["values"], dtype=np.float32) for r in records]
+            )
+            self._alive = np.concatenate([self._alive, np.ones(len(records), dtype=bool)])
+            for offset, record in enumerate(records):
+                self._ids.append(record["id"])
+                self._rows[record["id"]] = start + offset
+                self._metadata.append(record["metadata"])
+            self._invalidate()
+
+        return {"upserted_count": len(records)}
+
+    @staticmethod
+    def _as_record(vector: Any) -> Dict:
+        if isinstance(vector, dict):
+            record = dict(vector)
+        else:
+            record = dict(zip(("id", "values", "metadata"), vector))
+        record.setdefault("metadata", None)
+        record["metadata"] = record["metadata"] or {}
+        record["sparse_values"] = record.get("sparse_values") or {"indices": [], "values": []}
+        return record
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        filter: Optional[Dict] = None,
+        namespace: Optional[str] = None,
+        **kwargs,
+    ) -> Dict:
+        with self._lock:
+            self._writable()
+            if delete_all:
+                self._alive[:] = False
+            if ids:
+                for doc_id in ids:
+                    row = self._rows.pop(doc_id, None)
+                    if row is not None:
+                        self._alive[row] = False
+            if filter:
+                for row in np.flatnonzero(self._alive & self._filter_mask(filter)):
+                    self._rows.pop(self._ids[row], None)
+                    self._alive[row] = False
+            self._invalidate()
+        return {}
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Compact away deleted rows and write the index as a new version, then
+        point ``current`` at it. Processes that opened an earlier version keep
+        reading it from their mappings; older versions are then removed.
+        """
+        root = Path(path) if path else self.path
+        if root is None:
+            raise ValueError("No path given to save the local index to")
+
+        with self._lock:
+            keep = np.flatnonzero(self._alive)
+            starts, ends = self._sparse_indptr[keep], self._sparse_indptr[keep + 1]
+            sparse_rows = [np.arange(s, e) for s, e in zip(starts, ends)]
+            positions = np.concatenate(sparse_rows) if sparse_rows else np.zeros(0, dtype=np.int64)
+            indptr = np.concatenate([[0], np.cumsum(ends - starts)]).astype(np.int64)
+            sparse_indices = np.asarray(self._sparse_indices[positions], dtype=np.uint32)
+            sparse_values = np.asarray(self._sparse_values[positions], dtype=np.float32)
+
+            version = f"v{time.time_ns()}"
+            version_root = root / version
+            version_root.mkdir(parents=True)
+            np.save(version_root / "dense.npy", np.asarray(self._dense[keep], dtype=np.float32))
+            np.save(version_root / "sparse_indptr.npy", indptr)
+            np.save(version_root / "sparse_indices.npy", sparse_indices)
+            np.save(version_root / "sparse_values.npy", sparse_values)
+            for name, array in zip(POSTINGS_FILES, _invert(indptr, sparse_indices, sparse_values)):
+                np.save(version_root / name, array)
+            _MappedRows.write(
+                version_root / "ids.bin", version_root / "ids_offsets.npy", (self._ids[row] for row in keep)
+            )
+            _MappedRows.write(
+                version_root / "metadata.bin", version_root / "metadata_offsets.npy",
+                (json.dumps(self._metadata[row]) for row in keep),
+            )
+
+            tmp_pointer = root / f"{CURRENT_FILE}.tmp"
+            tmp_pointer.write_text(version)
+            os.replace(tmp_pointer, root / CURRENT_FILE)
+
+            for entry in root.iterdir():
+                if entry.is_dir() and entry.name != version:
+                    shutil.rmtree(entry, ignore_errors=True)
+
+        logger.info(f"Saved local index with {len(keep)} vectors to {version_root}")
+
+    # -- reads ----------------------------------------------------------
+
+    def describe_index_stats(self, **kwargs) -> Dict:
+        return {
+            "dimension": int(self._dense.shape[1]) if self._dense.shape[0] else None,
+            "total_vector_count": int(self._alive.sum()),
+        }
+
+    def _sparse_scores(self, sparse_vector: Dict, n_rows: int) -> np.ndarray:
+        scores = np.zeros(n_rows, dtype=np.float32)
+        if not sparse_vector or not len(sparse_vector.get("indices", [])):
+            return scores
+        if self._postings is None:
+            self._postings = _invert(self._sparse_indptr, self._sparse_indices, self._sparse_values)
+        tokens, bounds, post_rows, post_values = self._postings
+
+        query_tokens = np.asarray(sparse_vector["indices"], dtype=np.uint32)
+        query_values = np.asarray(sparse_vector["values"], dtype=np.float32)
+        slots = np.searchsorted(tokens, query_tokens)
+        for slot, token, weight in zip(slots, query_tokens, query_values):
+            if slot < len(tokens) and tokens[slot] == token:
+                start, end = bounds[slot], bounds[slot + 1]
+                scores[post_rows[start:end]] += post_values[start:end] * weight
+        return scores
+
+    def query(
+        self,
+        vector: Optional[List[float]] = None,
+        sparse_vector: Optional[Dict] = None,
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: Optional[Dict] = None,
+        namespace: Optional[str] = None,
+        **kwargs,
+    ) -> Dict:
+        with self._lock:
+            n_rows = len(self._ids)
+            if n_rows == 0:
+                return {"matches": [], "namespace": namespace or ""}
+
+            if vector is not None:
+                scores = np.asarray(self._dense @ np.asarray(vector, dtype=np.float32), dtype=np.float32)
+            else:
+                scores = np.zeros(n_rows, dtype=np.float32)
+            scores += self._sparse_scores(sparse_vector, n_rows)
+
+            candidates = self._alive if filter is None else self._alive & self._filter_mask(filter)
+            scores = np.where(candidates, scores, -np.inf)
+
+            k = min(top_k, int(candidates.sum()))
+            if k == 0:
+                return {"matches": [], "namespace": namespace or ""}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            matches = []
+            for row in top:
+                match = {"id": self._ids[row], "score": float(scores[row])}
+                if include_metadata:
+                    match["metadata"] = dict(self._metadata[row])
+                if include_values:
+                    match["values"] = self._dense[row].tolist()
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    # -- metadata filters -----------------------------------------------
+
+    def _field(self, name: str) -> Dict:
+        """
+        Lazily build a per-field index: value -> rows (list values are
+        indexed per element) and a numeric column for range operators.
+        """
+        field = self._field_index.get(name)
+        if field is not None:
+            return field
+
+        postings: Dict[Any, List[int]] = {}
+        numeric = np.full(len(self._ids), np.nan)
+        for row, metadata in enumerate(self._metadata):
+            value = metadata.get(name)
+            if value is None:
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                postings.setdefault(item, []).append(row)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                numeric[row] = value
+
+        field = {
+            "postings": {v: np.asarray(rows, dtype=np.int64) for v, rows in postings.items()},
+            "numeric": numeric,
+        }
+        self._field_index[name] = field
+        return field
+
+    def _rows_mask(self, name: str, values: Iterable) -> np.ndarray:
+        mask = np.zeros(len(self._ids), dtype=bool)
+        postings = self._field(name)["postings"]
+        for value in values:
+            rows = postings.get(value)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def _filter_mask(self, filter: Dict) -> np.ndarray:
+        """Evaluate a Pinecone metadata filter to a boolean row mask."""
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in filter.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._filter_mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self._ids), dtype=bool)
+                for sub in condition:
+                    any_mask |= self._filter_mask(sub)
+                mask &= any_mask
+            elif isinstance(condition, dict):
+                for op, operand in condition.items():
+                    mask &= self._condition_mask(key, op, operand)
+            else:
+                mask &= self._condition_mask(key, "$eq", condition)
+        return mask
+
+    def _condition_mask(self, name: str, op: str, operand: Any) -> np.ndarray:
+        if op == "$eq":
+            return self._rows_mask(name, [operand])
+        if op == "$in":
+            return self._rows_mask(name, operand)
+        if op == "$ne":
+            return ~self._rows_mask(name, [operand])
+        if op == "$nin":
+            return ~self._rows_mask(name, operand)
+        if op == "$exists":
+            present = np.array([name in m for m in self._metadata], dtype=bool)
+            return present if operand else ~present
+        if op in _RANGE_OPS:
+            numeric = self._field(name)["numeric"]
+            with np.errstate(invalid="ignore"):
+                return _RANGE_OPS[op](numeric, operand)
+        raise ValueError(f"Unsupported filter operator: {op}")
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_PATH = "backend/index_manifest.json"
+# Rewritten after every other artifact of an indexing run; servers reload
+# when it changes, so they never pick up a half-published set of artifacts
+PUBLISHED_PATH = "backend/published.json"
+
+logger = logging.getLogger(__name__)
+
+
+def file_fingerprint(pdf_file: Path, file_metadata: Optional[Dict] = None) -> str:
+    """
+    Hash the PDF bytes together with its metadata.jsonl entry, so edits to
+    either one mark the file as changed.
+    """
+    digest = hashlib.sha256()
+    with open(pdf_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    if file_metadata:
+        digest.update(json.dumps(file_metadata, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def chunk_id(pdf_file: Path, fingerprint: str, position: int) -> str:
+    """Deterministic vector ID for the ``position``-th chunk of a file."""
+    return f"{pdf_file.stem}-{fingerprint[:16]}-{position}"
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"index_name": None, "files": {}}
+
+
+def save_manifest(manifest: Dict, path: str = MANIFEST_PATH) -> None:
+    """Write the manifest atomically so a crash never leaves it half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def diff_manifest(
+    manifest: Dict,
+    fingerprints: Dict[str, str],
+) -> Tuple[List[str], List[str]]:
+    """
+    Compare current file fingerprints (by file name) with the manifest.
+
+    Returns the names of new or changed files and of files that were removed.
+    """
+    indexed = manifest.get("files", {})
+    changed = sorted(
+        name for name, fingerprint in fingerprints.items()
+        if indexed.get(name, {}).get("fingerprint") != fingerprint
+    )
+    removed = sorted(name for name in indexed if name not in fingerprints)
+    return changed, removed
+
+
+def publish_artifacts(path: str = PUBLISHED_PATH, **info) -> None:
+    """Mark the artifacts of the finished indexing run as ready to serve."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"published_at": time.time(), **info}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
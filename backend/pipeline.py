@@ -0,0 +1,211 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+MAX_RETRIES = int(os.getenv("INDEX_MAX_RETRIES", "6"))
+RETRY_BACKOFF = float(os.getenv("INDEX_RETRY_BACKOFF", "1.0"))
+MAX_RETRY_BACKOFF = 60.0
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Recognise HTTP 429 / quota errors from the Gemini and Pinecone clients."""
+    for attr in ("status_code", "status", "code"):
+        if getattr(error, attr, None) == 429:
+            return True
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "rate limit", "resource exhausted", "quota"))
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for calls to a rate-limited API, adjusted AIMD-style:
+    every success raises the limit by ``1 / limit`` (about one slot per round
+    of calls) and every rate-limit error halves it. Rate-limited calls are
+    retried with jittered exponential backoff; other errors are raised.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, max_retries: int = MAX_RETRIES):
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.max_retries = max_retries
+        self.limit = float(self.max_limit)
+        self.throttled = 0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def _acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def _release(self, rate_limited: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if rate_limited:
+                self.throttled += 1
+                self.limit = max(float(self.min_limit), self.limit / 2)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                self._release(rate_limited)
+                if not rate_limited or attempt == self.max_retries:
+                    raise
+                delay = min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logger.warning(f"Rate limited, retrying in {delay:.1f}s (limit now {int(self.limit)})")
+                time.sleep(delay)
+                continue
+            self._release(False)
+            return result
+        raise RuntimeError("unreachable")
+
+
+class Checkpoint:
+    """
+    Append-only log of the batch numbers committed by an indexing run. The
+    first line is a key identifying the run's inputs; a log written for
+    different inputs is discarded. Only newline-terminated lines count, so a
+    line cut short by a crash is ignored.
+    """
+
+    def __init__(self, path: str, run_key: str):
+        self.path = path
+        self.run_key = run_key
+        self.committed = set()
+        self._lock = threading.Lock()
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().split("\n")[:-1]
+        except FileNotFoundError:
+            lines = []
+
+        if lines and lines[0] == run_key:
+            self.committed = {int(line) for line in lines[1:]}
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+            self._file.write(f"{run_key}\n")
+            self._file.flush()
+
+    def commit(self, number: int) -> None:
+        with self._lock:
+            self._file.write(f"{number}\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.committed.add(number)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def clear(self) -> None:
+        """Remove the log once the run has completed."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def run_batches(
+    batches: Iterable[T],
+    process: Callable[[T], None],
+    concurrency: int,
+    checkpoint: Optional[Checkpoint] = None,
+) -> int:
+    """
+    Run ``process`` over numbered ``batches`` on ``concurrency`` threads.
+
+    Batches are pulled lazily, so at most ``2 * concurrency`` are held in
+    memory. Batches already in ``checkpoint`` are skipped and each batch is
+    committed to it once processed. The first failure stops new submissions
+    and is raised after the batches in flight have finished, so a re-run
+    resumes after the last committed batch. Returns the number processed.
+    """
+    processed = 0
+
+    def run_one(number: int, batch: T) -> None:
+        process(batch)
+        if checkpoint is not None:
+            checkpoint.commit(number)
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = set()
+    try:
+        for number, batch in enumerate(batches):
+            if checkpoint is not None and number in checkpoint.committed:
+                continue
+            while len(pending) >= 2 * concurrency:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                    processed += 1
+            # Each batch runs in a copy of the caller's context (e.g. its stage timings)
+            pending.add(executor.submit(contextvars.copy_context().run, run_one, number, batch))
+
+        for future in wait(pending).done:
+            future.result()
+            processed += 1
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return processed
+
+
+class Spool:
+    """Temporary JSONL file that a stage streams records to and reads back."""
+
+    def __init__(self, directory: Optional[str] = None):
+        fd, self.path = tempfile.mkstemp(prefix="index-spool-", suffix=".jsonl", dir=directory)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self.count += 1
+
+    def __iter__(self) -> Iterator[Dict]:
+        self._file.flush()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def close(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "Spool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
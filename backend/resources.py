@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from backend.bm25 import BM25_ENCODER_PATH, LEGACY_BM25_ENCODER_PATH, FastBM25Encoder
+from backend.connect_db import VECTOR_STORE, async_index_factory, get_index
+from backend.docstore import DOCSTORE_PATH, DocStore
+from backend.filters import METADATA_INDEX_PATH, MetadataIndex
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from backend.local_index import CURRENT_FILE, LOCAL_INDEX_PATH
+from backend.manifest import PUBLISHED_PATH
+from backend.utils import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetrievalResources:
+    """Clients and artifacts shared by every retrieval call in the process."""
+    bm25_encoder: FastBM25Encoder
+    embedding_model: Any
+    index: Any
+    retriever: AsyncHybridSearchRetriever
+    artifacts_mtime: float
+    warmup_seconds: float
+    version: int
+    # Absent until the indexer has written backend/metadata_index.json
+    metadata_index: Optional[MetadataIndex] = None
+
+
+_resources: Optional[RetrievalResources] = None
+_lock = threading.Lock()
+_version = 0
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _artifacts_mtime(bm25_path: Optional[str] = None) -> float:
+    """
+    When the indexing job last published its artifacts. Without a publish
+    marker (an index built before it existed, or artifacts written by hand),
+    the latest change to any of the files it rewrites.
+    """
+    published = _mtime(PUBLISHED_PATH)
+    if published:
+        return published
+    mtime = max(_mtime(bm25_path or BM25_ENCODER_PATH), _mtime(METADATA_INDEX_PATH))
+    if VECTOR_STORE == "local":
+        mtime = max(mtime, _mtime(os.path.join(LOCAL_INDEX_PATH, CURRENT_FILE)))
+    return mtime
+
+
+def _load_bm25_encoder(path: str) -> FastBM25Encoder:
+    if not os.path.exists(path) and os.path.exists(LEGACY_BM25_ENCODER_PATH):
+        logger.warning(f"{path} not found, loading legacy {LEGACY_BM25_ENCODER_PATH}")
+        path = LEGACY_BM25_ENCODER_PATH
+    return FastBM25Encoder().load(path)
+
+
+def build_resources(
+    bm25_path: Optional[str] = None,
+    embedding_model: Any = None,
+    index: Any = None,
+) -> RetrievalResources:
+    """Build the retrieval stack, reusing any clients that are passed in."""
+    global _version
+
+    if bm25_path is None:
+        bm25_path = BM25_ENCODER_PATH
+
+    start = time.perf_counter()
+    artifacts_mtime = _artifacts_mtime(bm25_path)
+    bm25_encoder = _load_bm25_encoder(bm25_path)
+    metadata_index = MetadataIndex.load(METADATA_INDEX_PATH)
+
+    if embedding_model is None:
+        embedding_model = get_embedding_model()
+    if index is None:
+        index = get_index()
+
+    retriever = AsyncHybridSearchRetriever(
+        embeddings=embedding_model,
+        sparse_encoder=bm25_encoder,
+        index=index,
+        async_index_factory=async_index_factory(index),
+        docstore=DocStore.open(DOCSTORE_PATH),
+    )
+
+    _version += 1
+    resources = RetrievalResources(
+        bm25_encoder=bm25_encoder,
+        embedding_model=embedding_model,
+        index=index,
+        retriever=retriever,
+        artifacts_mtime=artifacts_mtime,
+        warmup_seconds=time.perf_counter() - start,
+        version=_version,
+        metadata_index=metadata_index,
+    )
+    logger.info(
+        f"Retrieval resources v{resources.version} ready in "
+        f"{resources.warmup_seconds * 1000:.1f} ms"
+    )
+    return resources
+
+
+def load_resources() -> RetrievalResources:
+    """Build the shared resources if they do not exist yet (startup hook)."""
+    global _resources
+    with _lock:
+        if _resources is None:
+            _resources = build_resources()
+        return _resources
+
+
+def reload_resources(full: bool = True) -> RetrievalResources:
+    """
+    Rebuild the shared resources. With ``full=False`` only the artifacts
+    written by the indexing job are re-read, if they changed, and the
+    embedding client (and a remote index client) are kept.
+    """
+    global _resources
+    with _lock:
+        previous = _resources
+        if full or _resources is None:
+            _resources = build_resources()
+        elif _artifacts_mtime() != _resources.artifacts_mtime:
+            _resources = build_resources(
+                embedding_model=_resources.embedding_model,
+                # A local index is itself an artifact, so it is reopened
+                index=None if VECTOR_STORE == "local" else _resources.index,
+            )
+        if previous is not None and _resources is not previous:
+            _hand_over(previous, _resources)
+        return _resources
+
+
+def _hand_over(previous: RetrievalResources, resources: RetrievalResources) -> None:
+    """
+    Pass the replaced retriever's asyncio index clients (and their
+    connection pools) on to the new one when the index is the same, or close
+    them, so reloads do not leak a client per event loop.
+    """
+    if resources.index is previous.index:
+        resources.retriever.adopt_async_clients(previous.retriever)
+    else:
+        previous.retriever.close_async_clients()
+
+
+def get_resources() -> RetrievalResources:
+    """
+    Return the shared resources, building them on first use and re-reading
+    the BM25 encoder (and a local index) when they have changed on disk.
+    """
+    resources = _resources
+    if resources is None:
+        return load_resources()
+    if _artifacts_mtime() != resources.artifacts_mtime:
+        logger.info("Retrieval artifacts changed on disk, reloading")
+        return reload_resources(full=False)
+    return resources
+
+
+async def aget_resources() -> RetrievalResources:
+    """
+    ``get_resources`` for the event loop: the common case only stats the
+    artifacts, while a first load or a reload runs in a worker thread.
+    """
+    resources = _resources
+    if resources is None or _artifacts_mtime() != resources.artifacts_mtime:
+        return await asyncio.to_thread(get_resources)
+    return resources
+
+
+def current_resources() -> Optional[RetrievalResources]:
+    """Return the shared resources if they are loaded, without building them."""
+    return _resources
+
+
+async def aclose_resources() -> None:
+    """Close async clients opened on the running loop, then drop the resources."""
+    resources = _resources
+    if resources is not None and hasattr(resources.retriever, "aclose"):
+        await resources.retriever.aclose()
+    clear_resources()
+
+
+def clear_resources() -> None:
+    """Drop the shared resources (used on shutdown and in tests)."""
+    global _resources
+    with _lock:
+        _resources = None
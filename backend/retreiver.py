@@ -1,28 +1,95 @@
-from pinecone_text.sparse import BM25Encoder
-from langchain_community.retrievers import PineconeHybridSearchRetriever
-from langchain.tools import tool
+import logging
+from contextvars import ContextVar
+from typing import List, Optional
 
-from backend.connect_db import get_index
-from backend.utils import get_embedding_model
+from langchain_core.tools import tool
+from langchain_core.documents import Document
+from pydantic import ValidationError
 
+from backend.context import pack_context
+from backend.filters import build_filter, merge_filters
+from backend.metrics import span
+from backend.resources import aget_resources
+from backend.schemas import SearchFilters
 
-@tool
-def retrieve_context(query: str) -> str:
+logger = logging.getLogger(__name__)
+
+# Filters sent with the current /ask request; they apply to every retrieval it makes
+request_filters: ContextVar[Optional[SearchFilters]] = ContextVar("request_filters", default=None)
+
+
+def format_documents(documents: List[Document]) -> str:
+    with span("context_packing"):
+        return pack_context(documents).text
+
+
+async def retrieve_documents(query: str, filters: Optional[SearchFilters] = None, **kwargs) -> List[Document]:
     """
-    Retrieve the most relevant context passages from the vector database
-    for a given user query.
+    Hybrid search restricted to chunks matching ``filters``. The filter is
+    pushed down into the vector query; when the metadata index shows that
+    no chunk can match, the query is skipped. ``kwargs`` (``top_k``,
+    ``alpha``) override the retriever's settings.
     """
-    bm25_encoder = BM25Encoder().load("backend/bm25_encoder.json")
+    resources = await aget_resources()
+    metadata_filter = build_filter(filters)
+    if metadata_filter is None:
+        with span("retrieval"):
+            return await resources.retriever.ainvoke(query, **kwargs)
 
-    embedding_model  = get_embedding_model()
-    index = get_index()
+    if resources.metadata_index is not None and resources.metadata_index.count(filters) == 0:
+        logger.info(f"No indexed chunks match {metadata_filter}, skipping the vector query")
+        return []
+    with span("retrieval"):
+        return await resources.retriever.ainvoke(query, filter=metadata_filter, **kwargs)
 
-    retriever = PineconeHybridSearchRetriever(
-        embeddings=embedding_model, sparse_encoder=bm25_encoder, index=index
+
+async def retrieve_many(
+    queries: List[str], filters: List[Optional[SearchFilters]], concurrency: Optional[int] = None
+) -> List[List[Document]]:
+    """
+    ``retrieve_documents`` for several queries, each with its own filters.
+    The queries are embedded in batched calls and the vector queries run
+    concurrently, at most ``concurrency`` at a time (see
+    ``AsyncHybridSearchRetriever.asearch_many``).
+    """
+    resources = await aget_resources()
+    metadata_filters = [build_filter(f) for f in filters]
+    searchable = [
+        i for i, (f, metadata_filter) in enumerate(zip(filters, metadata_filters))
+        if metadata_filter is None or resources.metadata_index is None or resources.metadata_index.count(f) > 0
+    ]
+    results: List[List[Document]] = [[] for _ in queries]
+    found = await resources.retriever.asearch_many(
+        [queries[i] for i in searchable], [metadata_filters[i] for i in searchable], concurrency
     )
+    for i, documents in zip(searchable, found):
+        results[i] = documents
+    return results
 
-    result = retriever.invoke(query)
-    contents = "\n\n---\n\n".join([doc.page_content for doc in result])
 
-    return contents
+@tool
+async def retrieve_context(
+    query: str,
+    industries: Optional[List[str]] = None,
+    country_codes: Optional[List[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> str:
+    """
+    Retrieve the most relevant context passages from the vector database
+    for a given user query. Optionally restrict the search to documents
+    covering any of the given industries or ISO country codes (e.g. "US"),
+    or published between date_from and date_to (YYYY-MM-DD, inclusive).
+    """
+    try:
+        tool_filters = SearchFilters(
+            industries=industries, country_codes=country_codes, date_from=date_from, date_to=date_to
+        )
+    except ValidationError as e:
+        return f"Invalid filters: {e.errors()[0]['msg']}"
 
+    # Filters chosen by the user take precedence over the model's
+    result = await retrieve_documents(query, merge_filters(tool_filters, request_filters.get()))
+    contents = format_documents(result)
+
+    return contents
@@ -1,24 +1,103 @@
 from fastapi import HTTPException, APIRouter
 from fastapi.responses import StreamingResponse
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response
 
+import asyncio
 import json
+import logging
+import time
 
-from backend.generator import generate_chat
-from backend.schemas import Question
+from backend.answer_cache import ANSWER_CACHE_ENABLED, AnswerCache, corpus_version, normalize_question
+from backend.batch import BATCH_MAX_QUESTIONS, answer_batch
+from backend.coalesce import COALESCE_ENABLED, RequestCoalescer
+from backend.context import context_stats
+from backend.filters import filter_key
+from backend.generator import generate_chat, generate_direct, resolve_mode
+from backend import metrics
+from backend.resources import current_resources, reload_resources
+from backend.retreiver import request_filters
+from backend.schemas import BatchRequest, Question, SearchRequest
+from backend.search import SEARCH_CACHE_ENABLED, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, search
+from backend.streaming import chunk_frame, coalesce_chunks, done_frame
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
+coalescer = RequestCoalescer() if COALESCE_ENABLED else None
+search_cache = AnswerCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL) if SEARCH_CACHE_ENABLED else None
+
 
 @router.post("/ask")
 async def ask_question(question: Question):
     try:
+        mode = resolve_mode(question.mode)
+        generate = generate_direct if mode == "direct" else generate_chat
+        scope = filter_key(question.filters)
+
+        # Whether the answer was generated or replayed from the answer cache
+        status = {"source": "generated"}
+
+        async def answer_stream():
+            version = None
+            if answer_cache is not None:
+                version = corpus_version()
+                cached = answer_cache.get(question.question, version, (mode, scope))
+                if cached is not None:
+                    # Replay the stored answer in the same frames as a live run
+                    status["source"] = "cache"
+                    for chunk in cached:
+                        yield chunk
+                    return
+
+            if coalescer is not None:
+                # Identical questions in flight share one run
+                key = (mode, scope, normalize_question(question.question))
+                stream = coalescer.stream(key, lambda: generate(question.question))
+            else:
+                stream = generate(question.question)
+
+            chunks = []
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+
+            if answer_cache is not None and chunks:
+                answer_cache.put(question.question, chunks, version, (mode, scope))
+
         async def stream_generator():
-            answer = ""
-            async for chunk in generate_chat(question.question):
-                answer += chunk
-                yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
-            
+            # Every retrieval made while answering is restricted to the filters
+            # and timed into this request's breakdown
+            request_filters.set(question.filters)
+            timings = metrics.start_timings()
+            start = time.perf_counter()
+            outcome = "error"
+            done = {}
+            try:
+                async for chunk in coalesce_chunks(answer_stream()):
+                    if "first_chunk" not in timings:
+                        timings["first_chunk"] = time.perf_counter() - start
+                        metrics.ASK_TTFT_SECONDS.observe(timings["first_chunk"], mode=mode)
+                    yield chunk_frame(chunk)
+                outcome = status["source"]
+            except Exception as e:
+                logger.error(f"✗ Answer stream failed: {str(e)}")
+                done["error"] = str(e)
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client disconnected; leaving the stream cancels the generation
+                outcome = "cancelled"
+                raise
+            finally:
+                timings["total"] = time.perf_counter() - start
+                metrics.ASK_SECONDS.observe(timings["total"], mode=mode)
+                metrics.ASK_REQUESTS.inc(mode=mode, status=outcome)
+
+            if question.timings:
+                done["source"] = outcome
+                done["timings_ms"] = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+            yield done_frame(**done)
+
         return StreamingResponse(
             stream_generator(),
             media_type="text/event-stream",
@@ -29,7 +108,76 @@ async def ask_question(question: Question):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+
+@router.post("/ask/batch")
+async def ask_batch(batch: BatchRequest):
+    if len(batch.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch, got {len(batch.questions)}"
+        )
+    try:
+        for question in batch.questions:
+            resolve_mode(question.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async def result_lines():
+        async for result in answer_batch(batch.questions, batch.concurrency, answer_cache):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+
+@router.post("/search")
+async def search_chunks(request: SearchRequest):
+    try:
+        result = await search(request, search_cache)
+    except Exception as e:
+        metrics.SEARCH_REQUESTS.inc(status="error")
+        logger.error(f"✗ Search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    # Serialized directly: FastAPI's encoder costs more than the search on a cache hit
+    return Response(json.dumps(result), media_type="application/json")
+
+
+@router.post("/reload")
+async def reload_retrieval_resources():
+    try:
+        resources = await asyncio.to_thread(reload_resources)
+        if answer_cache is not None:
+            answer_cache.clear()
+        if search_cache is not None:
+            search_cache.clear()
+        return {
+            "version": resources.version,
+            "warmup_seconds": resources.warmup_seconds,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stats")
+async def get_stats():
+    stats = {}
+    resources = current_resources()
+    if resources is not None and hasattr(resources.embedding_model, "stats"):
+        stats["embedding_cache"] = resources.embedding_model.stats()
+    if answer_cache is not None:
+        stats["answer_cache"] = answer_cache.stats()
+    if search_cache is not None:
+        stats["search_cache"] = search_cache.stats()
+    if coalescer is not None:
+        stats["coalescing"] = coalescer.stats()
+    stats["context"] = context_stats.stats()
+    return stats
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/")
 async def serve_frontend():
     return FileResponse(path="frontend/index.html", media_type="text/html")
@@ -1,5 +1,55 @@
-from pydantic import BaseModel
+from datetime import date
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# Deepest ranked result /search can reach: Pinecone returns at most 1000
+# matches per query when metadata is included
+MAX_SEARCH_DEPTH = 1000
+
+
+class SearchFilters(BaseModel):
+    """Restrict retrieval to chunks whose document metadata matches."""
+    # A chunk matches if it has any of the listed values
+    industries: Optional[List[str]] = None
+    country_codes: Optional[List[str]] = None
+    # Inclusive range on the document date
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
 
 
 class Question(BaseModel):
     question: str
+    # Generation mode for this request; the server's GENERATION_MODE when unset
+    mode: Optional[Literal["agent", "direct"]] = None
+    filters: Optional[SearchFilters] = None
+    # End the stream with a done event carrying the per-stage timing breakdown
+    timings: bool = False
+
+
+class BatchQuestion(Question):
+    # Echoed back in the result, to match answers to questions
+    id: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    questions: List[BatchQuestion]
+    # Answers generated at once; capped by the server's BATCH_CONCURRENCY
+    concurrency: Optional[int] = Field(default=None, ge=1)
+
+
+class SearchRequest(BaseModel):
+    query: str
+    filters: Optional[SearchFilters] = None
+    # Results per page, and how many ranked results to skip
+    top_k: int = Field(default=10, ge=1, le=100)
+    offset: int = Field(default=0, ge=0)
+    # Weight of the dense score against BM25; the retriever's alpha when unset
+    alpha: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+
+    @model_validator(mode="after")
+    def check_depth(self) -> "SearchRequest":
+        # One result past the page is fetched to tell whether there is a next one
+        if self.offset + self.top_k + 1 > MAX_SEARCH_DEPTH:
+            raise ValueError(f"offset + top_k must be below {MAX_SEARCH_DEPTH}")
+        return self
@@ -0,0 +1,70 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from backend import metrics
+from backend.answer_cache import corpus_version
+from backend.filters import filter_key
+from backend.retreiver import retrieve_documents
+from backend.schemas import SearchRequest
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "4096"))
+
+
+def search_hit(document: Document) -> Dict[str, Any]:
+    """One ranked chunk as returned by /search; ``page`` is 1-based, as in citations."""
+    metadata = document.metadata
+    page = metadata.get("page")
+    return {
+        "id": document.id,
+        "score": metadata.get("score"),
+        "text": document.page_content,
+        "title": metadata.get("title"),
+        "page": int(page) + 1 if page is not None else None,
+        "date": metadata.get("date"),
+        "industries": metadata.get("industries"),
+        "country_codes": metadata.get("country_codes"),
+        "document_id": metadata.get("uuid"),
+    }
+
+
+async def search(request: SearchRequest, cache: Any = None) -> Dict[str, Any]:
+    """
+    Ranked hybrid-search results for ``request``, one page of ``top_k``
+    after ``offset``, without calling the LLM. One result more than the page
+    is fetched to tell whether there is a next page. Pages are cached in
+    ``cache`` (an ``AnswerCache``) per query, filters, page and alpha until
+    the corpus changes.
+    """
+    start = time.perf_counter()
+    scope = (filter_key(request.filters), request.top_k, request.offset, request.alpha)
+    version = None
+    source = "search"
+    hits: Optional[List[Dict[str, Any]]] = None
+    if cache is not None:
+        version = corpus_version()
+        hits = cache.get(request.query, version, scope)
+        source = "cache" if hits is not None else source
+
+    if hits is None:
+        kwargs = {"top_k": request.offset + request.top_k + 1}
+        if request.alpha is not None:
+            kwargs["alpha"] = request.alpha
+        documents = await retrieve_documents(request.query, request.filters, **kwargs)
+        hits = [search_hit(doc) for doc in documents[request.offset:]]
+        if cache is not None:
+            cache.put(request.query, hits, version, scope)
+
+    metrics.SEARCH_SECONDS.observe(time.perf_counter() - start)
+    metrics.SEARCH_REQUESTS.inc(status=source)
+    return {
+        "query": request.query,
+        "results": hits[:request.top_k],
+        "offset": request.offset,
+        "next_offset": request.offset + request.top_k if len(hits) > request.top_k else None,
+        "source": source,
+    }
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Optional
+
+# Chunks arriving within this window after the first buffered one are sent
+# as one SSE frame; 0 sends every chunk as its own frame
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "50")) / 1000
+# A frame is sent as soon as this many characters are buffered
+SSE_FLUSH_CHARS = int(os.getenv("SSE_FLUSH_CHARS", "512"))
+
+_END = object()
+
+
+def chunk_frame(chunk: str) -> str:
+    """The ``data:`` frame of one answer chunk, as ``json.dumps`` would write it."""
+    return f'data: {{"chunk": {json.dumps(chunk)}, "done": false}}\n\n'
+
+
+def done_frame(**fields) -> str:
+    """The terminal frame of a stream, with any extra fields (e.g. timings or an error)."""
+    return f"data: {json.dumps({'chunk': '', 'done': True, **fields})}\n\n"
+
+
+async def coalesce_chunks(
+    stream: AsyncIterator[str],
+    interval: Optional[float] = None,
+    max_chars: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Merge the chunks of ``stream`` into fewer, larger ones. The first chunk
+    is passed on at once so the time to first token is unchanged; later
+    chunks are held for at most ``interval`` seconds or until ``max_chars``
+    characters are buffered. ``stream`` is consumed in its own task, which
+    is cancelled as soon as the caller stops iterating (e.g. the client
+    disconnected), so the generation behind it stops too. The limits
+    default to ``SSE_FLUSH_INTERVAL`` and ``SSE_FLUSH_CHARS``.
+    """
+    interval = SSE_FLUSH_INTERVAL if interval is None else interval
+    max_chars = SSE_FLUSH_CHARS if max_chars is None else max_chars
+    if interval <= 0:
+        async for chunk in stream:
+            yield chunk
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for chunk in stream:
+                queue.put_nowait(chunk)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(_END)
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(pump())
+    buffer = []
+    size = 0
+    deadline = None
+    first = True
+    try:
+        while True:
+            item = None
+            if deadline is None:
+                item = await queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    pass
+
+            if isinstance(item, str):
+                buffer.append(item)
+                size += len(item)
+                if not first and size < max_chars:
+                    if deadline is None:
+                        deadline = loop.time() + interval
+                    continue
+                first = False
+
+            # Flush on the first chunk, a full buffer, the end of the window or of the stream
+            if size:
+                yield "".join(buffer)
+            buffer, size, deadline = [], 0, None
+            if isinstance(item, Exception):
+                raise item
+            if item is _END:
+                return
+    finally:
+        task.cancel()
@@ -52,3 +52,8 @@ Your goal is to be a reliable, accurate, and helpful analytical assistant that m
 {input}
 
 Please provide a comprehensive answer based solely on the information in the retrieved documents above. If the information is not available in the documents, clearly state that."""
+
+# Direct mode retrieves before the single LLM call, so the passages are part of the prompt
+direct_system_prompt = system_prompt.replace(
+    "## User Question", "## Retrieved Documents\n\n{context}\n\n## User Question"
+)
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, Optional, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+from backend.metrics import UPSTREAM_CALLS, UPSTREAM_HEDGES, UPSTREAM_REJECTED, UPSTREAM_RETRIES_TOTAL
+from backend.pipeline import is_rate_limit_error
+
+T = TypeVar("T")
+
+# Deadline for each stage, covering every attempt, hedge and retry backoff
+EMBED_QUERY_TIMEOUT_MS = float(os.getenv("EMBED_QUERY_TIMEOUT_MS", "3000"))
+VECTOR_QUERY_TIMEOUT_MS = float(os.getenv("VECTOR_QUERY_TIMEOUT_MS", "2000"))
+# Send a duplicate request when the first has taken longer than this
+# percentile of recent latencies, e.g. 95; 0 turns hedging off
+UPSTREAM_HEDGE_PERCENTILE = float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "0"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_RETRY_BACKOFF_MS = float(os.getenv("UPSTREAM_RETRY_BACKOFF_MS", "50"))
+# Consecutive failures that open the circuit, and how long it stays open
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_COOLDOWN_S = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN_S", "10"))
+
+# Latencies kept per service, and how many are needed before hedging starts
+LATENCY_WINDOW = 500
+MIN_HEDGE_SAMPLES = 20
+
+RETRYABLE_ERRORS = (
+    "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "GatewayTimeout",
+    "ServerDisconnectedError", "ClientConnectionError", "ClientOSError",
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, dropped connections, rate limits and 5xx responses, including wrapped ones."""
+    while error is not None:
+        if isinstance(error, (TimeoutError, ConnectionError)) or is_rate_limit_error(error):
+            return True
+        if type(error).__name__ in RETRYABLE_ERRORS:
+            return True
+        for attr in ("status_code", "status", "code"):
+            status = getattr(error, attr, None)
+            if isinstance(status, int) and 500 <= status < 600:
+                return True
+        error = error.__cause__
+    return False
+
+
+class LatencyWindow:
+    """The most recent ``size`` latencies of a service, for percentile-based hedge delays."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failures`` consecutive failed requests and refuses calls
+    for ``cooldown`` seconds. Then one trial call is let through: success
+    closes the circuit, failure opens it for another cooldown, and a
+    cancelled trial lets the next call try instead.
+    """
+
+    def __init__(self, failures: int = UPSTREAM_BREAKER_FAILURES, cooldown: float = UPSTREAM_BREAKER_COOLDOWN_S,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.clock() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def success(self) -> None:
+        self.consecutive = 0
+        self.opened_at = None
+        self._trial = False
+
+    def abandon(self) -> None:
+        """The call was cancelled, which says nothing about the service: free the trial slot."""
+        self._trial = False
+
+    def failure(self) -> None:
+        self.consecutive += 1
+        if self._trial or (self.failures > 0 and self.consecutive >= self.failures):
+            self.opened_at = self.clock()
+            self._trial = False
+
+
+class UpstreamPolicy:
+    """
+    Deadline, hedging, retries and circuit breaking for one upstream service.
+
+    ``call(fn)`` awaits ``fn()`` within ``timeout`` seconds overall. When
+    ``hedge_percentile`` is set and the request is slower than that
+    percentile of recent latencies, a duplicate is sent and whichever
+    answers first wins; the other is cancelled. Retryable failures are
+    retried with full-jitter exponential backoff while the deadline allows.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        timeout: float,
+        hedge_percentile: float = UPSTREAM_HEDGE_PERCENTILE,
+        retries: int = UPSTREAM_RETRIES,
+        backoff: float = UPSTREAM_RETRY_BACKOFF_MS / 1000,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.service = service
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyWindow()
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile <= 0 or len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        for attempt in range(self.retries + 1):
+            # Allowed while the circuit is not closed means this is the trial call
+            trial = self.breaker.state != "closed"
+            if not self.breaker.allow():
+                UPSTREAM_REJECTED.inc(service=self.service)
+                raise CircuitOpenError(f"{self.service} circuit is open after repeated failures")
+            try:
+                result = await self._attempt(fn, deadline)
+            except asyncio.CancelledError:
+                # Client disconnects, coalesced runs and lost hedges cancel calls
+                if trial:
+                    self.breaker.abandon()
+                raise
+            except Exception as e:
+                self.breaker.failure()
+                UPSTREAM_CALLS.inc(service=self.service, outcome="timeout" if isinstance(e, TimeoutError) else "error")
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                if (attempt == self.retries or not is_retryable(e) or loop.time() + delay >= deadline
+                        or self.breaker.state != "closed"):
+                    raise
+                UPSTREAM_RETRIES_TOTAL.inc(service=self.service)
+                logger.warning(f"{self.service} failed ({e!r}), retrying in {delay * 1000:.0f} ms")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.success()
+            UPSTREAM_CALLS.inc(service=self.service, outcome="ok")
+            return result
+        raise RuntimeError("unreachable")
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], deadline: float) -> T:
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def launch() -> asyncio.Task:
+            task = asyncio.ensure_future(fn())
+            started[task] = loop.time()
+            return task
+
+        pending = {launch()}
+        hedge_at = None
+        delay = self.hedge_delay()
+        if delay is not None:
+            hedge_at = loop.time() + delay
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wake - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.add(loop.time() - started[task])
+                        return task.result()
+                    error = task.exception()
+                if hedge_at is not None and pending and loop.time() >= hedge_at:
+                    hedge_at = None
+                    UPSTREAM_HEDGES.inc(service=self.service)
+                    pending.add(launch())
+                elif pending and loop.time() >= deadline:
+                    raise TimeoutError(f"{self.service} did not answer within {self.timeout * 1000:.0f} ms")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def embed_query_policy() -> UpstreamPolicy:
+    return UpstreamPolicy("embed_query", EMBED_QUERY_TIMEOUT_MS / 1000)
+
+
+def vector_query_policy() -> UpstreamPolicy:
+    return UpstreamPolicy("vector_query", VECTOR_QUERY_TIMEOUT_MS / 1000)
+
+
+class UpstreamEmbeddings(Embeddings):
+    """
+    Sends the async (query-time) calls of an embeddings model through an
+    ``UpstreamPolicy``. The sync calls pass straight through; the indexer
+    has its own rate-limit handling (pipeline.AdaptiveLimiter).
+    """
+
+    def __init__(self, underlying: Embeddings, policy: Optional[UpstreamPolicy] = None):
+        self.underlying = underlying
+        self.policy = policy or embed_query_policy()
+
+    def embed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        return self.underlying.embed_documents(texts, **kwargs)
+
+    def embed_query(self, text: str, **kwargs: Any) -> List[float]:
+        return self.underlying.embed_query(text, **kwargs)
+
+    async def aembed_documents(self, texts: List[str], task_type: Optional[str] = None, **kwargs: Any) -> List[List[float]]:
+        if task_type is not None:
+            kwargs["task_type"] = task_type
+        return await self.policy.call(lambda: self.underlying.aembed_documents(texts, **kwargs))
+
+    async def aembed_query(self, text: str, **kwargs: Any) -> List[float]:
+        return await self.policy.call(lambda: self.underlying.aembed_query(text, **kwargs))
+
+
+class UpstreamIndex:
+    """Sends the queries of an asyncio index client through an ``UpstreamPolicy``."""
+
+    def __init__(self, index: Any, policy: Optional[UpstreamPolicy] = None):
+        self.index = index
+        self.policy = policy or vector_query_policy()
+
+    async def query(self, **kwargs: Any) -> Any:
+        return await self.policy.call(lambda: self.index.query(**kwargs))
+
+    async def close(self) -> None:
+        await self.index.close()
@@ -1,19 +1,58 @@
 from dotenv import load_dotenv
 import getpass
 import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
+import sys
+
+from backend.embedding_cache import EMBEDDING_CACHE_MAX_MB, CachedEmbeddings
+from backend.embeddings import DimensionedEmbeddings
+from backend.upstream import UpstreamEmbeddings
 
 load_dotenv()
 
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+FULL_EMBEDDING_DIMENSION = 3072
+# gemini-embedding-001 supports reduced outputs such as 768 or 1536
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", str(FULL_EMBEDDING_DIMENSION)))
+# Reduced outputs are not unit length, so they are normalized unless disabled
+EMBEDDING_NORMALIZE = os.getenv(
+    "EMBEDDING_NORMALIZE", str(EMBEDDING_DIMENSION != FULL_EMBEDDING_DIMENSION)
+).lower() in ("1", "true", "yes")
+
 def validate_key(key: str):
+    """Ask for a missing API key, or fail fast when there is no terminal to ask on."""
     if not os.environ.get(key):
+        if not sys.stdin or not sys.stdin.isatty():
+            raise RuntimeError(f"{key} is not set (add it to the environment or .env)")
         os.environ[key] = getpass.getpass(f"Enter API key for {key}: ")
 
+# The Google clients are imported on first use: the SDK takes most of a
+# second to import and only the server's lifespan hook or the indexer need it
 def get_llm() -> str:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     validate_key("GOOGLE_API_KEY")
     return ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite", streaming=True)
 
+def embedding_cache_key() -> str:
+    """Model name plus output settings, so differently sized vectors never mix."""
+    if EMBEDDING_DIMENSION == FULL_EMBEDDING_DIMENSION and not EMBEDDING_NORMALIZE:
+        return EMBEDDING_MODEL
+    suffix = "-norm" if EMBEDDING_NORMALIZE else ""
+    return f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSION}{suffix}"
+
 def get_embedding_model() -> str:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
     validate_key("GOOGLE_API_KEY")
-    return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
\ No newline at end of file
+    # Query-time calls get a deadline, retries and optional hedging (see upstream.py)
+    embedding_model = UpstreamEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL))
+    if EMBEDDING_DIMENSION != FULL_EMBEDDING_DIMENSION or EMBEDDING_NORMALIZE:
+        embedding_model = DimensionedEmbeddings(
+            embedding_model,
+            dimension=EMBEDDING_DIMENSION if EMBEDDING_DIMENSION != FULL_EMBEDDING_DIMENSION else None,
+            normalize=EMBEDDING_NORMALIZE,
+        )
+    # EMBEDDING_CACHE_MAX_MB=0 turns the on-disk embedding cache off
+    if EMBEDDING_CACHE_MAX_MB <= 0:
+        return embedding_model
+    return CachedEmbeddings(embedding_model, model=embedding_cache_key())
@@ -0,0 +1,89 @@
+"""
+Per-request agent setup cost and time-to-first-token, before and after
+sharing a prebuilt agent executor.
+
+    python -m benchmarks.bench_agent_setup --requests 50
+
+"before" rebuilds the prompt, Gemini client, agent and a verbose executor
+for every request, like generate_chat used to. "after" reuses the executor
+from backend.generator.get_agent_executor. The model itself is a local fake
+so only the setup overhead differs; no network calls are made.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain.prompts import ChatPromptTemplate
+
+from backend import generator
+from backend.retreiver import retrieve_context
+from backend.system_prompt import system_prompt
+from backend.utils import get_llm
+from benchmarks.fakes import FakeChatModel, install_fake_resources
+
+
+def build_per_request(llm) -> AgentExecutor:
+    """The setup generate_chat performed on every request before this change."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", "{input}"),
+        ("placeholder", "{agent_scratchpad}"),
+    ])
+    get_llm()  # constructing the Gemini client was part of every request
+    agent = create_tool_calling_agent(llm=llm, tools=[retrieve_context], prompt=prompt)
+    return AgentExecutor(agent=agent, tools=[retrieve_context], verbose=True, handle_parsing_errors=True)
+
+
+async def time_to_first_token(executor_factory, question: str) -> float:
+    start = time.perf_counter()
+    executor = executor_factory()
+    async for event in executor.astream_events({"input": question}, version="v2"):
+        if event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
+            return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def summarize(label: str, samples) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"  {label:<28} mean {statistics.mean(ms):8.2f} ms   p95 {p95:8.2f} ms"
+
+
+async def main(n_requests: int) -> None:
+    install_fake_resources()
+    llm = FakeChatModel(first_token_latency=0.0, tokens_per_second=10_000)
+    generator._agent_executor = generator.build_agent_executor(llm=llm)
+
+    setup_before = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        build_per_request(llm)
+        setup_before.append(time.perf_counter() - start)
+
+    setup_after = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        generator.get_agent_executor()
+        setup_after.append(time.perf_counter() - start)
+
+    question = "How did GDP change in Q3 2024?"
+    ttft_before = [await time_to_first_token(lambda: build_per_request(llm), question) for _ in range(n_requests)]
+    ttft_after = [await time_to_first_token(generator.get_agent_executor, question) for _ in range(n_requests)]
+
+    print(f"\nAgent setup over {n_requests} requests (fake model, no network)")
+    print(summarize("setup before (per request)", setup_before))
+    print(summarize("setup after (prebuilt)", setup_after))
+    print(summarize("TTFT before", ttft_before))
+    print(summarize("TTFT after", ttft_after))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,138 @@
+"""
+Time-to-first-token under concurrent /ask load with the previous synchronous
+retrieval tool versus the async one.
+
+    python -m benchmarks.bench_async_retrieval --concurrency 1 10 50
+
+Both run the shared agent executor with a local fake chat model, a real BM25
+encoder, embeddings that take ``--embed-ms`` per request and a local index
+that takes ``--query-ms`` per query. LangChain runs a sync tool in the
+event loop's default thread pool (``min(32, cpus + 4)`` threads), so under
+load sync retrievals queue for threads; the async tool awaits its I/O.
+Needs NLTK data unless ``--offline-tokenizer`` is given.
+
+``--embed-ms 0 --query-ms 0`` shows the agent's own CPU cost per request,
+which bounds time-to-first-token on a single core whatever the tool does.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain.prompts import ChatPromptTemplate
+from langchain.tools import tool
+
+from backend import resources
+from backend.bm25 import FastBM25Encoder
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from backend.local_index import LocalHybridIndex
+from backend.retreiver import retrieve_context
+from backend.system_prompt import system_prompt
+from benchmarks.bench_bm25 import offline_tokenizer
+from benchmarks.fakes import FakeChatModel, LatencyEmbeddings, LatencyIndex
+
+CORPUS = [
+    f"Report {i}: GDP grew {i % 5}.{i % 10} percent as consumer spending and exports "
+    f"{'rose' if i % 2 else 'fell'} in region {i % 37} while energy prices moved."
+    for i in range(2000)
+]
+
+
+@tool("retrieve_context")
+def retrieve_context_sync(query: str) -> str:
+    """
+    Retrieve the most relevant context passages from the vector database
+    for a given user query.
+    """
+    retriever = resources.get_resources().retriever
+
+    result = retriever.invoke(query)
+    return "\n\n---\n\n".join([doc.page_content for doc in result])
+
+
+def build_executor(llm, retrieval_tool) -> AgentExecutor:
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", "{input}"),
+        ("placeholder", "{agent_scratchpad}"),
+    ])
+    agent = create_tool_calling_agent(llm=llm, tools=[retrieval_tool], prompt=prompt)
+    return AgentExecutor(agent=agent, tools=[retrieval_tool], verbose=False, handle_parsing_errors=True)
+
+
+def install_resources(embed_latency: float, query_latency: float) -> None:
+    encoder = FastBM25Encoder().fit(CORPUS)
+    index = LatencyIndex(LocalHybridIndex(), latency=query_latency)
+    embeddings = LatencyEmbeddings(size=768, latency=0.0)
+    retriever = AsyncHybridSearchRetriever(
+        embeddings=embeddings,
+        sparse_encoder=encoder,
+        index=index,
+        async_index_factory=index.async_client,
+    )
+    retriever.add_texts(CORPUS)
+    embeddings.latency = embed_latency
+    resources._resources = resources.RetrievalResources(
+        bm25_encoder=encoder,
+        embedding_model=embeddings,
+        index=index,
+        retriever=retriever,
+        artifacts_mtime=resources._artifacts_mtime(),
+        warmup_seconds=0.0,
+        version=0,
+    )
+
+
+async def time_to_first_token(executor, question: str) -> float:
+    start = time.perf_counter()
+    async for event in executor.astream_events({"input": question}, version="v2"):
+        if event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
+            return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+
+async def run_level(executor, concurrency: int, rounds: int):
+    samples = []
+    for round_ in range(rounds):
+        questions = [f"How did GDP change in region {(round_ * concurrency + i) % 37}?" for i in range(concurrency)]
+        samples += await asyncio.gather(*(time_to_first_token(executor, q) for q in questions))
+    return samples
+
+
+async def main(levels, rounds: int, embed_latency: float, query_latency: float) -> None:
+    install_resources(embed_latency, query_latency)
+    llm = FakeChatModel(first_token_latency=0.02, tokens_per_second=10_000)
+    executors = {
+        "sync tool": build_executor(llm, retrieve_context_sync),
+        "async tool": build_executor(llm, retrieve_context),
+    }
+
+    print(f"\nembedding {embed_latency * 1000:.0f} ms, index query {query_latency * 1000:.0f} ms, {os.cpu_count()} CPU(s)")
+    print(f"  {'':<12} {'concurrency':>11} {'p50 ms':>9} {'p95 ms':>9}")
+    for label, executor in executors.items():
+        await run_level(executor, 1, 1)  # warm up
+        for level in levels:
+            samples = await run_level(executor, level, rounds)
+            print(f"  {label:<12} {level:>11} {percentile(samples, 0.5):>9.1f} {percentile(samples, 0.95):>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--embed-ms", type=float, default=100)
+    parser.add_argument("--query-ms", type=float, default=30)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+    for p in offline_tokenizer() if args.offline_tokenizer else []:
+        p.start()
+    asyncio.run(main(args.concurrency, args.rounds, args.embed_ms / 1000, args.query_ms / 1000))
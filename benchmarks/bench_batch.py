@@ -0,0 +1,119 @@
+"""
+Wall time and upstream calls for answering a set of questions one /ask at
+a time versus with the batch path behind /ask/batch.
+
+    python -m benchmarks.bench_batch --questions 200 --concurrency 8
+    python -m benchmarks.bench_batch --embed-ms 150 --query-ms 40 --llm-ms 300
+
+Both answer in direct mode with the same generation concurrency, using a
+real BM25 encoder and local index behind embeddings that take
+``--embed-ms`` per request, an index that takes ``--query-ms`` per query
+and a fake chat model with ``--llm-ms`` to first token. "per question"
+runs ``generate_direct`` for each question as concurrent /ask requests
+would: one embedding request and one vector query each. "batch" runs
+``answer_batch``. It embeds the distinct questions in one batched request,
+queries the index concurrently, then generates. Needs NLTK data unless
+``--offline-tokenizer`` is given.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from backend import generator, resources
+from backend.batch import answer_batch
+from backend.bm25 import FastBM25Encoder
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from backend.local_index import LocalHybridIndex
+from backend.schemas import BatchQuestion
+from benchmarks.bench_async_retrieval import CORPUS
+from benchmarks.fakes import FakeChatModel, LatencyEmbeddings, LatencyIndex
+
+
+def install(args):
+    encoder = FastBM25Encoder().fit(CORPUS)
+    embeddings = LatencyEmbeddings(size=64, latency=0.0)
+    index = LatencyIndex(LocalHybridIndex(), latency=args.query_ms / 1000)
+    retriever = AsyncHybridSearchRetriever(
+        embeddings=embeddings, sparse_encoder=encoder, index=index, async_index_factory=index.async_client,
+    )
+    retriever.add_texts(CORPUS)
+    embeddings.latency = args.embed_ms / 1000
+    resources._resources = resources.RetrievalResources(
+        bm25_encoder=encoder,
+        embedding_model=embeddings,
+        index=index,
+        retriever=retriever,
+        artifacts_mtime=resources._artifacts_mtime(),
+        warmup_seconds=0.0,
+        version=0,
+    )
+    generator._direct_chain = generator.build_direct_chain(
+        FakeChatModel(first_token_latency=args.llm_ms / 1000, tokens_per_second=2000.0)
+    )
+    return embeddings, index
+
+
+async def per_question(questions, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ask(question: str) -> None:
+        async with semaphore:
+            async for _ in generator.generate_direct(question):
+                pass
+
+    await asyncio.gather(*(ask(q) for q in questions))
+
+
+async def batched(questions, concurrency: int) -> None:
+    batch = [BatchQuestion(question=q, mode="direct") for q in questions]
+    async for _ in answer_batch(batch, concurrency):
+        pass
+
+
+def measure(name, run, questions, args, embeddings, index):
+    embeddings.requests = index.queries = 0
+    start = time.perf_counter()
+    asyncio.run(run(questions, args.concurrency))
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "seconds": elapsed,
+        "questions_per_second": len(questions) / elapsed,
+        "embedding_requests": embeddings.requests,
+        "vector_queries": index.queries,
+    }
+
+
+def main(args) -> None:
+    embeddings, index = install(args)
+    questions = [f"How did GDP and exports change in region {i % 37} ({i})?" for i in range(args.questions)]
+
+    results = [
+        measure("per question", per_question, questions, args, embeddings, index),
+        measure("batch", batched, questions, args, embeddings, index),
+    ]
+
+    print(f"\n{args.questions} questions, generation concurrency {args.concurrency}")
+    print(f"  {'':<14} {'seconds':>8} {'questions/s':>12} {'embed requests':>15} {'vector queries':>15}")
+    for r in results:
+        print(f"  {r['name']:<14} {r['seconds']:>8.2f} {r['questions_per_second']:>12.1f} "
+              f"{r['embedding_requests']:>15} {r['vector_queries']:>15}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--embed-ms", type=float, default=150)
+    parser.add_argument("--query-ms", type=float, default=40)
+    parser.add_argument("--llm-ms", type=float, default=300)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+    if args.offline_tokenizer:
+        from benchmarks.bench_bm25 import offline_tokenizer
+        for p in offline_tokenizer():
+            p.start()
+    main(args)
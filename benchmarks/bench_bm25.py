@@ -0,0 +1,133 @@
+"""
+Fit, encode and load time of FastBM25Encoder versus pinecone_text's BM25Encoder.
+
+    python -m benchmarks.bench_bm25 --docs 20000 --queries 500 --shards 4
+
+Also times fitting the corpus as ``--shards`` shards in a process pool
+followed by a merge, and adding 1% more documents to fitted statistics in
+place versus refitting everything.
+
+The corpus is synthetic: words drawn from a Zipf distribution over a fixed
+vocabulary, so the document-frequency table grows like a real one. Both
+encoders share NLTK's tokenizer; if its ``punkt_tab``/``stopwords`` data is
+not installed, ``--offline-tokenizer`` swaps in a regex tokenizer and a short
+stopword list for both of them.
+"""
+import argparse
+import os
+import re
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from pinecone_text.sparse import BM25Encoder
+from pinecone_text.sparse import bm25_tokenizer
+
+from backend.bm25 import FastBM25Encoder, merge_stats
+
+
+def synthetic_corpus(n_docs: int, words_per_doc: int, vocab_size: int, rng: np.random.Generator):
+    vocab = np.array([f"term{i}" for i in range(vocab_size)])
+    ranks = np.minimum(rng.zipf(1.2, size=(n_docs, words_per_doc)), vocab_size) - 1
+    return [" ".join(vocab[row]) + "." for row in ranks]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def per_query_us(encoder, queries) -> float:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode_queries(query)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def shard_stats(texts):
+    return FastBM25Encoder().compute_stats(texts)
+
+
+def sharded_fit(corpus, n_shards: int) -> FastBM25Encoder:
+    size = -(-len(corpus) // n_shards)
+    shards = [corpus[i:i + size] for i in range(0, len(corpus), size)]
+    with ProcessPoolExecutor(max_workers=n_shards) as executor:
+        return FastBM25Encoder().set_stats(merge_stats(executor.map(shard_stats, shards)))
+
+
+def offline_tokenizer():
+    stopwords = MagicMock()
+    stopwords.words.return_value = ["the", "a", "of", "and", "in", "to"]
+    return [
+        patch.object(bm25_tokenizer.BM25Tokenizer, "nltk_setup", staticmethod(lambda: None)),
+        patch.object(bm25_tokenizer, "stopwords", stopwords),
+        patch.object(bm25_tokenizer, "word_tokenize", lambda text, language: re.findall(r"\w+|[^\w\s]", text)),
+    ]
+
+
+def main(n_docs: int, n_queries: int, words_per_doc: int, vocab_size: int, n_shards: int) -> None:
+    rng = np.random.default_rng(0)
+    corpus = synthetic_corpus(n_docs, words_per_doc, vocab_size, rng)
+    queries = synthetic_corpus(n_queries, 8, vocab_size, rng)
+
+    reference, ref_fit = timed(lambda: BM25Encoder().fit(corpus))
+    fast, fast_fit = timed(lambda: FastBM25Encoder().fit(corpus))
+    _, ref_docs = timed(lambda: reference.encode_documents(corpus[:1000]))
+    _, fast_docs = timed(lambda: fast.encode_documents(corpus[:1000]))
+    ref_query = per_query_us(reference, queries)
+    fast_query = per_query_us(fast, queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "bm25_encoder.json")
+        bin_path = os.path.join(tmp, "bm25_encoder.bin")
+        reference.dump(json_path)
+        fast.dump(bin_path)
+        _, ref_load = timed(lambda: BM25Encoder().load(json_path))
+        _, fast_load = timed(lambda: FastBM25Encoder().load(bin_path))
+        ref_mb = os.path.getsize(json_path) / 1e6
+        fast_mb = os.path.getsize(bin_path) / 1e6
+
+    sharded, sharded_s = timed(lambda: sharded_fit(corpus, n_shards))
+    assert sharded.doc_freq == fast.doc_freq
+
+    added = synthetic_corpus(max(n_docs // 100, 1), words_per_doc, vocab_size, rng)
+    _, refit_s = timed(lambda: FastBM25Encoder().fit(corpus + added))
+    _, update_s = timed(lambda: FastBM25Encoder().set_stats(fast.stats + shard_stats(added)))
+
+    same = all(
+        fast.encode_queries(q)["indices"] == reference.encode_queries(q)["indices"] for q in queries[:50]
+    ) and fast.encode_documents(corpus[:50]) == reference.encode_documents(corpus[:50])
+
+    print(f"\n{n_docs} documents, {len(fast.doc_freq)} distinct terms, identical vectors: {same}")
+    print(f"  {'':<22} {'BM25Encoder':>12} {'Fast':>12} {'speedup':>8}")
+    for label, ref, new in (
+        ("fit (s)", ref_fit, fast_fit),
+        ("encode 1000 docs (s)", ref_docs, fast_docs),
+        ("encode query (us)", ref_query, fast_query),
+        ("load artifact (s)", ref_load, fast_load),
+    ):
+        print(f"  {label:<22} {ref:>12.4f} {new:>12.4f} {ref / new:>7.1f}x")
+    print(f"  {'artifact (MB)':<22} {ref_mb:>12.2f} {fast_mb:>12.2f}")
+    print(f"\n  fit in {n_shards} shards + merge: {sharded_s:.3f}s (single process {fast_fit:.3f}s, {os.cpu_count()} CPUs)")
+    print(f"  add {len(added)} docs: refit {refit_s:.3f}s, in-place update {update_s:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--words-per-doc", type=int, default=200)
+    parser.add_argument("--vocab", type=int, default=200000)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+    patches = offline_tokenizer() if args.offline_tokenizer else []
+    for p in patches:
+        p.start()
+    main(args.docs, args.queries, args.words_per_doc, args.vocab, args.shards)
@@ -0,0 +1,69 @@
+"""
+Upstream agent runs and time-to-first-token for bursts of /ask requests,
+with and without request coalescing.
+
+    python -m benchmarks.bench_coalescing --requests 100 --distinct 5
+
+Each burst sends ``--requests`` concurrent questions drawn from
+``--distinct`` different ones through the FastAPI app in-process. The agent
+uses a local fake chat model whose every call takes ``--llm-ms`` and a fake
+retriever that takes ``--retrieval-ms``; no network calls are made.
+"""
+import argparse
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+import httpx
+
+from backend import generator, router
+from backend.coalesce import RequestCoalescer
+from benchmarks.bench_async_retrieval import percentile
+from benchmarks.fakes import FakeChatModel, FakeRetriever, install_fake_resources
+from main import app
+
+
+async def first_frame(client, question: str) -> float:
+    start = time.perf_counter()
+    elapsed = None
+    async with client.stream("POST", "/ask", json={"question": question}) as response:
+        async for line in response.aiter_lines():
+            if elapsed is None and line.startswith("data:"):
+                elapsed = time.perf_counter() - start
+    return elapsed if elapsed is not None else time.perf_counter() - start
+
+
+async def burst(n_requests: int, n_distinct: int):
+    questions = [f"How did GDP change in region {i % n_distinct}?" for i in range(n_requests)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        return await asyncio.gather(*(first_frame(client, q) for q in questions))
+
+
+async def main(n_requests: int, n_distinct: int, llm_latency: float, retrieval_latency: float) -> None:
+    install_fake_resources(FakeRetriever(latency=retrieval_latency))
+    llm = FakeChatModel(first_token_latency=llm_latency, tokens_per_second=10_000)
+    generator._agent_executor = generator.build_agent_executor(llm=llm)
+
+    print(f"\n{n_requests} concurrent requests, {n_distinct} distinct questions, "
+          f"LLM {llm_latency * 1000:.0f} ms per call, retrieval {retrieval_latency * 1000:.0f} ms")
+    print(f"  {'':<16} {'LLM calls':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for label, coalescer in (("independent", None), ("coalesced", RequestCoalescer())):
+        with patch.object(router, "answer_cache", None), patch.object(router, "coalescer", coalescer):
+            await burst(1, 1)  # warm up
+            llm.calls.clear()
+            samples = await burst(n_requests, n_distinct)
+        print(f"  {label:<16} {len(llm.calls):>10} {percentile(samples, 0.5):>9.1f} {percentile(samples, 0.95):>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--distinct", type=int, default=5)
+    parser.add_argument("--llm-ms", type=float, default=300)
+    parser.add_argument("--retrieval-ms", type=float, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.distinct, args.llm_ms / 1000, args.retrieval_ms / 1000))
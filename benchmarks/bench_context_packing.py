@@ -0,0 +1,87 @@
+"""
+Prompt tokens of the context sent to the LLM before and after context
+packing, for the top-k hits of BM25 queries over synthetic report pages.
+
+    python -m benchmarks.bench_context_packing --top-k 4 8 --budget 2000
+
+Pages are split with the indexer's text splitter (chunk size 1000, overlap
+200), so neighbouring chunks of a relevant page share text as they do in
+the real index. "before" joins the raw hits with ``---``; "after" merges
+overlapping chunks, drops duplicates, adds source titles and caps the
+total at ``--budget`` tokens (about four characters per token). Needs NLTK
+data unless ``--offline-tokenizer`` is given.
+"""
+import argparse
+import statistics
+import time
+
+from langchain_core.documents import Document
+
+from backend.bm25 import FastBM25Encoder
+from backend.context import SEPARATOR, estimate_tokens, pack_context
+from backend.indexing import CHUNK_OVERLAP, CHUNK_SIZE, MIN_CHUNK_LENGTH, is_valid_chunk, make_text_splitter
+from backend.local_index import LocalHybridIndex
+from benchmarks.bench_bm25 import offline_tokenizer
+
+TOPICS = ["inflation", "employment", "energy prices", "retail sales", "exports", "housing", "interest rates"]
+
+
+def make_pages(n_reports: int, pages: int):
+    for r in range(n_reports):
+        for p in range(pages):
+            topic = TOPICS[(r + p) % len(TOPICS)]
+            text = " ".join(
+                f"In region {r} the {topic} indicator moved {s % 7 - 3} points in month {s % 12 + 1}, "
+                f"according to survey {r}-{p}-{s}."
+                for s in range(40)
+            )
+            yield Document(page_content=text, metadata={"uuid": f"report-{r}", "title": f"Regional {topic.title()} Review {r}", "page": p})
+
+
+def main(top_ks, budget: int, n_reports: int, n_queries: int) -> None:
+    chunks = [
+        c for c in make_text_splitter(CHUNK_SIZE, CHUNK_OVERLAP).split_documents(list(make_pages(n_reports, 4)))
+        if is_valid_chunk(c, MIN_CHUNK_LENGTH)
+    ]
+    encoder = FastBM25Encoder().fit([c.page_content for c in chunks])
+    index = LocalHybridIndex()
+    index.upsert([
+        {"id": str(i), "values": [0.0], "sparse_values": sparse,
+         "metadata": {"context": c.page_content, **c.metadata}}
+        for i, (c, sparse) in enumerate(zip(chunks, encoder.encode_documents([c.page_content for c in chunks])))
+    ])
+    queries = [f"How did {TOPICS[q % len(TOPICS)]} change in region {q % n_reports}?" for q in range(n_queries)]
+
+    print(f"\n{len(chunks)} chunks, {n_queries} queries, budget {budget} tokens")
+    print(f"  {'top_k':>5} {'before tok':>11} {'after tok':>10} {'saved':>7} {'pack us':>8}")
+    for top_k in top_ks:
+        before, after, timings = [], [], []
+        for query in queries:
+            result = index.query(vector=[0.0], sparse_vector=encoder.encode_queries(query), top_k=top_k, include_metadata=True)
+            hits = []
+            for match in result["matches"]:
+                metadata = dict(match["metadata"])
+                hits.append(Document(page_content=metadata.pop("context"), metadata=metadata))
+            start = time.perf_counter()
+            packed = pack_context(hits, budget=budget)
+            timings.append(time.perf_counter() - start)
+            before.append(estimate_tokens(SEPARATOR.join(h.page_content for h in hits)))
+            after.append(packed.tokens)
+        saved = 1 - sum(after) / sum(before)
+        print(
+            f"  {top_k:>5} {statistics.mean(before):>11.0f} {statistics.mean(after):>10.0f}"
+            f" {saved:>7.1%} {statistics.median(timings) * 1e6:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("--reports", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+    for p in offline_tokenizer() if args.offline_tokenizer else []:
+        p.start()
+    main(args.top_k, args.budget, args.reports, args.queries)
@@ -0,0 +1,137 @@
+"""
+Vector metadata size and query latency with chunk text and metadata on the
+vectors versus in the local docstore.
+
+    python -m benchmarks.bench_docstore --chunks 5000 --top-k 10
+
+Generates chunks with the metadata the indexer writes, i.e. PyMuPDF's page
+metadata plus the document fields from metadata.jsonl. Then it indexes
+them twice in the local index. "full" stores the text and all metadata on
+each vector, as before. "docstore" stores only the filter fields on the
+vector and keeps the rest in SQLite. The report gives the metadata bytes
+per upserted vector and per query response, and the latency of a hybrid
+query including hydration of the hits.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend.docstore import DocStore, vector_metadata
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from backend.local_index import LocalHybridIndex
+
+WORDS = "inflation growth energy prices exports consumer spending outlook rates labour market demand".split()
+
+
+class WordEncoder:
+    """Sparse encoder with one dimension per word, standing in for BM25"""
+
+    def encode_queries(self, text):
+        words = sorted({hash(w) % 100_000 for w in text.split()})
+        return {"indices": words, "values": [1.0] * len(words)}
+
+    def encode_documents(self, texts):
+        return [self.encode_queries(t) for t in texts]
+
+
+def make_chunks(n: int, chunk_chars: int, rng: np.random.Generator):
+    for i in range(n):
+        doc = i // 40
+        text = " ".join(rng.choice(WORDS, size=chunk_chars // 7))[:chunk_chars]
+        metadata = {
+            "producer": "Microsoft® Word for Microsoft 365",
+            "creator": "Microsoft® Word for Microsoft 365",
+            "creationdate": "2024-10-30T09:12:44-04:00",
+            "source": f"data/{doc:08d}-3f2a-4c1e-9b7d-2a6c1e0f{doc:04d}.pdf",
+            "file_path": f"data/{doc:08d}-3f2a-4c1e-9b7d-2a6c1e0f{doc:04d}.pdf",
+            "total_pages": 40,
+            "format": "PDF 1.7",
+            "title": f"Quarterly economic outlook {doc}",
+            "author": "Research Department",
+            "subject": "",
+            "keywords": "",
+            "moddate": "2024-10-30T09:13:02-04:00",
+            "trapped": "",
+            "modDate": "D:20241030091302-04'00'",
+            "creationDate": "D:20241030091244-04'00'",
+            "page": i % 40,
+            "uuid": f"{doc:08d}-3f2a-4c1e-9b7d-2a6c1e0f{doc:04d}",
+            "industries": ["energy", "finance"] if doc % 2 else ["retail"],
+            "date": "2024-10-01",
+            "date_int": 20241001,
+            "country_codes": ["US", "DE"],
+            "start_index": (i % 8) * chunk_chars,
+        }
+        yield f"chunk-{i}", text, metadata
+
+
+def build(chunks, embeddings, encoder, docstore):
+    index = LocalHybridIndex()
+    vectors = []
+    for doc_id, text, metadata in chunks:
+        vectors.append({
+            "id": doc_id,
+            "values": embeddings.embed_query(text),
+            "sparse_values": encoder.encode_queries(text),
+            "metadata": vector_metadata(metadata) if docstore is not None else {"context": text, **metadata},
+        })
+    if docstore is not None:
+        docstore.put_many(chunks)
+    index.upsert(vectors)
+    payload = statistics.mean(len(json.dumps(v["metadata"])) for v in vectors)
+    return index, payload
+
+
+def time_queries(retriever, index, queries):
+    latencies, response_bytes = [], []
+
+    async def run():
+        for query in queries:
+            start = time.perf_counter()
+            await retriever.ainvoke(query)
+            latencies.append(time.perf_counter() - start)
+            result = index.query(vector=retriever.embeddings.embed_query(query), top_k=retriever.top_k,
+                                 include_metadata=True)
+            response_bytes.append(len(json.dumps([m["metadata"] for m in result["matches"]])))
+
+    asyncio.run(run())
+    return statistics.median(latencies) * 1000, statistics.mean(response_bytes)
+
+
+def main(args) -> None:
+    rng = np.random.default_rng(0)
+    chunks = list(make_chunks(args.chunks, args.chunk_chars, rng))
+    embeddings = DeterministicFakeEmbedding(size=args.dimension)
+    encoder = WordEncoder()
+    queries = [" ".join(rng.choice(WORDS, size=6)) for _ in range(args.queries)]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, docstore in (("full", None), ("docstore", DocStore(f"{tmp}/docstore.sqlite"))):
+            index, payload = build(chunks, embeddings, encoder, docstore)
+            retriever = AsyncHybridSearchRetriever(
+                embeddings=embeddings, sparse_encoder=encoder, index=index, docstore=docstore, top_k=args.top_k,
+            )
+            p50, response = time_queries(retriever, index, queries)
+            rows.append((name, payload, response, p50))
+
+    print(f"\n{args.chunks} chunks of {args.chunk_chars} characters, top_k={args.top_k}")
+    print(f"  {'':<10} {'bytes/vector':>13} {'bytes/response':>15} {'query p50 ms':>13}")
+    for name, payload, response, p50 in rows:
+        print(f"  {name:<10} {payload:>13.0f} {response:>15.0f} {p50:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""
+Recall@k, query latency and storage of reduced-dimension embeddings
+compared with full-size 3072-dimensional vectors.
+
+    python -m benchmarks.bench_embedding_dims --dims 768 1536 --k 4 10
+
+gemini-embedding-001 is trained so that a prefix of its output is itself a
+usable embedding, and reduced ``output_dimensionality`` results correspond
+to truncated, re-normalized full vectors. The benchmark therefore derives
+each reduced size from full vectors and measures how many of the exact
+full-size top-k neighbours it still retrieves.
+
+Full vectors are read from the document embedding cache written by a prior
+``python -m backend.indexing`` run. Without a cache, or with ``--synthetic``,
+it falls back to random vectors with a decaying spectrum; those numbers only
+show the shape of the trade-off, not real recall.
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.embedding_cache import EMBEDDING_CACHE_DIR, EmbeddingStore
+from backend.utils import EMBEDDING_MODEL, FULL_EMBEDDING_DIMENSION
+
+
+def load_cached_vectors(cache_dir: str) -> np.ndarray:
+    store = Path(cache_dir) / EMBEDDING_MODEL.replace("/", "_") / "document"
+    if not store.exists():
+        return None
+    vectors_path = EmbeddingStore(str(store), max_bytes=0).vectors_path
+    if not vectors_path.exists():
+        return None
+    vectors = np.fromfile(vectors_path, dtype=np.float32)
+    return vectors[: len(vectors) // FULL_EMBEDDING_DIMENSION * FULL_EMBEDDING_DIMENSION].reshape(
+        -1, FULL_EMBEDDING_DIMENSION
+    )
+
+
+def synthetic_vectors(n: int, rng: np.random.Generator) -> np.ndarray:
+    # Leading dimensions carry most of the variance, as in Matryoshka embeddings
+    scale = 1.0 / np.sqrt(np.arange(1, FULL_EMBEDDING_DIMENSION + 1))
+    centers = rng.standard_normal((max(n // 20, 1), FULL_EMBEDDING_DIMENSION)) * scale
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, FULL_EMBEDDING_DIMENSION)) * scale
+    return vectors.astype(np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def query_latency_us(corpus: np.ndarray, queries: np.ndarray, k: int) -> float:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        scores = corpus @ query
+        np.argpartition(-scores, k)[:k]
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main(dims, ks, n_queries: int, synthetic: bool, n_synthetic: int) -> None:
+    rng = np.random.default_rng(0)
+    vectors = None if synthetic else load_cached_vectors(EMBEDDING_CACHE_DIR)
+    source = "embedding cache"
+    if vectors is None or len(vectors) < 2 * n_queries:
+        vectors = synthetic_vectors(n_synthetic, rng)
+        source = "synthetic vectors"
+
+    # Hold out some vectors as queries
+    order = rng.permutation(len(vectors))
+    queries_full = normalize(vectors[order[:n_queries]])
+    corpus_full = normalize(vectors[order[n_queries:]])
+    truth = {k: top_k(corpus_full, queries_full, k) for k in ks}
+    full_latency = query_latency_us(corpus_full, queries_full, max(ks))
+
+    print(f"\n{len(corpus_full)} corpus vectors, {n_queries} queries ({source})")
+    header = f"  {'dim':>5} " + " ".join(f"{f'recall@{k}':>10}" for k in ks)
+    print(header + f" {'query us':>10} {'MB':>8} {'size':>6} {'latency':>8}")
+
+    for dim in [FULL_EMBEDDING_DIMENSION] + sorted(dims, reverse=True):
+        corpus = normalize(corpus_full[:, :dim])
+        queries = normalize(queries_full[:, :dim])
+        recalls = []
+        for k in ks:
+            found = top_k(corpus, queries, k)
+            hits = [len(set(a) & set(b)) / k for a, b in zip(found, truth[k])]
+            recalls.append(np.mean(hits))
+        latency = query_latency_us(corpus, queries, max(ks))
+        size_mb = corpus.nbytes / 1e6
+        print(
+            f"  {dim:>5} " + " ".join(f"{r:>10.3f}" for r in recalls)
+            + f" {latency:>10.1f} {size_mb:>8.1f} {dim / FULL_EMBEDDING_DIMENSION:>6.0%}"
+            + f" {latency / full_latency:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dims", type=int, nargs="+", default=[768, 1536])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--synthetic", action="store_true", help="Ignore the embedding cache")
+    parser.add_argument("--synthetic-vectors", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.dims, args.k, args.queries, args.synthetic, args.synthetic_vectors)
@@ -0,0 +1,73 @@
+"""
+Time-to-first-token and LLM token usage of the agent mode versus the direct
+retrieve-then-generate mode of /ask.
+
+    python -m benchmarks.bench_generation_modes --questions 20 --llm-ms 300
+
+Both modes run through ``backend.generator`` with a local fake chat model
+whose every call takes ``--llm-ms`` before its first token, the async
+retrieval tool over a real BM25 encoder, and embeddings and index queries
+that take ``--embed-ms`` and ``--query-ms``. Tokens are estimated at about
+four characters per token from what the model is actually sent. Needs NLTK
+data unless ``--offline-tokenizer`` is given.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from backend import generator
+from benchmarks.bench_async_retrieval import install_resources, percentile
+from benchmarks.bench_bm25 import offline_tokenizer
+from benchmarks.fakes import FakeChatModel
+
+
+async def time_to_first_token(generate, question: str) -> float:
+    start = time.perf_counter()
+    first = None
+    async for _ in generate(question):
+        if first is None:
+            first = time.perf_counter() - start
+    return first if first is not None else time.perf_counter() - start
+
+
+async def main(n_questions: int, llm_latency: float, embed_latency: float, query_latency: float) -> None:
+    install_resources(embed_latency, query_latency)
+    questions = [f"How did GDP change in region {i % 37}?" for i in range(n_questions)]
+    modes = {
+        "agent": (generator.generate_chat, "_agent_executor", generator.build_agent_executor),
+        "direct": (generator.generate_direct, "_direct_chain", generator.build_direct_chain),
+    }
+
+    print(f"\nLLM {llm_latency * 1000:.0f} ms to first token per call, embedding {embed_latency * 1000:.0f} ms, "
+          f"index query {query_latency * 1000:.0f} ms, {n_questions} questions")
+    print(f"  {'mode':<8} {'p50 ms':>9} {'p95 ms':>9} {'LLM calls':>10} {'prompt tok':>11} {'output tok':>11}")
+    for mode, (generate, attribute, build) in modes.items():
+        llm = FakeChatModel(first_token_latency=llm_latency, tokens_per_second=10_000)
+        setattr(generator, attribute, build(llm))
+        await time_to_first_token(generate, questions[0])  # warm up
+        llm.calls.clear()
+
+        samples = [await time_to_first_token(generate, q) for q in questions]
+        calls = len(llm.calls) / n_questions
+        prompt_tokens = sum(c["prompt_tokens"] for c in llm.calls) / n_questions
+        output_tokens = sum(c["completion_tokens"] for c in llm.calls) / n_questions
+        print(
+            f"  {mode:<8} {percentile(samples, 0.5):>9.1f} {percentile(samples, 0.95):>9.1f}"
+            f" {calls:>10.1f} {prompt_tokens:>11.0f} {output_tokens:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--llm-ms", type=float, default=300)
+    parser.add_argument("--embed-ms", type=float, default=100)
+    parser.add_argument("--query-ms", type=float, default=30)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+    for p in offline_tokenizer() if args.offline_tokenizer else []:
+        p.start()
+    asyncio.run(main(args.questions, args.llm_ms / 1000, args.embed_ms / 1000, args.query_ms / 1000))
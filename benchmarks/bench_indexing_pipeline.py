@@ -0,0 +1,148 @@
+"""
+Wall-clock time and peak memory of the streaming indexing pipeline versus
+the previous load-everything-then-add_texts flow.
+
+    python -m benchmarks.bench_indexing_pipeline --files 50 200 --latency-ms 40
+
+Synthetic PDFs are written to a temp directory. Embedding and upsert calls
+go to offline fakes that sleep ``--latency-ms`` per request to stand in for
+the Gemini and Pinecone round trips. PDFs are parsed in-process so that
+``tracemalloc`` sees every allocation. ``--offline-tokenizer`` works as in
+``bench_bm25`` when NLTK data is not installed.
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import patch
+
+import pymupdf
+from langchain_community.retrievers import PineconeHybridSearchRetriever
+from langchain_core.embeddings import Embeddings
+
+from backend import indexing
+from backend.bm25 import FastBM25Encoder
+from benchmarks.bench_bm25 import offline_tokenizer
+
+PAGE_TEXT = (
+    "Quarterly review of inflation, GDP growth and consumer spending in region {n}. "
+    "Energy prices and interest rates shaped the outlook for industry {m}. "
+) * 12
+
+
+class SlowEmbeddings(Embeddings):
+    def __init__(self, latency: float, dimension: int = 768):
+        self.latency = latency
+        self.dimension = dimension
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [[0.01] * self.dimension for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class SlowIndex:
+    """Accepts upserts after a delay and keeps only a count."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.upserted = 0
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        time.sleep(self.latency)
+        self.upserted += len(vectors)
+
+    def delete(self, **kwargs):
+        pass
+
+
+def make_corpus(folder: Path, n_files: int, pages: int) -> None:
+    with open(folder / "metadata.jsonl", "w") as f:
+        for i in range(n_files):
+            meta = {"uuid": f"report-{i}", "title": f"Report {i}", "industries": ["energy"],
+                    "date": "2024-10-01", "country_codes": ["US"]}
+            f.write(json.dumps(meta) + "\n")
+            doc = pymupdf.open()
+            for n in range(pages):
+                page = doc.new_page()
+                page.insert_textbox(pymupdf.Rect(36, 36, 576, 800), PAGE_TEXT.format(n=n, m=i), fontsize=8)
+            doc.save(str(folder / f"report-{i}.pdf"))
+            doc.close()
+
+
+def previous_flow(folder: Path, embeddings, index) -> None:
+    """Load every page, split, fit BM25, then one sequential add_texts call."""
+    metadata_lookup = indexing.load_metadata(folder / "metadata.jsonl")
+    documents, _ = indexing.load_all_pdfs(indexing.list_pdf_files(folder), metadata_lookup)
+    splits = indexing.make_text_splitter(indexing.CHUNK_SIZE, indexing.CHUNK_OVERLAP).split_documents(documents)
+    splits = [d for d in splits if indexing.is_valid_chunk(d, indexing.MIN_CHUNK_LENGTH)]
+    texts = [d.page_content for d in splits]
+    with tempfile.TemporaryDirectory() as tmp:
+        encoder = FastBM25Encoder().fit(texts)
+        encoder.dump(f"{tmp}/bm25.bin")
+    retriever = PineconeHybridSearchRetriever(embeddings=embeddings, sparse_encoder=encoder, index=index)
+    retriever.add_texts(texts=texts, metadatas=[d.metadata for d in splits])
+
+
+def streaming_flow(folder: Path, embeddings, index, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch.object(indexing, "DOCUMENTS_PATH", folder), \
+         patch.object(indexing, "METADATA_PATH", folder / "metadata.jsonl"), \
+         patch.object(indexing, "BM25_ENCODER_PATH", f"{tmp}/bm25.bin"), \
+         patch.object(indexing, "MANIFEST_PATH", f"{tmp}/manifest.json"), \
+         patch.object(indexing, "PUBLISHED_PATH", f"{tmp}/published.json"), \
+         patch.object(indexing, "DOCSTORE_PATH", f"{tmp}/docstore.sqlite"), \
+         patch.object(indexing, "CHECKPOINT_PATH", f"{tmp}/checkpoint.log"), \
+         patch.object(indexing, "BM25_SHARDS_DIR", f"{tmp}/shards"), \
+         patch.object(indexing, "METADATA_INDEX_PATH", f"{tmp}/metadata_index.json"), \
+         patch.object(indexing, "get_index", return_value=index), \
+         patch.object(indexing, "get_embedding_model", return_value=embeddings):
+        indexing.main(workers=1, embed_batch_size=32, concurrency=concurrency)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main(file_counts, pages: int, latency: float, concurrency: int) -> None:
+    print(f"\n{pages} pages per file, {latency * 1000:.0f} ms per embed/upsert call, concurrency {concurrency}")
+    print(f"  {'files':>6} {'chunks':>7} {'before s':>9} {'after s':>8} {'before MB':>10} {'after MB':>9}")
+    for n_files in file_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp)
+            make_corpus(folder, n_files, pages)
+
+            before_index = SlowIndex(latency)
+            before_s, before_mb = measure(lambda: previous_flow(folder, SlowEmbeddings(latency), before_index))
+            after_index = SlowIndex(latency)
+            after_s, after_mb = measure(
+                lambda: streaming_flow(folder, SlowEmbeddings(latency), after_index, concurrency)
+            )
+            assert after_index.upserted == before_index.upserted
+            print(
+                f"  {n_files:>6} {after_index.upserted:>7} {before_s:>9.2f} {after_s:>8.2f}"
+                f" {before_mb:>10.1f} {after_mb:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--concurrency", type=int, default=indexing.UPLOAD_CONCURRENCY)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+    for p in offline_tokenizer() if args.offline_tokenizer else []:
+        p.start()
+    main(args.files, args.pages, args.latency_ms / 1000, args.concurrency)
@@ -0,0 +1,85 @@
+"""
+Top-k hybrid query latency of the local vector index.
+
+    python -m benchmarks.bench_local_index --vectors 500 --dimension 3072
+
+Builds an index of random dense vectors and BM25-like sparse vectors, saves
+and memory-maps it, then times queries with and without a metadata filter.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from backend.local_index import LocalHybridIndex
+
+INDUSTRIES = ["energy", "finance", "retail", "healthcare", "technology", "agriculture"]
+
+
+def random_vectors(n: int, dimension: int, rng: np.random.Generator):
+    dense = rng.standard_normal((n, dimension)).astype(np.float32)
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+    for i in range(n):
+        tokens = rng.choice(50_000, size=rng.integers(40, 120), replace=False)
+        yield {
+            "id": f"doc-{i}",
+            "values": dense[i],
+            "sparse_values": {"indices": tokens.tolist(), "values": rng.random(len(tokens)).tolist()},
+            "metadata": {
+                "industries": [INDUSTRIES[i % len(INDUSTRIES)]],
+                "date_int": 20240101 + (i % 365),
+            },
+        }
+
+
+def time_queries(index, queries, **kwargs):
+    samples = []
+    for dense, sparse in queries:
+        start = time.perf_counter()
+        index.query(vector=dense, sparse_vector=sparse, top_k=4, include_metadata=True, **kwargs)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(label: str, samples) -> str:
+    us = sorted(s * 1e6 for s in samples)
+    p95 = us[min(len(us) - 1, int(len(us) * 0.95))]
+    return f"  {label:<22} p50 {statistics.median(us):9.1f} us   p95 {p95:9.1f} us"
+
+
+def main(n_vectors: int, dimension: int, n_queries: int) -> None:
+    rng = np.random.default_rng(0)
+    index = LocalHybridIndex()
+    start = time.perf_counter()
+    index.upsert(list(random_vectors(n_vectors, dimension, rng)))
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index.save(tmp_dir + "/index")
+        mapped = LocalHybridIndex.open(tmp_dir + "/index")
+
+        queries = []
+        for _ in range(n_queries):
+            dense = rng.standard_normal(dimension).astype(np.float32)
+            tokens = rng.choice(50_000, size=8, replace=False)
+            queries.append((dense, {"indices": tokens.tolist(), "values": [0.125] * 8}))
+
+        # First query builds the sparse posting lists and field indexes
+        time_queries(mapped, queries[:1], filter={"industries": {"$in": ["energy"]}})
+        unfiltered = time_queries(mapped, queries)
+        filtered = time_queries(mapped, queries, filter={"industries": {"$in": ["energy", "finance"]}})
+
+    print(f"\nLocal index: {n_vectors} vectors x {dimension} dims, built in {build_seconds * 1000:.0f} ms")
+    print(summarize("top-4 query", unfiltered))
+    print(summarize("top-4 query + filter", filtered))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    main(args.vectors, args.dimension, args.queries)
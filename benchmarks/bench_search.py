@@ -0,0 +1,140 @@
+"""
+Requests per second and latency of /search, uncached and cached, next to /ask in direct mode.
+
+    python -m benchmarks.bench_search --requests 5000 --concurrency 32
+    python -m benchmarks.bench_search --embed-ms 20 --query-ms 10 --offline-tokenizer
+
+Drives the app's ASGI interface directly with ``--concurrency`` concurrent
+requests, so the rates are what one server process can answer on one core,
+without HTTP parsing or client overhead. Retrieval runs over a real BM25
+encoder and local index of 2000 chunks, behind embeddings that take
+``--embed-ms`` per request and an index that takes ``--query-ms`` per query
+(both default to 0: a warm embedding cache and a nearby index). Requests
+cycle through ``--distinct`` questions. "/ask direct" streams an answer
+from a fake chat model with ``--llm-ms`` to first token; "/search" returns
+the top ``--top-k`` chunks with the result cache off; "/search cached"
+with it on, after one pass over the questions. Needs NLTK data unless
+``--offline-tokenizer`` is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from backend import generator, router
+from backend.answer_cache import AnswerCache
+from benchmarks.bench_async_retrieval import install_resources
+from benchmarks.fakes import FakeChatModel
+from benchmarks.loadtest import percentile
+
+
+async def post(app, path: str, body: bytes) -> int:
+    """One POST through the ASGI interface; returns the status once the body is complete."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80), "state": {},
+    }
+    request = {"type": "http.request", "body": body, "more_body": False}
+    finished = asyncio.Event()
+    status = 0
+
+    async def receive():
+        nonlocal request
+        if request is not None:
+            message, request = request, None
+            return message
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif not message.get("more_body", False):
+            finished.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run(app, path: str, bodies, requests: int, concurrency: int):
+    latencies, errors = [], 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(json.dumps(bodies[i % len(bodies)]).encode())
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            start = time.perf_counter()
+            if await post(app, path, body) != 200:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+    }
+
+
+def main(args) -> None:
+    from main import app
+
+    install_resources(args.embed_ms / 1000, args.query_ms / 1000)
+    generator._direct_chain = generator.build_direct_chain(
+        FakeChatModel(first_token_latency=args.llm_ms / 1000, tokens_per_second=2000.0)
+    )
+    router.answer_cache = None
+    router.coalescer = None
+
+    questions = [f"How did GDP and exports change in region {i % 37} ({i})?" for i in range(args.distinct)]
+    ask_bodies = [{"question": q, "mode": "direct"} for q in questions]
+    search_bodies = [{"query": q, "top_k": args.top_k} for q in questions]
+
+    async def measure():
+        rows = []
+        router.search_cache = None
+        rows.append(("/ask direct", await run(app, "/ask", ask_bodies, args.requests, args.concurrency)))
+        rows.append(("/search", await run(app, "/search", search_bodies, args.requests, args.concurrency)))
+        router.search_cache = AnswerCache(max_entries=max(args.distinct, 1))
+        await run(app, "/search", search_bodies, args.distinct, args.concurrency)
+        rows.append(("/search cached", await run(app, "/search", search_bodies, args.requests, args.concurrency)))
+        return rows
+
+    rows = asyncio.run(measure())
+
+    print(f"\n{args.requests} requests over {args.distinct} questions at concurrency {args.concurrency}, "
+          f"top_k={args.top_k}")
+    print(f"  {'':<16} {'requests/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, r in rows:
+        print(f"  {name:<16} {r['requests_per_second']:>11.0f} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--embed-ms", type=float, default=0)
+    parser.add_argument("--query-ms", type=float, default=0)
+    parser.add_argument("--llm-ms", type=float, default=300)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+    if args.offline_tokenizer:
+        from benchmarks.bench_bm25 import offline_tokenizer
+        for p in offline_tokenizer():
+            p.start()
+    main(args)
@@ -0,0 +1,164 @@
+"""
+Import time of the serving and indexing entry points and the server's time
+to ready, checked against a regression budget.
+
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --budget-import-ms 1500 --budget-ready-ms 6000
+
+Each measurement runs in a fresh interpreter with stdin closed and no API
+keys, as under a process manager. "import" is the median wall time of
+``import main`` and ``import backend.indexing``; importing either must not
+load the agent, Google, Pinecone or NLTK stacks. "ready" is the time from
+spawning a server until it answers ``GET /stats``, which includes the
+lifespan warm-up (BM25 encoder, embedding client, agent and direct chain).
+The server uses the local index, a BM25 encoder written to a temporary
+directory, fake embeddings and the fake chat model, so no network is
+needed. The script exits with status 1 when a budget is exceeded. Needs
+NLTK data unless ``--offline-tokenizer`` is given, in which case the
+server imports NLTK before the app to patch it.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import httpx
+
+# Imported lazily by the code that needs them; importing an entry point must not load them
+HEAVY_MODULES = ("langchain.agents", "langchain_google_genai", "pinecone", "pinecone_text", "nltk", "scipy")
+ENTRY_POINTS = ("main", "backend.indexing")
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def child_env(**extra) -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in ("GOOGLE_API_KEY", "PINECONE_API_KEY")}
+    env.update(extra)
+    return env
+
+
+def measure_import(module: str, repeat: int) -> dict:
+    timings = []
+    heavy = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+            stdin=subprocess.DEVNULL, capture_output=True, text=True, check=True, env=child_env(),
+        ).stdout
+        result = json.loads(output)
+        timings.append(result["seconds"])
+        heavy = result["heavy"]
+    return {"module": module, "import_ms": statistics.median(timings) * 1000, "heavy_modules": heavy}
+
+
+def serve(port: int, workdir: str, offline_tokenizer: bool) -> None:
+    """Child process: run the app with offline clients until terminated."""
+    patches = []
+    if offline_tokenizer:
+        from benchmarks.bench_bm25 import offline_tokenizer as tokenizer_patches
+        patches += tokenizer_patches()
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    import uvicorn
+    from main import app
+    from benchmarks.fakes import FakeChatModel
+
+    patches += [
+        patch("backend.resources.BM25_ENCODER_PATH", os.path.join(workdir, "bm25_encoder.bin")),
+        patch("backend.resources.METADATA_INDEX_PATH", os.path.join(workdir, "metadata_index.json")),
+        patch("backend.resources.get_embedding_model", lambda: DeterministicFakeEmbedding(size=16)),
+        patch("backend.generator.get_llm", FakeChatModel),
+    ]
+    for p in patches:
+        p.start()
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def measure_ready(repeat: int, offline_tokenizer: bool) -> dict:
+    from backend.bm25 import FastBM25Encoder
+
+    timings = []
+    with tempfile.TemporaryDirectory() as workdir:
+        FastBM25Encoder().fit(["inflation and GDP growth", "energy prices in Europe"]).dump(
+            os.path.join(workdir, "bm25_encoder.bin")
+        )
+        for _ in range(repeat):
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+            command = [sys.executable, "-m", "benchmarks.bench_startup", "--serve", str(port), "--workdir", workdir]
+            if offline_tokenizer:
+                command.append("--offline-tokenizer")
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                command, stdin=subprocess.DEVNULL,
+                env=child_env(VECTOR_STORE="local", LOCAL_INDEX_PATH=os.path.join(workdir, "local_index")),
+            )
+            try:
+                while True:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"Server exited with status {process.returncode}")
+                    try:
+                        if httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1).status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        time.sleep(0.02)
+                timings.append(time.perf_counter() - start)
+            finally:
+                process.terminate()
+                process.wait()
+    return {"ready_ms": statistics.median(timings) * 1000}
+
+
+def main(args) -> int:
+    results = [measure_import(module, args.repeat) for module in ENTRY_POINTS]
+    ready = measure_ready(args.repeat, args.offline_tokenizer)
+
+    failures = []
+    print(f"\n  {'':<24} {'median ms':>10} {'budget ms':>10}")
+    for result in results:
+        print(f"  {'import ' + result['module']:<24} {result['import_ms']:>10.0f} {args.budget_import_ms:>10.0f}")
+        if result["import_ms"] > args.budget_import_ms:
+            failures.append(f"import {result['module']} took {result['import_ms']:.0f} ms")
+        if result["heavy_modules"]:
+            failures.append(f"import {result['module']} loaded {', '.join(result['heavy_modules'])}")
+    print(f"  {'time to ready':<24} {ready['ready_ms']:>10.0f} {args.budget_ready_ms:>10.0f}")
+    if ready["ready_ms"] > args.budget_ready_ms:
+        failures.append(f"time to ready was {ready['ready_ms']:.0f} ms")
+
+    for failure in failures:
+        print(f"✗ Over budget: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-import-ms", type=float, default=2000)
+    parser.add_argument("--budget-ready-ms", type=float, default=8000)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve is not None:
+        serve(args.serve, args.workdir, args.offline_tokenizer)
+    else:
+        if args.offline_tokenizer:
+            from benchmarks.bench_bm25 import offline_tokenizer
+            for p in offline_tokenizer():
+                p.start()
+        sys.exit(main(args))
@@ -0,0 +1,147 @@
+"""
+Tail latency of calls to a slow-tailed upstream with and without connection reuse and hedging.
+
+    python -m benchmarks.bench_upstream --requests 2000 --concurrency 16
+    python -m benchmarks.bench_upstream --slow-fraction 0.02 --slow-ms 800 --hedge-percentile 90
+
+Starts a local HTTP server that stands in for the embedding or Pinecone
+API. Each request takes ``--fast-ms`` (with some jitter), except a random
+``--slow-fraction`` that take ``--slow-ms``, and ``--error-fraction`` that
+fail with 503. Clients send ``--requests`` queries at ``--concurrency``:
+"new connections" opens a connection per request, "pooled" reuses
+keep-alive connections, and "pooled + policy" also goes through
+``UpstreamPolicy`` with retries and hedging at ``--hedge-percentile``.
+The report gives latency percentiles, failed calls, the requests the
+server received and the connections it accepted.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from backend.upstream import UpstreamPolicy
+
+
+class Unavailable(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class FakeServer:
+    """Latency-injecting stand-in for an upstream API on localhost."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(0)
+        self.requests = 0
+        self.connections = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.connections.add(id(request.transport))
+        roll = self.rng.random()
+        if roll < self.args.error_fraction:
+            return web.Response(status=503)
+        if roll < self.args.error_fraction + self.args.slow_fraction:
+            latency = self.args.slow_ms
+        else:
+            latency = self.args.fast_ms * self.rng.uniform(0.8, 1.5)
+        await asyncio.sleep(latency / 1000)
+        return web.json_response({"matches": []})
+
+    async def start(self) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/query", self.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{runner.addresses[0][1]}/query"
+        return runner
+
+
+async def run(name: str, server: FakeServer, args, pooled: bool, policy: UpstreamPolicy = None):
+    server.requests = 0
+    server.connections = set()
+    connector = aiohttp.TCPConnector(limit=args.pool_size, force_close=not pooled)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures = [], 0
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def send():
+            async with session.post(server.url, json={"top_k": 10}) as response:
+                if response.status >= 400:
+                    raise Unavailable(response.status)
+                return await response.json()
+
+        async def one():
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await (policy.call(send) if policy else send())
+                except Exception:
+                    failures += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        "name": name,
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "failed": failures,
+        "sent": server.requests,
+        "connections": len(server.connections),
+    }
+
+
+async def main(args) -> None:
+    logging.getLogger("backend.upstream").setLevel(logging.ERROR)
+    server = FakeServer(args)
+    runner = await server.start()
+    policy = UpstreamPolicy(
+        "bench", timeout=args.timeout_ms / 1000, hedge_percentile=args.hedge_percentile, retries=2
+    )
+    try:
+        # Fill the policy's latency window so hedging is active from the first measured request
+        await run("warm-up", server, args, pooled=True, policy=policy)
+        results = [
+            await run("new connections", server, args, pooled=False),
+            await run("pooled", server, args, pooled=True),
+            await run("pooled + policy", server, args, pooled=True, policy=policy),
+        ]
+    finally:
+        await runner.cleanup()
+
+    print(f"\n{args.requests} requests at concurrency {args.concurrency}: {args.fast_ms:g} ms typical, "
+          f"{args.slow_fraction:.0%} at {args.slow_ms:g} ms, {args.error_fraction:.0%} errors, "
+          f"hedge at p{args.hedge_percentile:g}")
+    print(f"  {'':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7} {'sent':>6} {'connections':>12}")
+    for r in results:
+        print(f"  {r['name']:<16} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} "
+              f"{r['failed']:>7} {r['sent']:>6} {r['connections']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--fast-ms", type=float, default=20)
+    parser.add_argument("--slow-ms", type=float, default=500)
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--error-fraction", type=float, default=0.01)
+    parser.add_argument("--hedge-percentile", type=float, default=95)
+    parser.add_argument("--timeout-ms", type=float, default=2000)
+    parser.add_argument("--pool-size", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
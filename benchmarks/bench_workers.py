@@ -0,0 +1,224 @@
+"""
+Memory per worker and /ask throughput of the server at increasing worker counts.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --chunks 20000
+    python -m benchmarks.bench_workers --offline-tokenizer --concurrency 32
+
+Builds a local index of ``--chunks`` synthetic chunks and their BM25
+encoder in a temporary directory. Then, for each worker count, it starts the
+server with that many uvicorn workers, fake embeddings and a fake chat model
+that answers at once, so requests cost retrieval and serving time only.
+Clients stream ``/ask`` in direct mode. Memory is read from
+``/proc/<pid>/smaps_rollup`` (Linux only) once the load has run. RSS counts
+every page a worker touched. PSS splits the pages shared between processes
+evenly among them, so total PSS is what the workers cost together. Needs
+NLTK data unless ``--offline-tokenizer`` is given.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from unittest.mock import patch
+
+import httpx
+import numpy as np
+
+from benchmarks.bench_bm25 import synthetic_corpus
+from benchmarks.loadtest import DEFAULT_QUESTIONS, run_level
+
+
+def build_artifacts(workdir: str, n_chunks: int, dimension: int, words_per_chunk: int) -> None:
+    """Write a local index and BM25 encoder like the indexing job's to ``workdir``."""
+    from backend.bm25 import FastBM25Encoder
+    from backend.local_index import LocalHybridIndex
+
+    rng = np.random.default_rng(0)
+    texts = synthetic_corpus(n_chunks, words_per_chunk, 20_000, rng)
+    encoder = FastBM25Encoder().fit(texts)
+    encoder.dump(os.path.join(workdir, "bm25_encoder.bin"))
+
+    dense = rng.standard_normal((n_chunks, dimension)).astype(np.float32)
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+    index = LocalHybridIndex(os.path.join(workdir, "local_index"))
+    batch = 1000
+    for start in range(0, n_chunks, batch):
+        chunk_texts = texts[start:start + batch]
+        sparse = encoder.encode_documents(chunk_texts)
+        index.upsert([
+            {
+                "id": f"chunk-{start + i}",
+                "values": dense[start + i],
+                "sparse_values": sparse[i],
+                "metadata": {"context": text, "title": f"Report {(start + i) // 50}", "page": i % 50},
+            }
+            for i, text in enumerate(chunk_texts)
+        ])
+    index.save()
+
+
+def create_app():
+    """App factory run in every worker: point the app at the benchmark's artifacts and fakes."""
+    workdir = os.environ["BENCH_WORKDIR"]
+    patches = []
+    if os.environ.get("BENCH_OFFLINE_TOKENIZER"):
+        from benchmarks.bench_bm25 import offline_tokenizer
+        patches += offline_tokenizer()
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from benchmarks.fakes import FakeChatModel
+
+    dimension = int(os.environ["BENCH_DIMENSION"])
+    patches += [
+        patch("backend.resources.BM25_ENCODER_PATH", os.path.join(workdir, "bm25_encoder.bin")),
+        patch("backend.resources.METADATA_INDEX_PATH", os.path.join(workdir, "metadata_index.json")),
+        patch("backend.resources.PUBLISHED_PATH", os.path.join(workdir, "published.json")),
+        patch("backend.resources.get_embedding_model", lambda: DeterministicFakeEmbedding(size=dimension)),
+        patch(
+            "backend.generator.get_llm",
+            lambda: FakeChatModel(first_token_latency=0.0, tokens_per_second=100_000.0),
+        ),
+    ]
+    for p in patches:
+        p.start()
+
+    from backend import router
+    from main import app
+
+    # Measure retrieval and generation rather than replays or shared runs
+    router.answer_cache = None
+    router.coalescer = None
+    return app
+
+
+def worker_pids(workdir: str) -> List[int]:
+    """Processes that have the benchmark's local index mapped."""
+    marker = os.path.join(workdir, "local_index")
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            if marker in (entry / "maps").read_text():
+                pids.append(int(entry.name))
+        except OSError:
+            continue
+    return pids
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0])
+    return fields
+
+
+def start_server(workers: int, workdir: str, args) -> subprocess.Popen:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = {
+        **os.environ,
+        "VECTOR_STORE": "local",
+        "LOCAL_INDEX_PATH": os.path.join(workdir, "local_index"),
+        "GOOGLE_API_KEY": "benchmark-placeholder",
+        "BENCH_WORKDIR": workdir,
+        "BENCH_DIMENSION": str(args.dimension),
+    }
+    if args.offline_tokenizer:
+        env["BENCH_OFFLINE_TOKENIZER"] = "1"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_workers", "--serve", str(port), "--workers", str(workers)],
+        stdin=subprocess.DEVNULL, env=env,
+    )
+    process.port = port
+
+    deadline = time.monotonic() + 120
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        if time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError("Server did not start in time")
+        try:
+            ready = httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1).status_code == 200
+        except httpx.TransportError:
+            ready = False
+        # A worker opens the index during its startup, before it accepts requests
+        if ready and len(worker_pids(workdir)) >= workers:
+            return process
+        time.sleep(0.05)
+
+
+def measure(workers: int, workdir: str, args) -> Dict:
+    process = start_server(workers, workdir, args)
+    try:
+        url = f"http://127.0.0.1:{process.port}"
+        bodies = [{"question": q, "mode": "direct"} for q in DEFAULT_QUESTIONS]
+        # Touch the index pages and warm each worker before measuring
+        asyncio.run(run_level(url, bodies, args.concurrency, args.concurrency * 4, None))
+        level = asyncio.run(run_level(url, bodies, args.concurrency, args.requests, None))
+        memory = [memory_kb(pid) for pid in worker_pids(workdir)]
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {
+        "workers": workers,
+        "throughput_rps": level["throughput_rps"],
+        "latency_p95_ms": level["latency_p95_ms"],
+        "errors": level["errors"],
+        "rss_mb": sum(m["Rss"] for m in memory) / len(memory) / 1024,
+        "private_mb": sum(m["Private_Clean"] + m["Private_Dirty"] for m in memory) / len(memory) / 1024,
+        "total_pss_mb": sum(m["Pss"] for m in memory) / 1024,
+    }
+
+
+def main(args) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        build_artifacts(workdir, args.chunks, args.dimension, args.words_per_chunk)
+        size = sum(p.stat().st_size for p in Path(workdir).rglob("*") if p.is_file()) / 1e6
+        print(f"Built {args.chunks} chunks ({size:.0f} MB on disk) in {time.perf_counter() - start:.1f} s")
+        print(f"{os.cpu_count()} CPUs; {args.requests} requests at concurrency {args.concurrency}")
+
+        results = [measure(workers, workdir, args) for workers in args.workers]
+
+    print(f"\n  {'workers':>7} {'req/s':>8} {'p95 ms':>8} {'RSS/worker MB':>14} "
+          f"{'private/worker MB':>18} {'total PSS MB':>13}")
+    for r in results:
+        print(f"  {r['workers']:>7} {r['throughput_rps']:>8.1f} {r['latency_p95_ms']:>8.1f} {r['rss_mb']:>14.1f} "
+              f"{r['private_mb']:>18.1f} {r['total_pss_mb']:>13.1f}")
+        if r["errors"]:
+            print(f"✗ {r['errors']} requests failed with {r['workers']} workers")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--words-per-chunk", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve is not None:
+        import uvicorn
+        uvicorn.run(
+            "benchmarks.bench_workers:create_app", factory=True,
+            host="127.0.0.1", port=args.serve, workers=args.workers[0], log_level="warning",
+        )
+    else:
+        if args.offline_tokenizer:
+            from benchmarks.bench_bm25 import offline_tokenizer
+            for p in offline_tokenizer():
+                p.start()
+        main(args)
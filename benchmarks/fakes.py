@@ -0,0 +1,231 @@
+"""
+Offline stand-ins for the Gemini and Pinecone clients, used by the
+benchmarks so they can run without API keys or network access.
+"""
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.retrievers import BaseRetriever
+
+DEFAULT_ANSWER = (
+    "According to the retrieved reports, GDP grew at an annual rate of 3.1 percent "
+    "in the third quarter of 2024, driven by consumer spending and exports."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token for English text."""
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model. With tools bound, the first turn asks for the
+    retrieval tool and the turn after a tool result streams ``answer`` at
+    ``tokens_per_second``; without tools it answers straight away. Each call
+    appends its estimated prompt and completion tokens to ``calls``.
+    """
+    answer: str = DEFAULT_ANSWER
+    first_token_latency: float = 0.05
+    tokens_per_second: float = 200.0
+    tool_name: str = "retrieve_context"
+    tools_bound: bool = False
+    calls: List[Dict[str, int]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        # Shallow copy, so the bound model records into the same ``calls``
+        return self.model_copy(update={"tools_bound": True})
+
+    def _wants_tool(self, messages: List[BaseMessage]) -> bool:
+        return self.tools_bound and not any(isinstance(m, ToolMessage) for m in messages)
+
+    def _record(self, messages: List[BaseMessage], completion: str) -> None:
+        prompt = "".join(str(m.content) for m in messages)
+        self.calls.append({
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(completion) if completion else 0,
+        })
+
+    def _tool_call_args(self, messages: List[BaseMessage]) -> str:
+        return json.dumps({"query": str(messages[-1].content)})
+
+    def _tokens(self) -> List[str]:
+        words = self.answer.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.first_token_latency)
+        if self._wants_tool(messages):
+            self._record(messages, self._tool_call_args(messages))
+            message = AIMessage(
+                content="",
+                tool_calls=[{
+                    "name": self.tool_name,
+                    "args": json.loads(self._tool_call_args(messages)),
+                    "id": "call_0",
+                }],
+            )
+        else:
+            time.sleep(len(self._tokens()) / self.tokens_per_second)
+            self._record(messages, self.answer)
+            message = AIMessage(content=self.answer)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for chunk in self._chunks(messages):
+            if chunk.message.content:
+                time.sleep(1 / self.tokens_per_second)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(messages):
+            if chunk.message.content:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield chunk
+
+    def _chunks(self, messages: List[BaseMessage]) -> Iterator[ChatGenerationChunk]:
+        if self._wants_tool(messages):
+            self._record(messages, self._tool_call_args(messages))
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[{
+                    "name": self.tool_name,
+                    "args": self._tool_call_args(messages),
+                    "id": "call_0",
+                    "index": 0,
+                }],
+            ))
+            return
+        self._record(messages, self.answer)
+        for token in self._tokens():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeRetriever(BaseRetriever):
+    """Returns the same passages for every query after a fixed delay."""
+    passages: List[str] = [
+        "Real GDP increased at an annual rate of 3.1 percent in the third quarter of 2024.",
+        "Consumer spending and exports were the main contributors to growth.",
+    ]
+    latency: float = 0.0
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs: Any
+    ) -> List[Document]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [Document(page_content=p) for p in self.passages]
+
+
+class LatencyEmbeddings(DeterministicFakeEmbedding):
+    """
+    Deterministic embeddings that take ``latency`` seconds per request and
+    count the requests. Like Gemini's, ``aembed_documents`` takes a
+    ``task_type``, so several queries can be embedded in one request.
+    """
+    latency: float = 0.1
+    requests: int = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        self.requests += 1
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return super().embed_documents(texts)
+
+
+class LatencyIndex:
+    """
+    Wraps an index so each query takes ``latency`` seconds, like a Pinecone
+    round trip. ``async_client`` is the matching asyncio-client stand-in.
+    """
+
+    def __init__(self, index: Any, latency: float = 0.03):
+        self.index = index
+        self.latency = latency
+        self.queries = 0
+
+    def query(self, **kwargs: Any) -> Any:
+        self.queries += 1
+        time.sleep(self.latency)
+        return self.index.query(**kwargs)
+
+    def upsert(self, vectors: Any, **kwargs: Any) -> Any:
+        return self.index.upsert(vectors, **kwargs)
+
+    def async_client(self) -> "_AsyncLatencyIndex":
+        return _AsyncLatencyIndex(self)
+
+
+class _AsyncLatencyIndex:
+    def __init__(self, index: LatencyIndex):
+        self.index = index
+
+    async def query(self, **kwargs: Any) -> Any:
+        self.index.queries += 1
+        await asyncio.sleep(self.index.latency)
+        return self.index.index.query(**kwargs)
+
+    async def close(self) -> None:
+        pass
+
+
+def install_fake_resources(retriever: Optional[BaseRetriever] = None):
+    """Make ``backend.resources.get_resources`` return offline stand-ins."""
+    from backend import resources
+
+    resources._resources = resources.RetrievalResources(
+        bm25_encoder=None,
+        embedding_model=None,
+        index=None,
+        retriever=retriever or FakeRetriever(),
+        artifacts_mtime=resources._artifacts_mtime(),
+        warmup_seconds=0.0,
+        version=0,
+    )
+    return resources._resources
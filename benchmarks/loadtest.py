@@ -0,0 +1,367 @@
+"""
+Offline end-to-end load test of /ask and of the indexing job.
+
+    python -m benchmarks.loadtest ask --concurrency 1 10 50 --requests 200
+    python -m benchmarks.loadtest ask --questions questions.jsonl --mode direct
+    python -m benchmarks.loadtest index --files 50 200
+    python -m benchmarks.loadtest ask --compare benchmarks/results/ask-<earlier run>.json
+
+``ask`` starts the FastAPI app under uvicorn on a local port, backed by the
+stand-ins from ``benchmarks/fakes.py``: a chat model that waits
+``--llm-ms`` before its first token and then streams at ``--tokens-per-second``,
+embeddings taking ``--embed-ms``, and an in-memory index taking
+``--query-ms`` per query over a real BM25 encoder. Clients stream
+``/ask`` over HTTP at each concurrency level; ``--url`` targets a server
+that is already running instead. ``--questions`` replays the ``question``
+(and optional ``mode`` and ``filters``) of each line of a JSONL request log.
+
+``index`` runs the indexing job over generated PDFs with embedding and
+upsert calls that take ``--latency-ms``.
+
+Every run is written to ``benchmarks/results/`` as JSON; ``--compare``
+prints the change against an earlier result file. Peak RSS is that of this
+process, which includes the in-process server. Needs NLTK data unless
+``--offline-tokenizer`` is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+import httpx
+import uvicorn
+
+from backend.context import estimate_tokens
+from benchmarks.bench_bm25 import offline_tokenizer
+from benchmarks.fakes import DEFAULT_ANSWER, FakeChatModel
+
+RESULTS_DIR = Path("benchmarks/results")
+
+DEFAULT_QUESTIONS = [
+    "How did GDP change in the third quarter of 2024?",
+    "What drove consumer spending growth?",
+    "How did energy prices affect inflation in Europe?",
+    "What is the outlook for exports next year?",
+    "Which regions saw the strongest retail sales?",
+    "How did interest rates change during 2024?",
+    "What happened to oil prices in region 12?",
+    "Summarize the employment trends in the reports.",
+]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_questions(path: Optional[str]) -> List[Dict]:
+    """Request bodies to replay: one JSON object with a ``question`` per line."""
+    if path is None:
+        return [{"question": q} for q in DEFAULT_QUESTIONS]
+    bodies = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "question" in record:
+                bodies.append({k: record[k] for k in ("question", "mode", "filters") if k in record})
+    if not bodies:
+        raise ValueError(f"No lines with a 'question' field in {path}")
+    return bodies
+
+
+# -- /ask -------------------------------------------------------------------
+
+def install_offline_backend(args) -> FakeChatModel:
+    """Point the app's retrieval resources and LLM at the offline stand-ins."""
+    from backend import generator, router
+    from benchmarks.bench_async_retrieval import install_resources
+
+    install_resources(args.embed_ms / 1000, args.query_ms / 1000)
+    words = (DEFAULT_ANSWER.split(" ") * (args.answer_words // len(DEFAULT_ANSWER.split(" ")) + 1))
+    llm = FakeChatModel(
+        answer=" ".join(words[:args.answer_words]),
+        first_token_latency=args.llm_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+    )
+    generator._agent_executor = generator.build_agent_executor(llm)
+    generator._direct_chain = generator.build_direct_chain(llm)
+    # Measure generation rather than replays or shared runs
+    router.answer_cache = None
+    router.coalescer = None
+    return llm
+
+
+class LocalServer:
+    """Serve the app with uvicorn on a free local port in a background thread."""
+
+    def __init__(self):
+        from main import app
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "LocalServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def ask_once(client: httpx.AsyncClient, body: Dict, mode: Optional[str]) -> Dict:
+    if mode and "mode" not in body:
+        body = {**body, "mode": mode}
+    start = time.perf_counter()
+    first = None
+    text = []
+    async with client.stream("POST", "/ask", json=body) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            frame = json.loads(line[6:])
+            if frame.get("chunk"):
+                if first is None:
+                    first = time.perf_counter() - start
+                text.append(frame["chunk"])
+    latency = time.perf_counter() - start
+    tokens = estimate_tokens("".join(text)) if text else 0
+    streaming = latency - (first or latency)
+    return {
+        "ttft": first if first is not None else latency,
+        "latency": latency,
+        "tokens": tokens,
+        "tokens_per_second": tokens / streaming if streaming > 0 else 0.0,
+    }
+
+
+async def run_level(url: str, bodies: List[Dict], concurrency: int, n_requests: int, mode: Optional[str]) -> Dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(bodies[i % len(bodies)])
+    samples, errors = [], 0
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            try:
+                samples.append(await ask_once(client, body, mode))
+            except (httpx.HTTPError, ValueError):
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ttft = [s["ttft"] * 1000 for s in samples]
+    latency = [s["latency"] * 1000 for s in samples]
+    rates = [s["tokens_per_second"] for s in samples if s["tokens_per_second"]]
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "ttft_p50_ms": percentile(ttft, 0.5),
+        "ttft_p95_ms": percentile(ttft, 0.95),
+        "ttft_p99_ms": percentile(ttft, 0.99),
+        "latency_p50_ms": percentile(latency, 0.5),
+        "latency_p95_ms": percentile(latency, 0.95),
+        "latency_p99_ms": percentile(latency, 0.99),
+        "tokens_per_second": sum(rates) / len(rates) if rates else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_ask(levels: List[Dict]) -> None:
+    print(
+        f"  {'conc':>5} {'req/s':>7} {'TTFT p50':>9} {'p95':>8} {'p99':>8}"
+        f" {'latency p50':>12} {'p95':>8} {'p99':>8} {'tok/s':>7} {'RSS MB':>7} {'errors':>6}"
+    )
+    for r in levels:
+        print(
+            f"  {r['concurrency']:>5} {r['throughput_rps']:>7.1f} {r['ttft_p50_ms']:>9.1f}"
+            f" {r['ttft_p95_ms']:>8.1f} {r['ttft_p99_ms']:>8.1f} {r['latency_p50_ms']:>12.1f}"
+            f" {r['latency_p95_ms']:>8.1f} {r['latency_p99_ms']:>8.1f} {r['tokens_per_second']:>7.0f}"
+            f" {r['peak_rss_mb']:>7.0f} {r['errors']:>6}"
+        )
+
+
+async def run_ask(args, url: str) -> List[Dict]:
+    bodies = load_questions(args.questions)
+    await run_level(url, bodies, 1, 1, args.mode)  # warm up
+    levels = []
+    for concurrency in args.concurrency:
+        levels.append(await run_level(url, bodies, concurrency, max(args.requests, concurrency), args.mode))
+    return levels
+
+
+def ask_benchmark(args) -> Dict:
+    config = {k: getattr(args, k) for k in (
+        "concurrency", "requests", "mode", "questions", "url", "llm_ms",
+        "tokens_per_second", "answer_words", "embed_ms", "query_ms",
+    )}
+    if args.url:
+        levels = asyncio.run(run_ask(args, args.url))
+    else:
+        install_offline_backend(args)
+        with LocalServer() as server:
+            levels = asyncio.run(run_ask(args, server.url))
+    print_ask(levels)
+    return {"config": config, "results": levels}
+
+
+# -- indexing ---------------------------------------------------------------
+
+def index_benchmark(args) -> Dict:
+    from benchmarks.bench_indexing_pipeline import SlowEmbeddings, SlowIndex, make_corpus, streaming_flow
+
+    latency = args.latency_ms / 1000
+    levels = []
+    for n_files in args.files:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp)
+            make_corpus(folder, n_files, args.pages)
+            index = SlowIndex(latency)
+            start = time.perf_counter()
+            streaming_flow(folder, SlowEmbeddings(latency), index, args.index_concurrency)
+            elapsed = time.perf_counter() - start
+        levels.append({
+            "files": n_files,
+            "pages": n_files * args.pages,
+            "chunks": index.upserted,
+            "seconds": elapsed,
+            "pages_per_second": n_files * args.pages / elapsed,
+            "chunks_per_second": index.upserted / elapsed,
+            "peak_rss_mb": peak_rss_mb(),
+        })
+
+    print(f"  {'files':>6} {'chunks':>7} {'seconds':>8} {'pages/s':>8} {'chunks/s':>9} {'RSS MB':>7}")
+    for r in levels:
+        print(
+            f"  {r['files']:>6} {r['chunks']:>7} {r['seconds']:>8.2f} {r['pages_per_second']:>8.1f}"
+            f" {r['chunks_per_second']:>9.1f} {r['peak_rss_mb']:>7.0f}"
+        )
+    config = {k: getattr(args, k) for k in ("files", "pages", "latency_ms", "index_concurrency")}
+    return {"config": config, "results": levels}
+
+
+# -- results ----------------------------------------------------------------
+
+def save_result(benchmark: str, result: Dict, output: Optional[str]) -> Path:
+    record = {
+        "benchmark": benchmark,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "cpu_count": os.cpu_count(),
+        **result,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"{benchmark}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path = Path(output)
+    path.write_text(json.dumps(record, indent=2))
+    return path
+
+
+def compare(previous_path: str, current: Dict) -> None:
+    """Print each numeric metric of matching levels next to the earlier run."""
+    previous = json.loads(Path(previous_path).read_text())
+    if previous.get("benchmark") != current["benchmark"]:
+        raise ValueError(f"{previous_path} is a '{previous.get('benchmark')}' result")
+    level_key = "concurrency" if current["benchmark"] == "ask" else "files"
+    before = {r[level_key]: r for r in previous["results"]}
+
+    print(f"\nCompared with {previous_path} ({previous.get('git_commit')}, {previous.get('timestamp')})")
+    for result in current["results"]:
+        old = before.get(result[level_key])
+        if old is None:
+            continue
+        print(f"  {level_key} {result[level_key]}")
+        for metric, value in result.items():
+            if metric == level_key or not isinstance(value, (int, float)) or metric not in old:
+                continue
+            change = (value - old[metric]) / old[metric] if old[metric] else 0.0
+            print(f"    {metric:<20} {old[metric]:>10.1f} -> {value:>10.1f}  {change:+7.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    ask = subparsers.add_parser("ask", help="Stream /ask at increasing concurrency")
+    ask.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    ask.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    ask.add_argument("--mode", choices=["agent", "direct"], default=None)
+    ask.add_argument("--questions", default=None, help="JSONL file of /ask request bodies to replay")
+    ask.add_argument("--url", default=None, help="Load-test a running server instead of the offline app")
+    ask.add_argument("--llm-ms", type=float, default=300)
+    ask.add_argument("--tokens-per-second", type=float, default=100)
+    ask.add_argument("--answer-words", type=int, default=100)
+    ask.add_argument("--embed-ms", type=float, default=100)
+    ask.add_argument("--query-ms", type=float, default=30)
+
+    index = subparsers.add_parser("index", help="Index generated PDFs")
+    index.add_argument("--files", type=int, nargs="+", default=[50, 200])
+    index.add_argument("--pages", type=int, default=5)
+    index.add_argument("--latency-ms", type=float, default=40)
+    index.add_argument("--index-concurrency", type=int, default=4)
+
+    for sub in (ask, index):
+        sub.add_argument("--output", default=None, help="Result file (default benchmarks/results/<name>-<time>.json)")
+        sub.add_argument("--compare", default=None, help="Earlier result file to compare with")
+        sub.add_argument("--offline-tokenizer", action="store_true", help="Run without NLTK data")
+    args = parser.parse_args()
+
+    for p in offline_tokenizer() if args.offline_tokenizer else []:
+        p.start()
+
+    run = ask_benchmark if args.benchmark == "ask" else index_benchmark
+    result = {"benchmark": args.benchmark, **run(args)}
+    path = save_result(args.benchmark, result, args.output)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        compare(args.compare, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -45,6 +45,7 @@ async function askQuestion() {
           try {
             const data = JSON.parse(line.slice(6));
             if (data.chunk) appendToStreamingMessage(answerDiv, data.chunk);
+            if (data.error) appendToStreamingMessage(answerDiv, "\n❌ Error: " + data.error);
           } catch (e) {
             console.error("Error parsing JSON:", e);
           }
@@ -1,11 +1,38 @@
+import argparse
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
+from backend.generator import get_agent_executor, get_direct_chain
+from backend.resources import aclose_resources, load_resources
 from backend.router import router as api_router
 
-app = FastAPI(title="RAG Q&A API", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the retrieval stack and the agent once so requests don't pay for it
+    try:
+        resources = await asyncio.to_thread(load_resources)
+        # The first query imports NLTK for the BM25 tokenizer; do it now instead
+        await asyncio.to_thread(resources.bm25_encoder.encode_queries, "warm-up")
+        await asyncio.to_thread(get_agent_executor)
+        await asyncio.to_thread(get_direct_chain)
+        logger.info(f"Warm-up finished in {resources.warmup_seconds * 1000:.1f} ms")
+    except Exception as e:
+        logger.error(f"Warm-up failed, resources will load on first use: {str(e)}")
+    yield
+    await aclose_resources()
+
+
+app = FastAPI(title="RAG Q&A API", version="1.0.0", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -22,4 +49,16 @@ app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    parser = argparse.ArgumentParser(description="Serve the RAG Q&A API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Number of server processes; they share the memory-mapped retrieval artifacts",
+    )
+    args = parser.parse_args()
+    # Worker processes import the app themselves, so it is passed by name
+    uvicorn.run(
+        "main:app" if args.workers > 1 else app,
+        host=args.host, port=args.port, workers=args.workers, log_level="info",
+    )
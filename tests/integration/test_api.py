@@ -0,0 +1,158 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import generator, metrics, resources, router
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from backend.local_index import LocalHybridIndex
+from benchmarks import loadtest
+from benchmarks.fakes import DEFAULT_ANSWER, FakeChatModel
+from main import app
+from tests.unit.conftest import FakeSparseEncoder
+
+PASSAGES = [
+    "Real GDP increased at an annual rate of 3.1 percent in the third quarter of 2024.",
+    "Consumer spending and exports were the main contributors to growth.",
+    "Energy prices fell in Europe while services inflation stayed high.",
+]
+
+
+@pytest.fixture
+def offline_app():
+    """The app backed by an in-memory index, fake embeddings and a fake chat model"""
+    retriever = AsyncHybridSearchRetriever(
+        embeddings=DeterministicFakeEmbedding(size=16),
+        sparse_encoder=FakeSparseEncoder(),
+        index=LocalHybridIndex(),
+        top_k=2,
+    )
+    retriever.add_texts(PASSAGES, metadatas=[{"title": f"Report {i}", "page": 0} for i in range(len(PASSAGES))])
+    resources._resources = resources.RetrievalResources(
+        bm25_encoder=retriever.sparse_encoder,
+        embedding_model=retriever.embeddings,
+        index=retriever.index,
+        retriever=retriever,
+        artifacts_mtime=resources._artifacts_mtime(),
+        warmup_seconds=0.0,
+        version=0,
+    )
+    llm = FakeChatModel(first_token_latency=0.0, tokens_per_second=10_000)
+    with patch.object(generator, "_agent_executor", generator.build_agent_executor(llm)), \
+         patch.object(generator, "_direct_chain", generator.build_direct_chain(llm)), \
+         patch.object(router, "answer_cache", None), \
+         patch.object(router, "coalescer", None):
+        yield llm
+    resources.clear_resources()
+
+
+class TestAskEndToEnd:
+
+    @pytest.mark.parametrize("mode, llm_calls", [("agent", 2), ("direct", 1)])
+    def test_streams_answer(self, offline_app, mode, llm_calls):
+        client = TestClient(app)
+        response = client.post("/ask", json={"question": "How did GDP change?", "mode": mode})
+
+        frames = [json.loads(l[6:]) for l in response.text.split('\n') if l.startswith('data:')]
+        assert response.status_code == 200
+        assert "".join(f["chunk"] for f in frames) == DEFAULT_ANSWER
+        assert len(offline_app.calls) == llm_calls
+        if mode == "agent":
+            # The tool result is part of the answering call's prompt
+            assert offline_app.calls[1]["prompt_tokens"] > offline_app.calls[0]["prompt_tokens"]
+
+    @pytest.mark.parametrize("mode, stages", [
+        ("agent", {"llm_planning", "retrieval", "embed_query", "bm25_encode", "vector_query", "llm_answer"}),
+        ("direct", {"retrieval", "context_packing", "llm_answer"}),
+    ])
+    def test_done_event_carries_timings(self, offline_app, mode, stages):
+        client = TestClient(app)
+        response = client.post("/ask", json={"question": "How did GDP change?", "mode": mode, "timings": True})
+
+        frames = [json.loads(l[6:]) for l in response.text.split('\n') if l.startswith('data:')]
+        done = frames[-1]
+        assert [f["done"] for f in frames].count(True) == 1 and done["source"] == "generated"
+        assert stages <= set(done["timings_ms"])
+        assert 0 < done["timings_ms"]["first_chunk"] <= done["timings_ms"]["total"]
+
+    def test_metrics_endpoint(self, offline_app):
+        client = TestClient(app)
+        client.post("/ask", json={"question": "How did GDP change?", "mode": "direct"})
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'rag_ask_requests_total{mode="direct",status="generated"}' in response.text
+        assert 'rag_stage_duration_seconds_bucket{stage="vector_query",le="+Inf"}' in response.text
+
+    def test_disconnect_cancels_generation(self, offline_app):
+        """Closing the connection mid-answer stops the generation behind it"""
+        state = {"produced": 0, "closed": False}
+
+        async def slow_generate(question):
+            try:
+                for i in range(100):
+                    await asyncio.sleep(0.02)
+                    state["produced"] += 1
+                    yield f"token{i} "
+            finally:
+                state["closed"] = True
+
+        cancelled = metrics.ASK_REQUESTS.value(mode="direct", status="cancelled")
+        with patch.object(router, "generate_direct", slow_generate), loadtest.LocalServer() as server:
+            with httpx.Client(base_url=server.url) as client:
+                with client.stream("POST", "/ask", json={"question": "q", "mode": "direct"}) as response:
+                    first = next(l for l in response.iter_lines() if l.startswith("data:"))
+            deadline = time.time() + 2
+            while not state["closed"] and time.time() < deadline:
+                time.sleep(0.01)
+
+        assert json.loads(first[6:])["chunk"] == "token0 "
+        assert state["closed"] and state["produced"] < 100
+        assert metrics.ASK_REQUESTS.value(mode="direct", status="cancelled") == cancelled + 1
+
+
+class TestLoadTestHarness:
+
+    def test_run_level_against_local_server(self, offline_app):
+        bodies = [{"question": "How did GDP change?"}, {"question": "What drove growth?", "mode": "direct"}]
+        with loadtest.LocalServer() as server:
+            result = asyncio.run(loadtest.run_level(server.url, bodies, concurrency=3, n_requests=6, mode=None))
+
+        assert result["requests"] == 6 and result["errors"] == 0
+        assert 0 < result["ttft_p50_ms"] <= result["latency_p50_ms"]
+        assert result["ttft_p50_ms"] <= result["ttft_p95_ms"] <= result["ttft_p99_ms"]
+        assert result["peak_rss_mb"] > 0
+
+    def test_replays_request_log(self, tmp_path):
+        log = tmp_path / "requests.jsonl"
+        log.write_text(
+            json.dumps({"question": "q1", "mode": "direct", "user": "x"}) + "\n"
+            + json.dumps({"title": "not a request"}) + "\n\n"
+            + json.dumps({"question": "q2", "filters": {"industries": ["energy"]}}) + "\n"
+        )
+        assert loadtest.load_questions(str(log)) == [
+            {"question": "q1", "mode": "direct"},
+            {"question": "q2", "filters": {"industries": ["energy"]}},
+        ]
+
+    def test_results_are_saved_and_compared(self, tmp_path, capsys):
+        previous = {"benchmark": "ask", "config": {}, "results": [{"concurrency": 1, "ttft_p50_ms": 200.0}]}
+        current = {"benchmark": "ask", "config": {}, "results": [{"concurrency": 1, "ttft_p50_ms": 100.0}]}
+        path = loadtest.save_result("ask", previous, str(tmp_path / "before.json"))
+
+        saved = json.loads(path.read_text())
+        assert saved["results"] == previous["results"] and "git_commit" in saved
+        loadtest.compare(str(path), current)
+        assert "-50.0%" in capsys.readouterr().out
@@ -1,7 +1,60 @@
+import re
 import sys
+import zlib
 from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pinecone_text.sparse import bm25_tokenizer
 
 # Add project root to path
 project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
-    sys.path.insert(0, str(project_root))
\ No newline at end of file
+    sys.path.insert(0, str(project_root))
+
+from backend.local_index import LocalHybridIndex
+
+
+class FakeSparseEncoder:
+    """Sparse encoder with one dimension per lower-cased word, the same in every run"""
+
+    def encode_documents(self, texts):
+        return [self.encode_queries(t) for t in texts]
+
+    def encode_queries(self, text):
+        indices = sorted({zlib.crc32(w.encode()) % 1000 for w in text.lower().split()})
+        return {"indices": indices, "values": [1.0] * len(indices)}
+
+
+class CountingIndex(LocalHybridIndex):
+    """Local index that records the filter of every query"""
+
+    def __init__(self, path=None):
+        super().__init__(path)
+        self.filters = []
+
+    @property
+    def queries(self):
+        return len(self.filters)
+
+    def query(self, **kwargs):
+        self.filters.append(kwargs.get("filter"))
+        return super().query(**kwargs)
+
+
+@pytest.fixture
+def offline_tokenizer():
+    """Run the BM25 tokenizer without downloading NLTK punkt and stopword data"""
+    stopwords = MagicMock()
+    stopwords.words.return_value = ["the", "in", "of", "by", "as", "on", "than", "how", "did"]
+    with patch.object(bm25_tokenizer.BM25Tokenizer, "nltk_setup", staticmethod(lambda: None)), \
+         patch.object(bm25_tokenizer, "stopwords", stopwords), \
+         patch.object(bm25_tokenizer, "word_tokenize", lambda text, language: re.findall(r"\w+|[^\w\s]", text)):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def frame_per_chunk():
+    """Send every answer chunk as its own SSE frame unless a test turns coalescing on"""
+    with patch("backend.streaming.SSE_FLUSH_INTERVAL", 0.0):
+        yield
@@ -0,0 +1,116 @@
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.answer_cache import AnswerCache, normalize_question
+from main import app
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAnswerCache:
+
+    def test_normalized_keys(self):
+        """Case, spacing and trailing punctuation don't change the key"""
+        assert normalize_question("  What is  GDP? ") == normalize_question("what is gdp")
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = AnswerCache(max_entries=10, ttl=60, clock=clock)
+        cache.put("q", ["a"])
+
+        assert cache.get("q") == ["a"]
+        clock.now = 61
+        assert cache.get("q") is None
+
+    def test_lru_eviction(self):
+        cache = AnswerCache(max_entries=2, ttl=60)
+        cache.put("a", ["1"])
+        cache.put("b", ["2"])
+        cache.get("a")
+        cache.put("c", ["3"])
+
+        assert cache.get("a") == ["1"]
+        assert cache.get("b") is None
+
+    def test_corpus_version_change_invalidates(self):
+        cache = AnswerCache(max_entries=10, ttl=60)
+        cache.put("q", ["a"], version=(1.0, 1.0))
+
+        assert cache.get("q", version=(2.0, 1.0)) is None
+        assert cache.get("q", version=(1.0, 1.0)) is None
+
+
+class TestAskWithAnswerCache:
+
+    def test_hit_replays_same_frames(self):
+        """A repeated question is streamed from the cache without a new run"""
+        calls = []
+
+        async def mock_generate_chat(question):
+            calls.append(question)
+            for chunk in ["Hello", " world", "!"]:
+                yield chunk
+
+        with patch('backend.router.answer_cache', AnswerCache()), \
+             patch('backend.router.generate_chat', side_effect=mock_generate_chat):
+            first = client.post("/ask", json={"question": "What is AI?"})
+            second = client.post("/ask", json={"question": "what is ai"})
+
+        assert len(calls) == 1
+        assert second.text == first.text
+        frames = [json.loads(l[6:]) for l in second.text.split('\n') if l.startswith('data:')]
+        assert [f['chunk'] for f in frames] == ["Hello", " world", "!", ""]
+
+    def test_failed_answers_are_not_cached(self):
+        """A run that fails part-way reports the error and is generated again next time"""
+        calls = []
+
+        async def mock_generate_chat(question):
+            calls.append(question)
+            yield "Partial"
+            if len(calls) == 1:
+                raise ConnectionError("LLM unavailable")
+
+        with patch('backend.router.answer_cache', AnswerCache()), \
+             patch('backend.router.coalescer', None), \
+             patch('backend.router.generate_chat', side_effect=mock_generate_chat):
+            first = client.post("/ask", json={"question": "What is AI?"})
+            second = client.post("/ask", json={"question": "What is AI?"})
+
+        assert len(calls) == 2
+        frames = [json.loads(l[6:]) for l in first.text.split('\n') if l.startswith('data:')]
+        assert frames[-1]["error"] == "LLM unavailable"
+        assert "error" not in json.loads(second.text.strip().split('\n')[-1][6:])
+
+    def test_modes_are_cached_apart(self):
+        """An agent answer is not replayed for the same question in direct mode"""
+        async def mock_generate_chat(question):
+            yield "agent answer"
+
+        async def mock_generate_direct(question):
+            yield "direct answer"
+
+        with patch('backend.router.answer_cache', AnswerCache()), \
+             patch('backend.router.generate_chat', side_effect=mock_generate_chat), \
+             patch('backend.router.generate_direct', side_effect=mock_generate_direct):
+            agent = client.post("/ask", json={"question": "What is AI?", "mode": "agent"})
+            direct = client.post("/ask", json={"question": "What is AI?", "mode": "direct"})
+
+        assert "agent answer" in agent.text
+        assert "direct answer" in direct.text and "agent answer" not in direct.text
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import batch, generator
+from backend.answer_cache import AnswerCache
+from backend.schemas import BatchQuestion
+from main import app
+
+client = TestClient(app)
+
+
+class FakeBackend:
+    """Stands in for batched retrieval and both generation modes, recording calls"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.retrievals = []
+        self.documents = {}
+        self.active = 0
+        self.max_active = 0
+
+    async def retrieve_many(self, queries, filters, concurrency=None):
+        self.retrievals.append(list(queries))
+        return [[Document(page_content=f"context for {q}")] for q in queries]
+
+    async def _answer(self, question):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(question, 0.01))
+            if question == "fail":
+                raise RuntimeError("generation failed")
+            yield "answer to "
+            yield question
+        finally:
+            self.active -= 1
+
+    def generate_direct(self, question, documents=None):
+        self.documents[question] = documents
+        return self._answer(question)
+
+    def generate_chat(self, question):
+        return self._answer(question)
+
+    def patches(self):
+        return [
+            patch.object(batch, "retrieve_many", self.retrieve_many),
+            patch.object(batch, "generate_direct", self.generate_direct),
+            patch.object(batch, "generate_chat", self.generate_chat),
+        ]
+
+
+@pytest.fixture
+def backend():
+    fake = FakeBackend()
+    for p in fake.patches():
+        p.start()
+    yield fake
+    patch.stopall()
+
+
+def run_batch(questions, **kwargs):
+    async def collect():
+        return [result async for result in batch.answer_batch(questions, **kwargs)]
+    return asyncio.run(collect())
+
+
+def direct(*texts):
+    return [BatchQuestion(question=t, mode="direct", id=f"q{i}") for i, t in enumerate(texts)]
+
+
+class TestAnswerBatch:
+
+    def test_direct_questions_are_retrieved_together(self, backend):
+        results = run_batch(direct("gdp growth", "oil prices"))
+
+        assert backend.retrievals == [["gdp growth", "oil prices"]]
+        assert backend.documents["oil prices"][0].page_content == "context for oil prices"
+        by_id = {r["id"]: r for r in results}
+        assert by_id["q1"]["answer"] == "answer to oil prices"
+        assert by_id["q1"]["index"] == 1
+        assert by_id["q1"]["source"] == "generated"
+        assert set(by_id["q0"]["timings_ms"]) == {"retrieval", "queued", "total"}
+
+    def test_results_arrive_in_completion_order(self, backend):
+        backend.delays = {"slow": 0.2, "fast": 0.0}
+        results = run_batch(direct("slow", "fast"))
+        assert [r["question"] for r in results] == ["fast", "slow"]
+
+    def test_generation_concurrency_is_bounded(self, backend):
+        with patch.object(batch, "BATCH_CONCURRENCY", 3):
+            run_batch(direct(*[f"q{i}" for i in range(10)]), concurrency=2)
+            assert backend.max_active == 2
+            backend.max_active = 0
+            # A request cannot raise the server's limit
+            run_batch(direct(*[f"q{i}" for i in range(10)]), concurrency=50)
+            assert backend.max_active == 3
+
+    def test_failed_question_does_not_stop_the_batch(self, backend):
+        results = run_batch(direct("fail", "gdp growth"))
+
+        by_question = {r["question"]: r for r in results}
+        assert by_question["fail"]["error"] == "generation failed"
+        assert "answer" not in by_question["fail"]
+        assert by_question["gdp growth"]["answer"] == "answer to gdp growth"
+
+    def test_generation_errors_are_reported_and_not_cached(self, backend):
+        """A direct chain that raises gives an error result, not an answer"""
+        class BrokenChain:
+            async def astream(self, inputs):
+                raise ConnectionError("LLM unavailable")
+                yield
+
+        cache = AnswerCache()
+        with patch.object(batch, "generate_direct", generator.generate_direct), \
+             patch.object(generator, "_direct_chain", BrokenChain()):
+            results = run_batch(direct("gdp growth"), answer_cache=cache)
+
+        assert results[0]["error"] == "LLM unavailable"
+        assert "answer" not in results[0]
+        assert cache.stats()["size"] == 0
+
+    def test_agent_questions_retrieve_on_their_own(self, backend):
+        """The agent picks its search queries while answering, so nothing is retrieved up front"""
+        results = run_batch([BatchQuestion(question="gdp growth", mode="agent")])
+        assert backend.retrievals == []
+        assert results[0]["answer"] == "answer to gdp growth"
+
+    def test_cached_answers_skip_retrieval_and_generation(self, backend):
+        cache = AnswerCache()
+        run_batch(direct("gdp growth"), answer_cache=cache)
+        results = run_batch(direct("gdp growth", "oil prices"), answer_cache=cache)
+
+        assert backend.retrievals == [["gdp growth"], ["oil prices"]]
+        by_question = {r["question"]: r for r in results}
+        assert by_question["gdp growth"]["source"] == "cache"
+        assert by_question["gdp growth"]["answer"] == "answer to gdp growth"
+
+    def test_load_questions(self, tmp_path):
+        path = tmp_path / "questions.jsonl"
+        path.write_text(
+            json.dumps({"question": "gdp growth", "id": "a"}) + "\n\n"
+            + json.dumps({"question": "oil", "mode": "direct", "filters": {"industries": ["energy"]}}) + "\n"
+        )
+        questions = batch.load_questions(str(path))
+        assert [q.id for q in questions] == ["a", None]
+        assert questions[1].filters.industries == ["energy"]
+
+
+class TestBatchEndpoint:
+
+    def test_streams_ndjson_results(self, backend):
+        body = {"questions": [{"question": "gdp growth", "mode": "direct", "id": "a"}, {"question": "oil"}]}
+        with patch("backend.router.answer_cache", None):
+            response = client.post("/ask/batch", json=body)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(r["index"] for r in results) == [0, 1]
+        assert {r["id"] for r in results} == {"a", None}
+        assert all(r["answer"].startswith("answer to ") for r in results)
+
+    def test_rejects_oversized_batches(self, backend):
+        with patch("backend.router.BATCH_MAX_QUESTIONS", 1):
+            response = client.post("/ask/batch", json={"questions": [{"question": "a"}, {"question": "b"}]})
+        assert response.status_code == 413
+
+    def test_rejects_invalid_modes(self, backend):
+        response = client.post("/ask/batch", json={"questions": [{"question": "a", "mode": "fast"}]})
+        assert response.status_code == 422
+
+        with patch("backend.generator.GENERATION_MODE", "fast"):
+            response = client.post("/ask/batch", json={"questions": [{"question": "a"}]})
+        assert response.status_code == 422
+        assert "fast" in response.json()["detail"]
+
+    def test_rejects_invalid_concurrency(self):
+        response = client.post("/ask/batch", json={"questions": [{"question": "a"}], "concurrency": 0})
+        assert response.status_code == 422
@@ -0,0 +1,128 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pinecone_text.sparse import BM25Encoder
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.bm25 import BM25Stats, FastBM25Encoder, merge_stats
+
+pytestmark = pytest.mark.usefixtures("offline_tokenizer")
+
+CORPUS = [
+    "GDP grew 3.1% in the third quarter of 2024, driven by consumer spending.",
+    "Inflation eased in the euro area as energy prices fell.",
+    "Oil prices rose sharply; energy stocks rallied!",
+    "The central bank held interest rates steady in December.",
+    "...",
+    "Consumer spending on services grew faster than spending on goods.",
+]
+QUERIES = ["How did consumer spending change?", "energy prices", "unseen tokens only", "?"]
+
+
+@pytest.fixture
+def encoders():
+    return BM25Encoder().fit(CORPUS), FastBM25Encoder().fit(CORPUS)
+
+
+class TestFastBM25Encoder:
+
+    def test_same_statistics(self, encoders):
+        reference, fast = encoders
+        assert fast.n_docs == reference.n_docs
+        assert fast.avgdl == reference.avgdl
+        assert fast.doc_freq == reference.doc_freq
+
+    def test_same_document_vectors(self, encoders):
+        reference, fast = encoders
+        assert fast.encode_documents(CORPUS) == reference.encode_documents(CORPUS)
+
+    def test_same_query_vectors(self, encoders):
+        reference, fast = encoders
+        for query in QUERIES:
+            expected = reference.encode_queries(query)
+            actual = fast.encode_queries(query)
+            assert actual["indices"] == expected["indices"]
+            np.testing.assert_array_equal(actual["values"], expected["values"])
+
+    def test_binary_round_trip_is_memory_mapped(self, encoders, tmp_path):
+        _, fast = encoders
+        path = str(tmp_path / "bm25.bin")
+        fast.dump(path)
+
+        loaded = FastBM25Encoder().load(path)
+        assert isinstance(loaded._df_indices, np.memmap)
+        assert loaded.encode_documents(CORPUS) == fast.encode_documents(CORPUS)
+        assert loaded.encode_queries(QUERIES[0]) == fast.encode_queries(QUERIES[0])
+
+    def test_loads_legacy_json_dump(self, encoders, tmp_path):
+        reference, _ = encoders
+        path = str(tmp_path / "bm25_encoder.json")
+        reference.dump(path)
+
+        loaded = FastBM25Encoder().load(path)
+        assert loaded.encode_documents(CORPUS) == reference.encode_documents(CORPUS)
+        assert loaded.encode_queries(QUERIES[0]) == reference.encode_queries(QUERIES[0])
+
+    def test_json_dump_loads_in_reference_encoder(self, encoders, tmp_path):
+        reference, fast = encoders
+        path = str(tmp_path / "bm25_encoder.json")
+        fast.dump(path)
+
+        assert BM25Encoder().load(path).encode_queries(QUERIES[1]) == reference.encode_queries(QUERIES[1])
+
+
+class TestBM25Stats:
+
+    def test_merged_shards_match_full_fit(self):
+        """Statistics computed per shard and merged equal a fit on the whole corpus"""
+        encoder = FastBM25Encoder()
+        shards = [encoder.compute_stats(CORPUS[:2]), encoder.compute_stats(CORPUS[2:])]
+
+        merged = FastBM25Encoder().set_stats(merge_stats(shards))
+        full = FastBM25Encoder().fit(CORPUS)
+
+        assert merged.doc_freq == full.doc_freq
+        assert (merged.n_docs, merged.avgdl) == (full.n_docs, full.avgdl)
+        assert merged.encode_documents(CORPUS) == full.encode_documents(CORPUS)
+
+    def test_add_and_remove_in_place(self):
+        encoder = FastBM25Encoder()
+        total = encoder.compute_stats(CORPUS[:4])
+        removed = encoder.compute_stats(CORPUS[1:2])
+        added = encoder.compute_stats(CORPUS[4:])
+
+        updated = FastBM25Encoder().set_stats(total - removed + added)
+        expected = FastBM25Encoder().fit(CORPUS[:1] + CORPUS[2:])
+        assert updated.doc_freq == expected.doc_freq
+        assert updated.avgdl == expected.avgdl
+
+    def test_cannot_remove_unknown_shard(self):
+        encoder = FastBM25Encoder()
+        with pytest.raises(ValueError):
+            encoder.compute_stats(CORPUS[:1]) - encoder.compute_stats(CORPUS[2:3])
+
+    def test_shard_round_trip(self, tmp_path):
+        stats = FastBM25Encoder().compute_stats(CORPUS)
+        path = str(tmp_path / "shard.npz")
+        stats.save(path)
+
+        loaded = BM25Stats.load(path)
+        np.testing.assert_array_equal(loaded.indices, stats.indices)
+        np.testing.assert_array_equal(loaded.doc_freq, stats.doc_freq)
+        assert (loaded.n_docs, loaded.sum_doc_len) == (stats.n_docs, stats.sum_doc_len)
+
+    def test_documents_keep_encoding_length(self, tmp_path):
+        """doc_avgdl pins document vectors while queries use the current statistics"""
+        encoder = FastBM25Encoder().fit(CORPUS[:3])
+        pinned = FastBM25Encoder().set_stats(FastBM25Encoder().compute_stats(CORPUS), doc_avgdl=encoder.avgdl)
+        path = str(tmp_path / "bm25.bin")
+        pinned.dump(path)
+        loaded = FastBM25Encoder().load(path)
+
+        assert loaded.encode_documents(CORPUS[0]) == encoder.encode_documents(CORPUS[0])
+        assert loaded.encode_queries(QUERIES[1]) == FastBM25Encoder().fit(CORPUS).encode_queries(QUERIES[1])
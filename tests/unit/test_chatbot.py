@@ -40,14 +40,15 @@ class TestAskEndpoint:
             content = response.text
             lines = [line for line in content.split('\n') if line.startswith('data:')]
             
-            assert len(lines) == 3
+            assert len(lines) == 4
             
-            # Verify chunks
-            for line in lines:
+            # Verify chunks, then the terminal frame
+            for line in lines[:-1]:
                 data = json.loads(line[6:])  # Remove 'data: ' prefix
                 assert 'chunk' in data
                 assert 'done' in data
                 assert data['done'] is False
+            assert json.loads(lines[-1][6:]) == {"chunk": "", "done": True}
     
     def test_ask_question_empty_stream(self):
         """Test with empty response from generate_chat"""
@@ -94,12 +95,15 @@ class TestAskEndpoint:
             yield
         
         with patch('backend.router.generate_chat', side_effect=lambda q: mock_generate_chat_error(q)):
-            # The test client will raise the exception since it occurs during streaming
-            with pytest.raises(ValueError, match="Something went wrong"):
-                response = client.post(
-                    "/ask",
-                    json={"question": "test"}
-                )
+            # The error occurs after the headers are sent, so it ends the stream instead
+            response = client.post(
+                "/ask",
+                json={"question": "test"}
+            )
+            
+            assert response.status_code == 200
+            lines = [line for line in response.text.split('\n') if line.startswith('data:')]
+            assert json.loads(lines[-1][6:]) == {"chunk": "", "done": True, "error": "Something went wrong"}
     
     def test_ask_question_large_stream(self):
         """Test with large number of chunks"""
@@ -115,7 +119,7 @@ class TestAskEndpoint:
             
             assert response.status_code == 200
             lines = [line for line in response.text.split('\n') if line.startswith('data:')]
-            assert len(lines) == 100
+            assert len(lines) == 101
     
     def test_ask_question_special_characters(self):
         """Test with special characters in response"""
@@ -150,7 +154,7 @@ class TestAskEndpoint:
             
             assert response.status_code == 200
             lines = [line for line in response.text.split('\n') if line.startswith('data:')]
-            assert len(lines) == 1
+            assert len(lines) == 2
             data = json.loads(lines[0][6:])
             assert data['chunk'] == "Single response"
             assert data['done'] is False
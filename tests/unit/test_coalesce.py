@@ -0,0 +1,139 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.coalesce import RequestCoalescer
+from main import app
+
+
+def make_upstream(chunks, delay=0.01, calls=None):
+    async def generate():
+        if calls is not None:
+            calls.append(1)
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield chunk
+    return generate
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestRequestCoalescer:
+
+    def test_concurrent_requests_share_one_run(self):
+        coalescer = RequestCoalescer()
+        calls = []
+        upstream = make_upstream(["a", "b", "c"], calls=calls)
+
+        async def run():
+            return await asyncio.gather(*(collect(coalescer.stream("q", upstream)) for _ in range(5)))
+
+        results = asyncio.run(run())
+        assert calls == [1]
+        assert results == [["a", "b", "c"]] * 5
+        assert coalescer.stats() == {"started": 1, "joined": 4, "in_flight": 0}
+
+    def test_late_joiner_replays_earlier_chunks(self):
+        coalescer = RequestCoalescer()
+        calls = []
+        upstream = make_upstream([str(i) for i in range(6)], calls=calls)
+
+        async def run():
+            first = coalescer.stream("q", upstream)
+            seen = [await first.__anext__(), await first.__anext__()]
+            late = asyncio.create_task(collect(coalescer.stream("q", upstream)))
+            seen += await collect(first)
+            return seen, await late
+
+        seen, late = asyncio.run(run())
+        assert calls == [1]
+        assert seen == late == [str(i) for i in range(6)]
+
+    def test_distinct_keys_and_later_requests_run_separately(self):
+        coalescer = RequestCoalescer()
+        calls = []
+        upstream = make_upstream(["x"], calls=calls)
+
+        async def run():
+            await asyncio.gather(collect(coalescer.stream("q1", upstream)), collect(coalescer.stream("q2", upstream)))
+            await collect(coalescer.stream("q1", upstream))
+
+        asyncio.run(run())
+        assert len(calls) == 3
+
+    def test_error_reaches_every_subscriber(self):
+        coalescer = RequestCoalescer()
+
+        async def broken():
+            await asyncio.sleep(0.01)
+            yield "partial"
+            raise ValueError("Something went wrong")
+
+        async def run():
+            return await asyncio.gather(
+                *(collect(coalescer.stream("q", broken)) for _ in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, ValueError) for r in results)
+
+    def test_run_cancelled_when_all_subscribers_leave(self):
+        coalescer = RequestCoalescer()
+        cancelled = []
+
+        async def endless():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "tick"
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            stream = coalescer.stream("q", endless)
+            await stream.__anext__()
+            await stream.aclose()
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        assert cancelled == [True]
+        assert coalescer.stats()["in_flight"] == 0
+
+
+class TestAskCoalescing:
+
+    def test_burst_of_identical_questions(self):
+        calls = []
+
+        async def mock_generate_chat(question):
+            calls.append(question)
+            for chunk in ["Hello", " world"]:
+                await asyncio.sleep(0.02)
+                yield chunk
+
+        async def burst():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                questions = ["What is AI?", "what is ai", "What is AI?", "Something else"]
+                return await asyncio.gather(*(client.post("/ask", json={"question": q}) for q in questions))
+
+        with patch('backend.router.coalescer', RequestCoalescer()), \
+             patch('backend.router.generate_chat', side_effect=mock_generate_chat):
+            responses = asyncio.run(burst())
+
+        assert sorted(calls) == ["Something else", "What is AI?"]
+        for response in responses:
+            frames = [json.loads(l[6:]) for l in response.text.split('\n') if l.startswith('data:')]
+            assert [f["chunk"] for f in frames] == ["Hello", " world", ""]
@@ -0,0 +1,73 @@
+import sys
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.context import SEPARATOR, estimate_tokens, merge_passages, pack_context
+from backend.indexing import make_text_splitter
+
+def page_text(page):
+    return " ".join(f"Sentence {i} about GDP growth on page {page} in the third quarter." for i in range(60))
+
+
+def page_chunks(page=0, title="GDP Third Estimate Q3 2024"):
+    document = Document(page_content=page_text(page), metadata={"uuid": "gdp", "title": title, "page": page})
+    return make_text_splitter(500, 100).split_documents([document])
+
+
+class TestMergePassages:
+
+    def test_overlapping_chunks_rebuild_the_page_text(self):
+        chunks = page_chunks()
+        hits = [chunks[2], chunks[0], chunks[1]]
+
+        passages = merge_passages(hits)
+        assert len(passages) == 1
+        assert passages[0].text == page_text(0)[:chunks[2].metadata["start_index"] + len(chunks[2].page_content)]
+        assert passages[0].rank == 0
+
+    def test_separate_pages_and_gaps_stay_apart(self):
+        chunks = page_chunks()
+        other_page = page_chunks(page=1)
+        passages = merge_passages([chunks[0], chunks[3], other_page[0], chunks[0]])
+
+        assert [p.text for p in passages] == [chunks[0].page_content, chunks[3].page_content, other_page[0].page_content]
+
+    def test_duplicates_without_positions_are_dropped(self):
+        passages = merge_passages([Document(page_content="same text"), Document(page_content="same text ")])
+        assert len(passages) == 1
+
+
+class TestPackContext:
+
+    def test_prefixes_titles_and_saves_tokens(self):
+        chunks = page_chunks()
+        packed = pack_context(chunks[:3])
+
+        assert packed.text.startswith("[GDP Third Estimate Q3 2024, p. 1]\nSentence 0")
+        assert packed.passages == 1
+        assert packed.tokens < packed.raw_tokens
+        assert packed.tokens_saved == packed.raw_tokens - packed.tokens
+
+    def test_respects_token_budget(self):
+        chunks = page_chunks()
+        hits = [chunks[0], chunks[3], chunks[6]]
+        budget = estimate_tokens(chunks[0].page_content) * 2 + 20
+
+        packed = pack_context(hits, budget=budget)
+        assert packed.passages == 2
+        assert packed.tokens <= budget
+        assert estimate_tokens(packed.text) <= budget
+
+    def test_oversized_first_passage_is_truncated(self):
+        packed = pack_context([Document(page_content="x" * 4000)], budget=100)
+        assert packed.passages == 1
+        assert len(packed.text) == 400
+
+    def test_plain_chunks_keep_the_previous_format(self):
+        packed = pack_context([Document(page_content="a"), Document(page_content="b")])
+        assert packed.text == f"a{SEPARATOR}b"
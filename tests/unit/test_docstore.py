@@ -0,0 +1,57 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.docstore import DocStore, vector_metadata
+
+
+class TestDocStore:
+
+    def test_round_trip_and_delete(self, tmp_path):
+        store = DocStore(str(tmp_path / "docstore.sqlite"))
+        store.put_many([
+            ("a", "first chunk", {"title": "A", "page": 1}),
+            ("b", "second chunk", {"title": "B", "page": 2}),
+        ])
+        store.put_many([("a", "first chunk, edited", {"title": "A"})])
+
+        assert store.get_many(["b", "a", "missing", "a"]) == {
+            "a": ("first chunk, edited", {"title": "A"}),
+            "b": ("second chunk", {"title": "B", "page": 2}),
+        }
+        store.delete_many(["a", "missing"])
+        assert list(store.get_many(["a", "b"])) == ["b"]
+        assert len(store) == 1
+
+    def test_lookups_larger_than_the_parameter_limit(self, tmp_path):
+        store = DocStore(str(tmp_path / "docstore.sqlite"))
+        ids = [f"chunk-{i}" for i in range(2500)]
+        store.put_many((doc_id, doc_id, {}) for doc_id in ids)
+
+        assert len(store.get_many(ids)) == 2500
+        store.delete_many(ids[:2000])
+        assert len(store) == 500
+
+    def test_readers_see_other_connections_writes(self, tmp_path):
+        path = str(tmp_path / "docstore.sqlite")
+        assert DocStore.open(path) is None
+        writer = DocStore(path)
+        reader = DocStore.open(path)
+
+        writer.put_many([("a", "text", {})])
+        found = []
+        thread = threading.Thread(target=lambda: found.append(reader.get_many(["a"])))
+        thread.start()
+        thread.join()
+        assert found == [{"a": ("text", {})}]
+
+    def test_vector_metadata_keeps_filter_fields(self):
+        metadata = {
+            "title": "A", "source": "data/a.pdf", "producer": "PyMuPDF",
+            "industries": ["energy"], "country_codes": ["US"], "date_int": 20241001,
+        }
+        assert vector_metadata(metadata) == {"industries": ["energy"], "country_codes": ["US"], "date_int": 20241001}
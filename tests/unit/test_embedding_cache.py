@@ -0,0 +1,187 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.embedding_cache import CachedEmbeddings, EmbeddingStore, text_key
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic fake that records how many texts it embedded"""
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+@pytest.fixture
+def underlying():
+    return CountingEmbeddings(size=8)
+
+
+def make_cache(tmp_path, underlying, **kwargs):
+    return CachedEmbeddings(underlying, model="test-model", cache_dir=str(tmp_path), **kwargs)
+
+
+class TestEmbeddingStore:
+
+    def test_round_trip_and_reopen(self, tmp_path):
+        """Vectors survive reopening the store from disk"""
+        keys = [text_key("m", t) for t in ["a", "b"]]
+        store = EmbeddingStore(str(tmp_path), max_bytes=1 << 20)
+        store.put_many(keys, [[1.0, 2.0], [3.0, 4.0]])
+
+        reopened = EmbeddingStore(str(tmp_path), max_bytes=1 << 20)
+        vectors = reopened.get_many(keys + [text_key("m", "c")])
+
+        assert len(reopened) == 2
+        np.testing.assert_array_equal(vectors[0], [1.0, 2.0])
+        np.testing.assert_array_equal(vectors[1], [3.0, 4.0])
+        assert vectors[2] is None
+
+    def test_sees_rows_from_other_writers(self, tmp_path):
+        """A second handle on the same directory picks up new rows on a miss"""
+        reader = EmbeddingStore(str(tmp_path), max_bytes=1 << 20)
+        writer = EmbeddingStore(str(tmp_path), max_bytes=1 << 20)
+        writer.put_many([text_key("m", "a")], [[1.0, 1.0]])
+
+        np.testing.assert_array_equal(reader.get_many([text_key("m", "a")])[0], [1.0, 1.0])
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Exceeding the size budget drops the oldest unused rows"""
+        # Two-dimensional float32 rows are 8 bytes; allow ten of them
+        store = EmbeddingStore(str(tmp_path), max_bytes=80)
+        keys = [text_key("m", str(i)) for i in range(10)]
+        store.put_many(keys, [[float(i), 0.0] for i in range(10)])
+        store.get_many([keys[0]])
+        store.put_many([text_key("m", "new")], [[99.0, 0.0]])
+
+        assert len(store) <= 9
+        assert store.get_many([keys[0]])[0] is not None
+        assert store.get_many([text_key("m", "new")])[0] is not None
+        assert store.get_many([keys[1]])[0] is None
+
+    def test_reader_racing_an_eviction(self, tmp_path):
+        """A reader holding meta from before an eviction never maps the rewritten files"""
+        store = EmbeddingStore(str(tmp_path), max_bytes=80)
+        keys = [text_key("m", str(i)) for i in range(10)]
+        store.put_many(keys, [[float(i), 0.0] for i in range(10)])
+        stale_meta = store._read_meta()
+
+        store.put_many([text_key("m", "new")], [[99.0, 0.0]])
+        assert store._read_meta()["generation"] == 1
+        assert sorted(p.name for p in tmp_path.iterdir() if p.suffix in (".f32", ".bin")) == [
+            "keys.1.bin", "vectors.1.f32",
+        ]
+
+        real_read_meta = EmbeddingStore._read_meta
+        metas = iter([stale_meta])
+        with patch.object(EmbeddingStore, "_read_meta", lambda self: next(metas, None) or real_read_meta(self)):
+            reader = EmbeddingStore(str(tmp_path), max_bytes=80)
+
+        assert len(reader) == len(store)
+        np.testing.assert_array_equal(reader.get_many([text_key("m", "new")])[0], [99.0, 0.0])
+
+
+class TestCachedEmbeddings:
+
+    def test_documents_are_embedded_once(self, tmp_path, underlying):
+        """Re-embedding the same texts is served from disk"""
+        cache = make_cache(tmp_path, underlying)
+        first = cache.embed_documents(["alpha", "beta"])
+        second = make_cache(tmp_path, underlying).embed_documents(["beta", "alpha", "gamma"])
+
+        assert underlying.calls == 3
+        assert second[0] == pytest.approx(first[1])
+        assert second[1] == pytest.approx(first[0])
+
+    def test_query_memory_and_disk_hits(self, tmp_path, underlying):
+        """Repeated queries hit the LRU, a new process hits the disk store"""
+        cache = make_cache(tmp_path, underlying)
+        vector = cache.embed_query("what is GDP?")
+        cache.embed_query("what is GDP?")
+
+        fresh = make_cache(tmp_path, underlying)
+        assert fresh.embed_query("what is GDP?") == pytest.approx(vector)
+
+        assert underlying.calls == 1
+        assert cache.stats()["query_memory_hits"] == 1
+        assert fresh.stats()["query_disk_hits"] == 1
+
+    def test_stores_share_the_budget(self, tmp_path, underlying):
+        cache = make_cache(tmp_path, underlying, max_bytes=1000)
+        assert cache.document_store.max_bytes + cache.query_store.max_bytes <= 1000
+
+    def test_query_lru_is_bounded(self, tmp_path, underlying):
+        cache = make_cache(tmp_path, underlying, query_cache_size=2)
+        for question in ["a", "b", "c"]:
+            cache.embed_query(question)
+
+        assert cache.stats()["query_memory_size"] == 2
+
+    def test_async_paths_use_cache(self, tmp_path, underlying):
+        cache = make_cache(tmp_path, underlying)
+
+        async def run():
+            await cache.aembed_documents(["alpha"])
+            await cache.aembed_documents(["alpha"])
+            await cache.aembed_query("q")
+            await cache.aembed_query("q")
+
+        asyncio.run(run())
+        assert underlying.calls == 2
+
+    def test_query_lookup_does_not_block_the_loop(self, tmp_path, underlying):
+        """A query waiting on a busy disk store leaves the event loop free"""
+        cache = make_cache(tmp_path, underlying)
+        locked, release = threading.Event(), threading.Event()
+
+        def writer():
+            with cache.query_store._lock:
+                locked.set()
+                release.wait(1.0)
+
+        async def run():
+            task = asyncio.ensure_future(cache.aembed_query("q"))
+            # Only runs if the lookup is not holding up the loop
+            await asyncio.sleep(0.05)
+            release.set()
+            await task
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        locked.wait()
+        start = time.perf_counter()
+        asyncio.run(run())
+        thread.join()
+        assert time.perf_counter() - start < 0.5
+        assert underlying.calls == 1
+
+    def test_batched_queries_embed_only_misses(self, tmp_path, underlying):
+        cache = make_cache(tmp_path, underlying)
+
+        async def run():
+            await cache.aembed_query("q1")
+            first = await cache.aembed_queries(["q1", "q2", "q3"])
+            second = await cache.aembed_queries(["q3", "q2"])
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert underlying.calls == 3
+        assert first == [underlying.embed_query(q) for q in ("q1", "q2", "q3")]
+        assert second == [first[2], first[1]]
@@ -0,0 +1,89 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.embeddings import QUERY_TASK_TYPE, DimensionedEmbeddings, aembed_queries
+
+
+class TruncatingEmbeddings(Embeddings):
+    """Mimics Gemini: returns the first output_dimensionality values, unnormalized"""
+
+    def __init__(self):
+        self.requested = []
+
+    def _vector(self, text, output_dimensionality=None):
+        self.requested.append(output_dimensionality)
+        vector = [float(len(text)), 2.0, 3.0, 4.0]
+        return vector[:output_dimensionality] if output_dimensionality else vector
+
+    def embed_documents(self, texts, output_dimensionality=None):
+        return [self._vector(t, output_dimensionality) for t in texts]
+
+    def embed_query(self, text, output_dimensionality=None):
+        return self._vector(text, output_dimensionality)
+
+
+class TaskTypeEmbeddings(TruncatingEmbeddings):
+    """Also takes Gemini's task_type, and records each batched call"""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    async def aembed_documents(self, texts, task_type=None, output_dimensionality=None):
+        self.batches.append((list(texts), task_type))
+        return self.embed_documents(texts, output_dimensionality)
+
+
+class TestDimensionedEmbeddings:
+
+    def test_requests_reduced_dimension_and_normalizes(self):
+        underlying = TruncatingEmbeddings()
+        embeddings = DimensionedEmbeddings(underlying, dimension=2, normalize=True)
+
+        documents = embeddings.embed_documents(["a", "abcd"])
+        query = embeddings.embed_query("abc")
+
+        assert underlying.requested == [2, 2, 2]
+        assert all(len(v) == 2 for v in documents + [query])
+        assert np.linalg.norm(documents[1]) == pytest.approx(1.0)
+        assert query == pytest.approx([3 / np.sqrt(13), 2 / np.sqrt(13)])
+
+    def test_full_size_passthrough(self):
+        underlying = TruncatingEmbeddings()
+        embeddings = DimensionedEmbeddings(underlying)
+
+        assert embeddings.embed_query("ab") == [2.0, 2.0, 3.0, 4.0]
+        assert underlying.requested == [None]
+
+    def test_batched_queries_use_the_query_task_type(self):
+        underlying = TaskTypeEmbeddings()
+        embeddings = DimensionedEmbeddings(underlying, dimension=2, normalize=True)
+
+        vectors = asyncio.run(aembed_queries(embeddings, ["a", "abc"]))
+
+        assert underlying.batches == [(["a", "abc"], QUERY_TASK_TYPE)]
+        assert vectors[1] == pytest.approx(embeddings.embed_query("abc"))
+
+
+class TestEmbedQueries:
+
+    def test_one_batched_call_when_the_model_takes_a_task_type(self):
+        underlying = TaskTypeEmbeddings()
+        vectors = asyncio.run(aembed_queries(underlying, ["a", "ab"]))
+
+        assert underlying.batches == [(["a", "ab"], QUERY_TASK_TYPE)]
+        assert vectors == [[1.0, 2.0, 3.0, 4.0], [2.0, 2.0, 3.0, 4.0]]
+
+    def test_falls_back_to_one_call_per_query(self):
+        embeddings = DeterministicFakeEmbedding(size=4)
+        vectors = asyncio.run(aembed_queries(embeddings, ["a", "b"]))
+        assert vectors == [embeddings.embed_query("a"), embeddings.embed_query("b")]
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import resources
+from backend.filters import MetadataIndex, build_filter, date_to_int, merge_filters
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from backend.retreiver import request_filters, retrieve_context, retrieve_documents
+from backend.schemas import SearchFilters
+from conftest import CountingIndex, FakeSparseEncoder
+from main import app
+
+client = TestClient(app)
+
+DOCUMENTS = {
+    "us-energy": {"industries": ["energy"], "country_codes": ["US"], "date": "2024-07-15"},
+    "de-energy": {"industries": ["energy", "manufacturing"], "country_codes": ["DE"], "date": "2025-01-20"},
+    "us-retail": {"industries": ["retail"], "country_codes": ["US"], "date": "2024-11-02"},
+}
+
+
+@pytest.fixture
+def filtered_resources():
+    index = CountingIndex()
+    retriever = AsyncHybridSearchRetriever(
+        embeddings=DeterministicFakeEmbedding(size=16),
+        sparse_encoder=FakeSparseEncoder(),
+        index=index,
+        top_k=5,
+    )
+    texts, metadatas = [], []
+    for uuid, metadata in DOCUMENTS.items():
+        for n in range(2):
+            texts.append(f"{uuid} outlook part {n}")
+            metadatas.append({"uuid": uuid, **metadata, "date_int": date_to_int(metadata["date"])})
+    retriever.add_texts(texts, metadatas=metadatas)
+
+    indexed = {f"{uuid}.pdf": {"chunk_ids": ["x", "y"]} for uuid in DOCUMENTS}
+    resources._resources = resources.RetrievalResources(
+        bm25_encoder=retriever.sparse_encoder,
+        embedding_model=retriever.embeddings,
+        index=index,
+        retriever=retriever,
+        artifacts_mtime=resources._artifacts_mtime(),
+        warmup_seconds=0.0,
+        version=0,
+        metadata_index=MetadataIndex.build(indexed, DOCUMENTS),
+    )
+    yield index
+    resources.clear_resources()
+
+
+def uuids(documents):
+    return sorted({d.metadata["uuid"] for d in documents})
+
+
+class TestBuildFilter:
+
+    def test_translates_to_pinecone_filter(self):
+        filters = SearchFilters(industries=["energy"], country_codes=["US", "DE"], date_from="2024-07-01")
+        assert build_filter(filters) == {"$and": [
+            {"industries": {"$in": ["energy"]}},
+            {"country_codes": {"$in": ["US", "DE"]}},
+            {"date_int": {"$gte": 20240701}},
+        ]}
+        assert build_filter(SearchFilters(date_to="2024-12-31")) == {"date_int": {"$lte": 20241231}}
+        assert build_filter(SearchFilters()) is None
+        assert build_filter(None) is None
+
+    def test_merge_prefers_override(self):
+        base = SearchFilters(industries=["energy"], country_codes=["US"])
+        override = SearchFilters(country_codes=["DE"])
+        merged = merge_filters(base, override)
+        assert merged.industries == ["energy"] and merged.country_codes == ["DE"]
+        assert merge_filters(None, override) is override
+
+
+class TestMetadataIndex:
+
+    def test_counts_matching_chunks(self, tmp_path):
+        indexed = {"us-energy.pdf": {"chunk_ids": ["a", "b", "c"]}, "us-retail.pdf": {"chunk_ids": ["d"]}}
+        metadata_index = MetadataIndex.build(indexed, DOCUMENTS)
+        metadata_index.save(str(tmp_path / "metadata_index.json"))
+        loaded = MetadataIndex.load(str(tmp_path / "metadata_index.json"))
+
+        assert loaded.count(None) == 4
+        assert loaded.count(SearchFilters(country_codes=["US"])) == 4
+        assert loaded.count(SearchFilters(industries=["energy", "retail"], date_to="2024-08-01")) == 3
+        assert loaded.count(SearchFilters(industries=["agriculture"])) == 0
+        assert loaded.values("industries") == ["energy", "retail"]
+        assert MetadataIndex.load(str(tmp_path / "missing.json")) is None
+
+
+class TestFilteredRetrieval:
+
+    def test_filter_is_pushed_into_query(self, filtered_resources):
+        filters = SearchFilters(industries=["energy"], date_from="2025-01-01")
+        documents = asyncio.run(retrieve_documents("outlook", filters))
+
+        assert uuids(documents) == ["de-energy"]
+        assert filtered_resources.filters == [build_filter(filters)]
+
+    def test_no_candidates_skips_query(self, filtered_resources):
+        documents = asyncio.run(retrieve_documents("outlook", SearchFilters(country_codes=["JP"])))
+
+        assert documents == []
+        assert filtered_resources.filters == []
+
+    def test_tool_applies_model_and_request_filters(self, filtered_resources):
+        async def run():
+            request_filters.set(SearchFilters(country_codes=["US"]))
+            return await retrieve_context.ainvoke(
+                {"query": "outlook", "industries": ["energy"], "country_codes": ["DE"]}
+            )
+
+        contents = asyncio.run(run())
+        assert {part.split(" ")[0] for part in contents.split("\n\n---\n\n")} == {"us-energy"}
+
+    def test_tool_rejects_invalid_dates(self, filtered_resources):
+        contents = asyncio.run(retrieve_context.ainvoke({"query": "outlook", "date_from": "last year"}))
+        assert contents.startswith("Invalid filters")
+        assert filtered_resources.filters == []
+
+
+class TestAskWithFilters:
+
+    def test_filters_reach_retrieval(self):
+        seen = []
+
+        async def mock_generate_chat(question):
+            seen.append(request_filters.get())
+            yield "ok"
+
+        with patch('backend.router.generate_chat', side_effect=mock_generate_chat):
+            response = client.post("/ask", json={
+                "question": "Energy outlook?",
+                "filters": {"industries": ["energy"], "date_from": "2024-07-01"},
+            })
+
+        frames = [json.loads(l[6:]) for l in response.text.split('\n') if l.startswith('data:')]
+        assert frames == [{"chunk": "ok", "done": False}, {"chunk": "", "done": True}]
+        assert seen == [SearchFilters(industries=["energy"], date_from="2024-07-01")]
+
+    def test_invalid_filters_rejected(self):
+        response = client.post("/ask", json={"question": "q", "filters": {"date_from": "soon"}})
+        assert response.status_code == 422
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.retrievers import BaseRetriever
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import generator, resources
+from main import app
+
+client = TestClient(app)
+
+
+class RecordingChatModel(GenericFakeChatModel):
+    prompts: list = []
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages)
+        return super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class StaticRetriever(BaseRetriever):
+    queries: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.queries.append(query)
+        return [Document(page_content="GDP grew 3.1 percent"), Document(page_content="Exports rose")]
+
+
+@pytest.fixture
+def fake_resources():
+    retriever = StaticRetriever()
+    resources._resources = resources.RetrievalResources(
+        bm25_encoder=None,
+        embedding_model=None,
+        index=None,
+        retriever=retriever,
+        artifacts_mtime=resources._artifacts_mtime(),
+        warmup_seconds=0.0,
+        version=0,
+    )
+    yield retriever
+    resources.clear_resources()
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestDirectMode:
+
+    def test_single_llm_call_with_retrieved_context(self, fake_resources):
+        llm = RecordingChatModel(messages=iter([AIMessage(content="GDP grew 3.1 percent.")]))
+        with patch.object(generator, "_direct_chain", generator.build_direct_chain(llm)):
+            chunks = asyncio.run(collect(generator.generate_direct("How did GDP change?")))
+
+        assert "".join(chunks) == "GDP grew 3.1 percent."
+        assert len(chunks) > 1
+        assert fake_resources.queries == ["How did GDP change?"]
+        assert len(llm.prompts) == 1
+        system, human = llm.prompts[0]
+        assert "GDP grew 3.1 percent\n\n---\n\nExports rose" in system.content
+        assert human.content == "How did GDP change?"
+
+    def test_errors_are_raised(self, fake_resources):
+        class BrokenRetriever(StaticRetriever):
+            def _get_relevant_documents(self, query, *, run_manager):
+                raise ConnectionError("index unavailable")
+
+        resources._resources.retriever = BrokenRetriever()
+        with patch.object(generator, "_direct_chain", generator.build_direct_chain(RecordingChatModel(messages=iter([])))):
+            with pytest.raises(ConnectionError, match="index unavailable"):
+                asyncio.run(collect(generator.generate_direct("q")))
+
+    def test_resolve_mode(self):
+        assert generator.resolve_mode("direct") == "direct"
+        with patch.object(generator, "GENERATION_MODE", "direct"):
+            assert generator.resolve_mode(None) == "direct"
+        with pytest.raises(ValueError):
+            generator.resolve_mode("other")
+
+
+class TestAskModeSelection:
+
+    @staticmethod
+    def fake_generator(label):
+        async def generate(question):
+            yield label
+        return generate
+
+    def ask(self, **payload):
+        with patch('backend.router.generate_chat', side_effect=self.fake_generator("agent")), \
+             patch('backend.router.generate_direct', side_effect=self.fake_generator("direct")):
+            response = client.post("/ask", json={"question": "What is AI?", **payload})
+        frames = [json.loads(l[6:]) for l in response.text.split('\n') if l.startswith('data:')]
+        return response, frames
+
+    def test_per_request_mode(self):
+        _, frames = self.ask(mode="direct")
+        assert frames == [{"chunk": "direct", "done": False}, {"chunk": "", "done": True}]
+
+    def test_server_default_mode(self):
+        with patch.object(generator, "GENERATION_MODE", "direct"):
+            _, frames = self.ask()
+        assert frames == [{"chunk": "direct", "done": False}, {"chunk": "", "done": True}]
+
+        _, frames = self.ask()
+        assert frames == [{"chunk": "agent", "done": False}, {"chunk": "", "done": True}]
+
+    def test_unknown_mode_rejected(self):
+        response, _ = self.ask(mode="other")
+        assert response.status_code == 422
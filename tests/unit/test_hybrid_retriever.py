@@ -0,0 +1,286 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import resources
+from backend.docstore import DocStore
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from backend.local_index import LocalHybridIndex
+from backend.retreiver import retrieve_context, retrieve_many
+from backend.schemas import SearchFilters
+from conftest import FakeSparseEncoder
+
+TEXTS = ["inflation rose in europe", "oil prices fell sharply", "retail sales were flat"]
+
+
+class FakeAsyncIndex:
+    """Stands in for Pinecone's asyncio client by delegating to a local index."""
+
+    def __init__(self, index):
+        self.index = index
+        self.queries = 0
+        self.closed = False
+
+    async def query(self, **kwargs):
+        self.queries += 1
+        return self.index.query(**kwargs)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def retriever():
+    retriever = AsyncHybridSearchRetriever(
+        embeddings=DeterministicFakeEmbedding(size=16),
+        sparse_encoder=FakeSparseEncoder(),
+        index=LocalHybridIndex(),
+        top_k=2,
+    )
+    retriever.add_texts(TEXTS, ids=["a", "b", "c"], metadatas=[{"n": i} for i in range(3)])
+    return retriever
+
+
+class TestAsyncHybridSearchRetriever:
+
+    def test_async_matches_sync(self, retriever):
+        sync_docs = retriever.invoke("oil prices fell sharply")
+        async_docs = asyncio.run(retriever.ainvoke("oil prices fell sharply"))
+
+        assert [d.page_content for d in async_docs] == [d.page_content for d in sync_docs]
+        assert async_docs[0].page_content == "oil prices fell sharply"
+        assert [d.metadata for d in async_docs] == [d.metadata for d in sync_docs]
+
+    def test_uses_one_async_client_per_loop(self, retriever):
+        clients = []
+
+        def factory():
+            clients.append(FakeAsyncIndex(retriever.index))
+            return clients[-1]
+
+        retriever.async_index_factory = factory
+
+        async def run():
+            await asyncio.gather(*(retriever.ainvoke(t) for t in TEXTS))
+            await retriever.aclose()
+
+        asyncio.run(run())
+        assert len(clients) == 1
+        assert clients[0].queries == 3
+        assert clients[0].closed
+
+    def test_replaced_retriever_closes_clients_on_their_loop(self, retriever):
+        clients = []
+
+        def factory():
+            clients.append(FakeAsyncIndex(retriever.index))
+            return clients[-1]
+
+        retriever.async_index_factory = factory
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        thread = threading.Thread(target=lambda: (ready.set(), loop.run_forever()))
+        thread.start()
+        try:
+            ready.wait()
+            asyncio.run_coroutine_threadsafe(retriever.ainvoke("oil prices"), loop).result(timeout=5)
+            successor = AsyncHybridSearchRetriever(
+                embeddings=retriever.embeddings, sparse_encoder=retriever.sparse_encoder, index=retriever.index,
+                top_k=2, async_index_factory=factory,
+            )
+            successor.adopt_async_clients(retriever)
+            asyncio.run_coroutine_threadsafe(successor.ainvoke("oil prices"), loop).result(timeout=5)
+            assert len(clients) == 1 and clients[0].queries == 2
+
+            successor.close_async_clients()
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0.01), loop).result(timeout=5)
+            assert clients[0].closed
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def test_clients_of_closed_loops_are_dropped(self, retriever):
+        retriever.async_index_factory = lambda: FakeAsyncIndex(retriever.index)
+        for _ in range(3):
+            asyncio.run(retriever.ainvoke("oil prices"))
+        assert len(retriever._async_indexes) == 1
+
+    def test_embeds_and_encodes_concurrently(self, retriever):
+        """The BM25 query vector is encoded while the embedding request is in flight"""
+        embedding_started = threading.Event()
+        overlapped = []
+        embeddings = retriever.embeddings
+        sparse_encoder = retriever.sparse_encoder
+
+        class SlowEmbeddings(DeterministicFakeEmbedding):
+            async def aembed_query(self, text):
+                embedding_started.set()
+                await asyncio.sleep(0.05)
+                return embeddings.embed_query(text)
+
+        class WaitingEncoder(FakeSparseEncoder):
+            def encode_queries(self, text):
+                overlapped.append(embedding_started.wait(timeout=1))
+                return sparse_encoder.encode_queries(text)
+
+        retriever.embeddings = SlowEmbeddings(size=16)
+        retriever.sparse_encoder = WaitingEncoder()
+
+        docs = asyncio.run(retriever.ainvoke("oil prices fell sharply"))
+        assert overlapped == [True]
+        assert docs[0].page_content == "oil prices fell sharply"
+
+
+    def test_search_many_matches_single_searches(self, retriever):
+        """Each query gets the documents ainvoke would return, with its own filter"""
+        queries = ["oil prices fell sharply", "inflation rose in europe", "oil prices fell sharply"]
+        filters = [None, None, {"n": {"$eq": 2}}]
+
+        async def run():
+            many = await retriever.asearch_many(queries, filters)
+            single = [await retriever.ainvoke(q, **({"filter": f} if f else {})) for q, f in zip(queries, filters)]
+            return many, single
+
+        many, single = asyncio.run(run())
+        assert [[d.page_content for d in docs] for docs in many] == [[d.page_content for d in docs] for docs in single]
+        assert [d.metadata["n"] for d in many[2]] == [2]
+
+    def test_search_many_bounds_concurrent_queries(self, retriever):
+        active, peak = 0, []
+
+        class SlowAsyncIndex(FakeAsyncIndex):
+            async def query(self, **kwargs):
+                nonlocal active
+                active += 1
+                peak.append(active)
+                await asyncio.sleep(0.01)
+                active -= 1
+                return await super().query(**kwargs)
+
+        retriever.async_index_factory = lambda: SlowAsyncIndex(retriever.index)
+        results = asyncio.run(retriever.asearch_many([f"oil prices {i}" for i in range(10)], concurrency=3))
+        assert len(results) == 10
+        assert max(peak) == 3
+
+    def test_search_many_embeds_distinct_queries_once(self, retriever):
+        batches = []
+        embeddings = retriever.embeddings
+
+        class BatchEmbeddings(DeterministicFakeEmbedding):
+            async def aembed_queries(self, texts):
+                batches.append(list(texts))
+                return [embeddings.embed_query(t) for t in texts]
+
+        retriever.embeddings = BatchEmbeddings(size=16)
+        asyncio.run(retriever.asearch_many(["oil prices", "retail sales", "oil prices"]))
+        assert batches == [["oil prices", "retail sales"]]
+
+
+class TestDocStoreHydration:
+
+    @pytest.fixture
+    def slim_retriever(self, tmp_path):
+        """Vectors with IDs and filter fields only, their text and metadata in a docstore"""
+        embeddings = DeterministicFakeEmbedding(size=16)
+        encoder = FakeSparseEncoder()
+        index = LocalHybridIndex()
+        index.upsert([
+            {
+                "id": doc_id,
+                "values": embeddings.embed_query(text),
+                "sparse_values": encoder.encode_queries(text),
+                "metadata": {"industries": ["energy"]},
+            }
+            for doc_id, text in zip(["a", "b", "c"], TEXTS)
+        ])
+        docstore = DocStore(str(tmp_path / "docstore.sqlite"))
+        docstore.put_many((doc_id, text, {"title": f"Report {doc_id}", "page": 3}) for doc_id, text in zip("abc", TEXTS))
+        return AsyncHybridSearchRetriever(
+            embeddings=embeddings, sparse_encoder=encoder, index=index, docstore=docstore, top_k=2,
+        )
+
+    def test_hits_are_hydrated_from_the_docstore(self, slim_retriever):
+        sync_docs = slim_retriever.invoke("oil prices fell sharply")
+        async_docs = asyncio.run(slim_retriever.ainvoke("oil prices fell sharply"))
+
+        for docs in (sync_docs, async_docs):
+            assert docs[0].page_content == "oil prices fell sharply"
+            assert docs[0].metadata["title"] == "Report b"
+            assert docs[0].metadata["industries"] == ["energy"]
+            assert "score" in docs[0].metadata
+
+    def test_one_lookup_per_batch_of_searches(self, slim_retriever):
+        lookups = []
+        get_many = slim_retriever.docstore.get_many
+        slim_retriever.docstore.get_many = lambda ids: lookups.append(ids) or get_many(ids)
+
+        results = asyncio.run(slim_retriever.asearch_many(TEXTS))
+        assert len(lookups) == 1
+        assert [docs[0].page_content for docs in results] == TEXTS
+
+    def test_hits_with_text_or_without_a_stored_chunk(self, slim_retriever):
+        slim_retriever.index.upsert([{
+            "id": "d",
+            "values": slim_retriever.embeddings.embed_query("legacy chunk"),
+            "metadata": {"context": "legacy chunk", "title": "Legacy"},
+        }])
+        slim_retriever.docstore.delete_many(["a"])
+        slim_retriever.top_k = 4
+
+        docs = asyncio.run(slim_retriever.ainvoke("legacy chunk"))
+        assert {d.page_content for d in docs} == {"legacy chunk", TEXTS[1], TEXTS[2]}
+        assert [d.metadata["title"] for d in docs if d.page_content == "legacy chunk"] == ["Legacy"]
+
+
+class TestRetrieveContextTool:
+
+    def test_tool_runs_async_retrieval(self, retriever):
+        resources._resources = resources.RetrievalResources(
+            bm25_encoder=retriever.sparse_encoder,
+            embedding_model=retriever.embeddings,
+            index=retriever.index,
+            retriever=retriever,
+            artifacts_mtime=resources._artifacts_mtime(),
+            warmup_seconds=0.0,
+            version=0,
+        )
+        try:
+            contents = asyncio.run(retrieve_context.ainvoke({"query": "oil prices fell sharply"}))
+        finally:
+            resources.clear_resources()
+
+        assert contents.split("\n\n---\n\n")[0] == "oil prices fell sharply"
+
+    def test_retrieve_many_skips_queries_no_chunk_can_match(self, retriever):
+        metadata_index = MagicMock()
+        metadata_index.count.return_value = 0
+        resources._resources = resources.RetrievalResources(
+            bm25_encoder=retriever.sparse_encoder,
+            embedding_model=retriever.embeddings,
+            index=retriever.index,
+            retriever=retriever,
+            artifacts_mtime=resources._artifacts_mtime(),
+            warmup_seconds=0.0,
+            version=0,
+            metadata_index=metadata_index,
+        )
+        try:
+            results = asyncio.run(retrieve_many(
+                ["oil prices fell sharply", "retail sales were flat"],
+                [None, SearchFilters(industries=["mining"])],
+            ))
+        finally:
+            resources.clear_resources()
+
+        assert results[0][0].page_content == "oil prices fell sharply"
+        assert results[1] == []
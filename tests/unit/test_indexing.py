@@ -0,0 +1,338 @@
+import json
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, call, patch
+
+import pymupdf
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import indexing
+from backend.bm25 import FastBM25Encoder
+from backend.manifest import file_fingerprint
+
+
+def make_pdf(path: Path, pages: int) -> None:
+    doc = pymupdf.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{path.stem} page {i} about inflation and GDP")
+    doc.save(str(path))
+    doc.close()
+
+
+@pytest.fixture
+def pdf_folder(tmp_path):
+    for name, pages in [("c-report", 1), ("a-report", 2), ("b-report", 3)]:
+        make_pdf(tmp_path / f"{name}.pdf", pages)
+    (tmp_path / "empty.pdf").write_bytes(b"")
+    return tmp_path
+
+
+@pytest.fixture
+def metadata_lookup():
+    return {
+        "a-report": {
+            "uuid": "a-report",
+            "title": "Report A",
+            "industries": ["energy"],
+            "date": "2024-10-01",
+            "country_codes": ["US"],
+        }
+    }
+
+
+class TestLoadAllPdfs:
+
+    def test_files_listed_in_stable_order(self, pdf_folder):
+        """Globbing is sorted so runs are reproducible"""
+        names = [p.name for p in indexing.list_pdf_files(pdf_folder)]
+        assert names == ["a-report.pdf", "b-report.pdf", "c-report.pdf", "empty.pdf"]
+
+    def test_sequential_loading(self, pdf_folder, metadata_lookup):
+        """Pages follow file order, errors are reported per file and metadata is merged"""
+        pdf_files = indexing.list_pdf_files(pdf_folder)
+        documents, errors = indexing.load_all_pdfs(pdf_files, metadata_lookup, workers=1)
+
+        assert len(documents) == 6
+        assert errors == ["empty.pdf: Empty file"]
+        assert documents[0].metadata["title"] == "Report A"
+        assert "uuid" not in documents[2].metadata
+        assert [Path(d.metadata["source"]).stem for d in documents] == (
+            ["a-report"] * 2 + ["b-report"] * 3 + ["c-report"]
+        )
+
+    def test_process_pool_matches_sequential(self, pdf_folder, metadata_lookup):
+        """The process pool returns the same pages in the same order"""
+        pdf_files = indexing.list_pdf_files(pdf_folder)
+        sequential, seq_errors = indexing.load_all_pdfs(pdf_files, metadata_lookup, workers=1)
+        parallel, par_errors = indexing.load_all_pdfs(pdf_files, metadata_lookup, workers=3)
+
+        assert par_errors == seq_errors
+        assert [d.page_content for d in parallel] == [d.page_content for d in sequential]
+        assert [d.metadata for d in parallel] == [d.metadata for d in sequential]
+
+
+@pytest.fixture
+def indexing_env(tmp_path, pdf_folder, metadata_lookup, offline_tokenizer):
+    """Run indexing.main against temp paths with offline index and embeddings"""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    metadata_path = pdf_folder / "metadata.jsonl"
+    metadata_path.write_text(json.dumps(metadata_lookup["a-report"]) + "\n")
+    bm25_path = tmp_path / "bm25_encoder.bin"
+
+    index = MagicMock()
+    index.describe_index_stats.return_value = {"total_vector_count": 0}
+    get_embedding = MagicMock(side_effect=lambda: DeterministicFakeEmbedding(size=8))
+
+    with patch.object(indexing, "DOCUMENTS_PATH", pdf_folder), \
+         patch.object(indexing, "METADATA_PATH", metadata_path), \
+         patch.object(indexing, "BM25_ENCODER_PATH", str(bm25_path)), \
+         patch.object(indexing, "LEGACY_BM25_ENCODER_PATH", str(tmp_path / "bm25_encoder.json")), \
+         patch.object(indexing, "BM25_SHARDS_DIR", str(tmp_path / "shards")), \
+         patch.object(indexing, "MANIFEST_PATH", str(tmp_path / "manifest.json")), \
+         patch.object(indexing, "PUBLISHED_PATH", str(tmp_path / "published.json")), \
+         patch.object(indexing, "DOCSTORE_PATH", str(tmp_path / "docstore.sqlite")), \
+         patch.object(indexing, "CHECKPOINT_PATH", str(tmp_path / "checkpoint.log")), \
+         patch.object(indexing, "METADATA_INDEX_PATH", str(tmp_path / "metadata_index.json")), \
+         patch.object(indexing, "get_index", return_value=index), \
+         patch.object(indexing, "get_embedding_model", get_embedding):
+        yield pdf_folder, index, get_embedding
+
+
+def upserted_ids(index):
+    return [v["id"] for c in index.upsert.call_args_list for v in c.args[0]]
+
+
+class TestIncrementalIndexing:
+
+    def test_chunk_ids_are_deterministic(self, pdf_folder, metadata_lookup):
+        """The same files always produce the same chunk IDs"""
+        pdf_files = indexing.list_pdf_files(pdf_folder)
+        fingerprints = {p.name: file_fingerprint(p, metadata_lookup.get(p.stem)) for p in pdf_files}
+
+        def ids_for_run():
+            documents, _ = indexing.load_all_pdfs(pdf_files, metadata_lookup)
+            return indexing.assign_chunk_ids(documents, fingerprints)
+
+        assert ids_for_run() == ids_for_run()
+        ids, ids_by_file = ids_for_run()
+        assert len(set(ids)) == len(ids)
+        assert len(ids_by_file["b-report.pdf"]) == 3
+
+    def test_unchanged_corpus_skips_embedding(self, indexing_env):
+        """A second run with no changes makes no index or embedding calls"""
+        _, index, get_embedding = indexing_env
+
+        indexing.main(workers=1)
+        assert len(upserted_ids(index)) == 6
+        index.reset_mock()
+        get_embedding.reset_mock()
+
+        indexing.main(workers=1)
+        get_embedding.assert_not_called()
+        index.upsert.assert_not_called()
+        index.delete.assert_not_called()
+
+    def test_changed_and_removed_files(self, indexing_env):
+        """Only changed files are re-uploaded and stale vectors are deleted"""
+        pdf_folder, index, _ = indexing_env
+
+        indexing.main(workers=1)
+        first_ids = upserted_ids(index)
+        index.reset_mock()
+
+        make_pdf(pdf_folder / "b-report.pdf", 1)
+        (pdf_folder / "c-report.pdf").unlink()
+        indexing.main(workers=1)
+
+        new_ids = upserted_ids(index)
+        deleted = [i for c in index.delete.call_args_list for i in c.kwargs["ids"]]
+        assert len(new_ids) == 1 and new_ids[0].startswith("b-report-")
+        assert sorted(deleted) == sorted(
+            i for i in first_ids if i.startswith(("b-report-", "c-report-"))
+        )
+
+    def test_deletes_in_upsert_sized_batches(self, indexing_env):
+        pdf_folder, index, _ = indexing_env
+        indexing.main(workers=1)
+        index.reset_mock()
+
+        (pdf_folder / "b-report.pdf").unlink()
+        indexing.main(workers=1, upsert_batch_size=1)
+        batches = [c.kwargs["ids"] for c in index.delete.call_args_list]
+        assert len(batches) == 3 and all(len(b) == 1 for b in batches)
+
+    def test_first_run_clears_vectors_outside_the_manifest(self, indexing_env):
+        """Vectors in the index before it had a manifest are deleted, not served twice"""
+        _, index, _ = indexing_env
+        index.describe_index_stats.return_value = {"total_vector_count": 6}
+
+        indexing.main(workers=1)
+        index.delete.assert_called_once_with(delete_all=True)
+        assert len(upserted_ids(index)) == 6
+
+        index.reset_mock()
+        make_pdf(indexing_env[0] / "b-report.pdf", 1)
+        indexing.main(workers=1)
+        assert call(delete_all=True) not in index.delete.call_args_list
+
+    def test_first_run_into_an_empty_index_deletes_nothing(self, indexing_env):
+        _, index, _ = indexing_env
+        indexing.main(workers=1)
+        index.delete.assert_not_called()
+
+    def test_writes_filterable_metadata(self, tmp_path, indexing_env):
+        """Chunks carry a numeric date and the metadata index counts them per document"""
+        from backend.filters import MetadataIndex
+        from backend.schemas import SearchFilters
+        _, index, _ = indexing_env
+
+        indexing.main(workers=1)
+        metadata = [v["metadata"] for c in index.upsert.call_args_list for v in c.args[0]]
+        assert {m.get("date_int") for m in metadata} == {20241001, None}
+
+        metadata_index = MetadataIndex.load(str(tmp_path / "metadata_index.json"))
+        assert metadata_index.count(None) == 6
+        assert metadata_index.count(SearchFilters(industries=["energy"])) == 2
+        assert metadata_index.count(SearchFilters(country_codes=["US"], date_from="2025-01-01")) == 0
+
+    def test_vectors_carry_ids_and_filter_fields_only(self, tmp_path, indexing_env):
+        """Chunk text and full metadata go to the docstore, and stale chunks leave it"""
+        from backend.docstore import FILTER_FIELDS, DocStore
+        pdf_folder, index, _ = indexing_env
+
+        indexing.main(workers=1)
+        vectors = [v for c in index.upsert.call_args_list for v in c.args[0]]
+        assert all(set(v["metadata"]) <= set(FILTER_FIELDS) for v in vectors)
+
+        docstore = DocStore(str(tmp_path / "docstore.sqlite"))
+        stored = docstore.get_many([v["id"] for v in vectors])
+        assert len(stored) == len(vectors) == 6
+        text, metadata = stored[vectors[0]["id"]]
+        assert text
+        assert metadata["title"] == "Report A"
+
+        (pdf_folder / "b-report.pdf").unlink()
+        indexing.main(workers=1)
+        assert len(docstore) == 6 - sum(v["id"].startswith("b-report-") for v in vectors)
+
+    def test_stale_chunks_outlive_the_publish(self, tmp_path, indexing_env):
+        """Workers on the previous version can still read its chunks until the new one is published"""
+        from backend.docstore import DocStore
+        pdf_folder, _, _ = indexing_env
+        docstore = DocStore(str(tmp_path / "docstore.sqlite"))
+
+        indexing.main(workers=1)
+        (pdf_folder / "b-report.pdf").unlink()
+        sizes = []
+        with patch.object(indexing, "publish_artifacts", side_effect=lambda *a, **k: sizes.append(len(docstore))):
+            indexing.main(workers=1)
+        assert sizes == [6]
+        assert len(docstore) < 6
+
+    def test_writes_stage_metrics(self, tmp_path, indexing_env):
+        """A run can export its stage timings as a Prometheus textfile"""
+        metrics_path = tmp_path / "index.prom"
+        with patch.object(indexing, "INDEX_METRICS_PATH", str(metrics_path)):
+            indexing.main(workers=1)
+
+        text = metrics_path.read_text()
+        for stage in ("index_parse", "index_embed", "index_bm25_encode", "index_upsert", "index_upload"):
+            assert f'rag_stage_duration_seconds_count{{stage="{stage}"}}' in text
+
+    def test_publishes_after_the_manifest(self, tmp_path, indexing_env):
+        """The publish marker servers reload on is written last, with the corpus key"""
+        indexing.main(workers=1)
+
+        published = json.loads((tmp_path / "published.json").read_text())
+        assert published["corpus_key"]
+        for name in ("manifest.json", "bm25_encoder.bin", "metadata_index.json"):
+            assert (tmp_path / name).stat().st_mtime_ns <= (tmp_path / "published.json").stat().st_mtime_ns
+
+    def test_resumes_after_failed_upsert(self, indexing_env):
+        """A re-run after a failure only uploads the batches that were not committed"""
+        _, index, _ = indexing_env
+        calls = []
+
+        def fail_after_first(vectors, **kwargs):
+            # Every call after the first fails, however many batches were in flight
+            calls.append(1)
+            if len(calls) > 1:
+                raise ConnectionError("connection reset")
+
+        index.upsert.side_effect = fail_after_first
+
+        with pytest.raises(ConnectionError):
+            indexing.main(workers=1, embed_batch_size=2, concurrency=1)
+        first_ids = upserted_ids(index)[:2]
+        index.reset_mock()
+        index.upsert.side_effect = None
+
+        indexing.main(workers=1, embed_batch_size=2, concurrency=1)
+        resumed_ids = upserted_ids(index)
+        assert len(resumed_ids) == 4
+        assert sorted(first_ids + resumed_ids) == sorted(set(first_ids + resumed_ids))
+
+    def test_retries_rate_limited_upsert(self, indexing_env):
+        """Rate-limit errors are retried instead of failing the run"""
+        _, index, _ = indexing_env
+        index.upsert.side_effect = [RuntimeError("429 Too Many Requests"), None, None, None]
+
+        with patch("backend.pipeline.time.sleep") as sleep:
+            indexing.main(workers=1, embed_batch_size=2, concurrency=2)
+
+        sleep.assert_called_once()
+        assert len(set(upserted_ids(index))) == 6
+
+
+class TestShardedBM25:
+
+    def encoder(self, tmp_path):
+        return FastBM25Encoder().load(str(tmp_path / "bm25_encoder.bin"))
+
+    def test_in_place_update_matches_full_fit(self, tmp_path, indexing_env):
+        """Adding and removing files updates the statistics to those of a full refit"""
+        pdf_folder, index, _ = indexing_env
+        indexing.main(workers=1)
+
+        make_pdf(pdf_folder / "d-report.pdf", 2)
+        (pdf_folder / "c-report.pdf").unlink()
+        indexing.main(workers=1)
+        updated = self.encoder(tmp_path)
+
+        (tmp_path / "bm25_encoder.bin").unlink()
+        indexing.main(workers=1, full=True)
+        refitted = self.encoder(tmp_path)
+
+        assert updated.doc_freq == refitted.doc_freq
+        assert (updated.n_docs, updated.avgdl) == (refitted.n_docs, refitted.avgdl)
+        shards = sorted(p.name.split("-")[0] for p in (tmp_path / "shards").iterdir())
+        assert shards == ["a", "b", "d"]
+
+    def test_drift_reencodes_every_file(self, tmp_path, indexing_env):
+        """Unchanged files are only re-uploaded once the average length drifts"""
+        pdf_folder, index, _ = indexing_env
+        indexing.main(workers=1)
+        index.reset_mock()
+
+        long_pdf = pymupdf.open()
+        long_pdf.new_page().insert_text((72, 72), " ".join(["inflation outlook"] * 40))
+        long_pdf.save(str(pdf_folder / "d-report.pdf"))
+        long_pdf.close()
+
+        with patch.object(indexing, "BM25_DRIFT_THRESHOLD", 10.0):
+            indexing.main(workers=1)
+        assert [i.split("-")[0] for i in upserted_ids(index)] == ["d"]
+        assert self.encoder(tmp_path).doc_avgdl is not None
+        index.reset_mock()
+
+        make_pdf(pdf_folder / "e-report.pdf", 1)
+        with patch.object(indexing, "BM25_DRIFT_THRESHOLD", 0.0):
+            indexing.main(workers=1)
+        assert len(upserted_ids(index)) == 8
+        assert self.encoder(tmp_path).doc_avgdl is None
@@ -0,0 +1,148 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_community.retrievers import PineconeHybridSearchRetriever
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.local_index import LocalHybridIndex
+from conftest import FakeSparseEncoder
+
+
+def make_vectors():
+    return [
+        {
+            "id": "a",
+            "values": [1.0, 0.0, 0.0],
+            "sparse_values": {"indices": [10, 20], "values": [0.5, 0.5]},
+            "metadata": {"title": "A", "industries": ["energy", "finance"], "year": 2024},
+        },
+        {
+            "id": "b",
+            "values": [0.0, 1.0, 0.0],
+            "sparse_values": {"indices": [20, 30], "values": [1.0, 0.2]},
+            "metadata": {"title": "B", "industries": ["retail"], "year": 2025},
+        },
+        {
+            "id": "c",
+            "values": [0.5, 0.5, 0.0],
+            "sparse_values": {"indices": [], "values": []},
+            "metadata": {"title": "C", "industries": ["energy"], "year": 2025},
+        },
+    ]
+
+
+@pytest.fixture
+def index():
+    index = LocalHybridIndex()
+    index.upsert(make_vectors())
+    return index
+
+
+class TestLocalHybridIndex:
+
+    def test_hybrid_scores_match_dot_products(self, index):
+        """Scores are dense dot product plus sparse dot product"""
+        dense = [0.2, 0.4, 0.0]
+        sparse = {"indices": [20, 30], "values": [1.0, 1.0]}
+        result = index.query(vector=dense, sparse_vector=sparse, top_k=3)
+
+        expected = {
+            "a": 0.2 + 0.5,
+            "b": 0.4 + 1.0 + 0.2,
+            "c": 0.1 + 0.2,
+        }
+        assert [m["id"] for m in result["matches"]] == ["b", "a", "c"]
+        for match in result["matches"]:
+            assert match["score"] == pytest.approx(expected[match["id"]])
+
+    def test_metadata_filters(self, index):
+        dense = [1.0, 1.0, 1.0]
+
+        def ids(filter):
+            return sorted(m["id"] for m in index.query(vector=dense, top_k=10, filter=filter)["matches"])
+
+        assert ids({"industries": {"$in": ["energy"]}}) == ["a", "c"]
+        assert ids({"industries": "retail"}) == ["b"]
+        assert ids({"year": {"$gte": 2025}}) == ["b", "c"]
+        assert ids({"$and": [{"industries": {"$in": ["energy"]}}, {"year": {"$lt": 2025}}]}) == ["a"]
+        assert ids({"$or": [{"title": "A"}, {"title": {"$eq": "B"}}]}) == ["a", "b"]
+        assert ids({"industries": {"$nin": ["energy"]}}) == ["b"]
+
+    def test_upsert_replaces_and_delete_removes(self, index):
+        index.upsert([{"id": "a", "values": [0.0, 0.0, 1.0], "metadata": {"title": "A2"}}])
+        index.delete(ids=["b"])
+
+        result = index.query(vector=[0.0, 0.0, 1.0], top_k=10, include_metadata=True)
+        assert [m["id"] for m in result["matches"]] == ["a", "c"]
+        assert result["matches"][0]["metadata"] == {"title": "A2"}
+        assert index.describe_index_stats()["total_vector_count"] == 2
+
+    def test_save_and_open_memory_mapped(self, index, tmp_path):
+        index.delete(ids=["c"])
+        index.save(str(tmp_path / "idx"))
+
+        reopened = LocalHybridIndex.open(str(tmp_path / "idx"))
+        assert isinstance(reopened._dense, np.memmap)
+
+        dense = [0.2, 0.4, 0.0]
+        sparse = {"indices": [20], "values": [1.0]}
+        original = index.query(vector=dense, sparse_vector=sparse, top_k=5, include_metadata=True)
+        loaded = reopened.query(vector=dense, sparse_vector=sparse, top_k=5, include_metadata=True)
+        assert loaded == original
+
+    def test_opened_index_maps_rows_and_postings(self, index, tmp_path):
+        """IDs, metadata and postings are read from disk, and the first write copies them"""
+        index.save(str(tmp_path / "idx"))
+        reopened = LocalHybridIndex.open(str(tmp_path / "idx"))
+        assert all(isinstance(a, np.memmap) for a in reopened._postings)
+        assert reopened._rows is None
+
+        result = reopened.query(
+            vector=[0.0, 0.0, 1.0], sparse_vector={"indices": [20], "values": [1.0]},
+            top_k=5, include_metadata=True, filter={"industries": {"$in": ["energy"]}},
+        )
+        assert [m["id"] for m in result["matches"]] == ["a", "c"]
+        assert result["matches"][0]["metadata"]["industries"] == ["energy", "finance"]
+
+        reopened.upsert([{"id": "d", "values": [0.0, 0.0, 1.0], "metadata": {"title": "D"}}])
+        reopened.delete(ids=["a"])
+        result = reopened.query(vector=[0.0, 0.0, 1.0], top_k=5, include_metadata=True)
+        assert [m["id"] for m in result["matches"]] == ["d", "b", "c"]
+
+    def test_save_publishes_a_new_version(self, index, tmp_path):
+        """A reader of the previous version keeps working, and only the current version is kept"""
+        root = tmp_path / "idx"
+        index.save(str(root))
+        reader = LocalHybridIndex.open(str(root))
+
+        index.delete(ids=["b"])
+        index.save(str(root))
+
+        assert [p.name for p in root.iterdir() if p.is_dir()] == [(root / "current").read_text()]
+        assert [m["id"] for m in reader.query(vector=[0.0, 1.0, 0.0], top_k=1)["matches"]] == ["b"]
+        reopened = LocalHybridIndex.open(str(root))
+        assert reopened.describe_index_stats()["total_vector_count"] == 2
+
+    def test_works_with_hybrid_retriever(self):
+        """The LangChain hybrid retriever can index into and query the local engine"""
+        retriever = PineconeHybridSearchRetriever(
+            embeddings=DeterministicFakeEmbedding(size=16),
+            sparse_encoder=FakeSparseEncoder(),
+            index=LocalHybridIndex(),
+            top_k=1,
+        )
+        retriever.add_texts(
+            ["inflation rose in europe", "oil prices fell sharply"],
+            ids=["x", "y"],
+            metadatas=[{"title": "Europe"}, {"title": "Oil"}],
+        )
+
+        docs = retriever.invoke("oil prices fell sharply")
+        assert docs[0].page_content == "oil prices fell sharply"
+        assert docs[0].metadata["title"] == "Oil"
@@ -0,0 +1,60 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import metrics
+from backend.pipeline import run_batches
+
+
+class TestMetrics:
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram("test_latency_seconds", "Test latency.", labelnames=("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, stage="embed")
+
+        lines = histogram.render()
+        assert lines[:2] == ["# HELP test_latency_seconds Test latency.", "# TYPE test_latency_seconds histogram"]
+        assert 'test_latency_seconds_bucket{stage="embed",le="0.1"} 1' in lines
+        assert 'test_latency_seconds_bucket{stage="embed",le="1"} 3' in lines
+        assert 'test_latency_seconds_bucket{stage="embed",le="+Inf"} 4' in lines
+        assert 'test_latency_seconds_count{stage="embed"} 4' in lines
+        assert histogram.count(stage="embed") == 4
+
+    def test_counter_and_registry(self):
+        counter = metrics.Counter("test_requests_total", "Test requests.", labelnames=("status",))
+        counter.inc(status="ok")
+        counter.inc(2, status="ok")
+
+        assert counter.value(status="ok") == 3
+        assert 'test_requests_total{status="ok"} 3' in metrics.render()
+
+    def test_spans_add_up_per_request(self):
+        """Spans in tasks started by a request land in that request's breakdown only"""
+        async def request(n):
+            timings = metrics.start_timings()
+            await asyncio.gather(*(metrics.timed("test_stage", asyncio.sleep(0.01)) for _ in range(n)))
+            return timings
+
+        async def run():
+            return await asyncio.gather(request(1), request(3))
+
+        before = metrics.STAGE_SECONDS.count(stage="test_stage")
+        one, three = asyncio.run(run())
+
+        assert 0.01 <= one["test_stage"] < three["test_stage"]
+        assert metrics.STAGE_SECONDS.count(stage="test_stage") == before + 4
+
+    def test_batches_run_in_callers_timings(self):
+        timings = metrics.start_timings()
+
+        def process(batch):
+            with metrics.span("test_batch"):
+                pass
+
+        run_batches(range(4), process, concurrency=2)
+        assert "test_batch" in timings
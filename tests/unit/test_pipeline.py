@@ -0,0 +1,141 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.pipeline import AdaptiveLimiter, Checkpoint, Spool, batched, run_batches
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class TestAdaptiveLimiter:
+
+    def test_halves_on_rate_limit_and_recovers(self):
+        """The limit is halved per rate-limit error and grows back additively"""
+        limiter = AdaptiveLimiter(8)
+        responses = iter([RateLimited(), RateLimited(), "ok"])
+
+        def flaky():
+            response = next(responses)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with patch("backend.pipeline.time.sleep") as sleep:
+            assert limiter.call(flaky) == "ok"
+        assert sleep.call_count == 2
+        assert limiter.throttled == 2
+        assert 2 <= limiter.limit < 3
+
+        # About one extra slot per round of `limit` successful calls
+        for _ in range(40):
+            limiter.call(lambda: None)
+        assert limiter.limit == 8
+
+    def test_other_errors_are_not_retried(self):
+        limiter = AdaptiveLimiter(2)
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            limiter.call(broken)
+        assert len(calls) == 1 and limiter.limit == 2
+
+    def test_gives_up_after_max_retries(self):
+        limiter = AdaptiveLimiter(2, max_retries=2)
+        with patch("backend.pipeline.time.sleep"), pytest.raises(RateLimited):
+            limiter.call(lambda: (_ for _ in ()).throw(RateLimited()))
+        assert limiter.throttled == 3
+
+
+class TestCheckpoint:
+
+    def test_resumes_same_run_only(self, tmp_path):
+        path = str(tmp_path / "checkpoint.log")
+        checkpoint = Checkpoint(path, "run-a")
+        checkpoint.commit(0)
+        checkpoint.commit(2)
+        checkpoint.close()
+
+        assert Checkpoint(path, "run-a").committed == {0, 2}
+        assert Checkpoint(path, "run-b").committed == set()
+        assert Checkpoint(path, "run-a").committed == set()
+
+    def test_ignores_truncated_line(self, tmp_path):
+        path = tmp_path / "checkpoint.log"
+        path.write_text("run-a\n0\n1\n1")
+        assert Checkpoint(str(path), "run-a").committed == {0, 1}
+
+    def test_clear_removes_log(self, tmp_path):
+        path = tmp_path / "checkpoint.log"
+        Checkpoint(str(path), "run-a").clear()
+        assert not path.exists()
+
+
+class TestRunBatches:
+
+    def test_skips_committed_and_commits_processed(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "checkpoint.log"), "run")
+        checkpoint.commit(1)
+        seen = []
+
+        processed = run_batches(batched(range(7), 2), seen.append, concurrency=3, checkpoint=checkpoint)
+
+        assert processed == 3
+        assert sorted(seen) == [[0, 1], [4, 5], [6]]
+        assert checkpoint.committed == {0, 1, 2, 3}
+
+    def test_reads_batches_lazily(self):
+        """No more than 2 * concurrency batches are pulled ahead of processing"""
+        pulled = []
+        lock = threading.Lock()
+        max_ahead = []
+        done = []
+
+        def batches():
+            for number in range(20):
+                pulled.append(number)
+                yield number
+
+        def process(number):
+            time.sleep(0.001)
+            with lock:
+                done.append(number)
+                max_ahead.append(len(pulled) - len(done))
+
+        run_batches(batches(), process, concurrency=2)
+        assert len(done) == 20
+        assert max(max_ahead) <= 4
+
+    def test_failure_stops_submission(self):
+        def process(number):
+            if number == 1:
+                raise ConnectionError("reset")
+
+        seen = []
+        with pytest.raises(ConnectionError):
+            run_batches((seen.append(n) or n for n in range(100)), process, concurrency=1)
+        assert len(seen) < 100
+
+
+class TestSpool:
+
+    def test_round_trip_and_cleanup(self, tmp_path):
+        with Spool(str(tmp_path)) as spool:
+            spool.write({"id": "a", "text": "x"})
+            spool.write({"id": "b", "text": "y"})
+            assert [r["id"] for r in spool] == ["a", "b"]
+            assert [r["id"] for r in spool] == ["a", "b"]
+        assert list(tmp_path.iterdir()) == []
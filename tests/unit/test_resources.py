@@ -0,0 +1,104 @@
+import os
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import resources
+from backend.manifest import publish_artifacts
+
+
+@pytest.fixture
+def fake_stack(tmp_path):
+    """Patch the network clients and point the registry at a temp BM25 file"""
+    bm25_path = tmp_path / "bm25_encoder.json"
+    bm25_path.write_text("{}")
+
+    with patch.object(resources, "BM25_ENCODER_PATH", str(bm25_path)), \
+         patch.object(resources, "PUBLISHED_PATH", str(tmp_path / "published.json")), \
+         patch.object(resources, "_load_bm25_encoder", side_effect=lambda p: MagicMock()) as load_bm25, \
+         patch.object(resources, "get_embedding_model", side_effect=lambda: MagicMock()) as get_embedding, \
+         patch.object(resources, "get_index", side_effect=lambda: MagicMock()) as get_index, \
+         patch.object(resources, "AsyncHybridSearchRetriever", side_effect=lambda **kw: MagicMock()):
+        resources.clear_resources()
+        yield bm25_path, load_bm25, get_embedding, get_index
+        resources.clear_resources()
+
+
+class TestRetrievalResources:
+
+    def test_built_once_and_shared(self, fake_stack):
+        """Repeated lookups reuse the same clients"""
+        _, load_bm25, get_embedding, get_index = fake_stack
+
+        first = resources.get_resources()
+        second = resources.get_resources()
+
+        assert first is second
+        assert load_bm25.call_count == 1
+        assert get_embedding.call_count == 1
+        assert get_index.call_count == 1
+        assert first.warmup_seconds >= 0
+
+    def test_bm25_change_reloads_encoder_only(self, fake_stack):
+        """A new BM25 file is picked up without rebuilding the clients"""
+        bm25_path, load_bm25, get_embedding, get_index = fake_stack
+
+        first = resources.get_resources()
+        stat = bm25_path.stat()
+        os.utime(bm25_path, (stat.st_atime, stat.st_mtime + 10))
+        second = resources.get_resources()
+
+        assert second is not first
+        assert second.version > first.version
+        assert second.index is first.index
+        assert second.embedding_model is first.embedding_model
+        assert load_bm25.call_count == 2
+        assert get_index.call_count == 1
+
+    def test_full_reload_rebuilds_clients(self, fake_stack):
+        """reload_resources() rebuilds everything on demand"""
+        _, _, get_embedding, get_index = fake_stack
+
+        first = resources.get_resources()
+        second = resources.reload_resources()
+
+        assert second.index is not first.index
+        assert get_embedding.call_count == 2
+        assert get_index.call_count == 2
+
+    def test_publish_marker_gates_reloads(self, fake_stack, tmp_path):
+        """Once the indexer publishes, only a new publish triggers a reload"""
+        bm25_path, load_bm25, _, _ = fake_stack
+        publish_artifacts(str(tmp_path / "published.json"))
+
+        first = resources.get_resources()
+        stat = bm25_path.stat()
+        os.utime(bm25_path, (stat.st_atime, stat.st_mtime + 10))
+        assert resources.get_resources() is first
+
+        published = tmp_path / "published.json"
+        stat = published.stat()
+        os.utime(published, (stat.st_atime, stat.st_mtime + 10))
+        assert resources.get_resources() is not first
+        assert load_bm25.call_count == 2
+
+    def test_reload_hands_over_async_index_clients(self, fake_stack):
+        """The same index keeps its asyncio clients; a new index closes the old ones"""
+        bm25_path, _, _, _ = fake_stack
+
+        first = resources.get_resources()
+        stat = bm25_path.stat()
+        os.utime(bm25_path, (stat.st_atime, stat.st_mtime + 10))
+        second = resources.get_resources()
+        second.retriever.adopt_async_clients.assert_called_once_with(first.retriever)
+        first.retriever.close_async_clients.assert_not_called()
+
+        third = resources.reload_resources()
+        second.retriever.close_async_clients.assert_called_once_with()
+        third.retriever.adopt_async_clients.assert_not_called()
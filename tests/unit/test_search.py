@@ -0,0 +1,121 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import resources
+from backend.answer_cache import AnswerCache
+from backend.hybrid_retriever import AsyncHybridSearchRetriever
+from conftest import CountingIndex, FakeSparseEncoder
+from main import app
+
+client = TestClient(app)
+
+TEXTS = [f"report {i} on oil prices and inflation" for i in range(11)] + ["retail sales were flat"]
+
+
+@pytest.fixture
+def index():
+    index = CountingIndex()
+    retriever = AsyncHybridSearchRetriever(
+        embeddings=DeterministicFakeEmbedding(size=16),
+        sparse_encoder=FakeSparseEncoder(),
+        index=index,
+        top_k=4,
+    )
+    retriever.add_texts(
+        TEXTS,
+        ids=[f"chunk-{i}" for i in range(len(TEXTS))],
+        metadatas=[
+            {"title": f"Outlook {i}", "page": i, "date": "2024-10-01", "industries": ["energy"], "uuid": "doc-1"}
+            for i in range(len(TEXTS))
+        ],
+    )
+    index.filters.clear()
+    resources._resources = resources.RetrievalResources(
+        bm25_encoder=retriever.sparse_encoder,
+        embedding_model=retriever.embeddings,
+        index=index,
+        retriever=retriever,
+        artifacts_mtime=resources._artifacts_mtime(),
+        warmup_seconds=0.0,
+        version=0,
+    )
+    with patch("backend.router.search_cache", AnswerCache()):
+        yield index
+    resources._resources = None
+
+
+class TestSearchEndpoint:
+
+    def test_returns_ranked_chunks(self, index):
+        response = client.post("/search", json={"query": "retail sales were flat", "top_k": 3, "alpha": 0.0})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [r["score"] for r in body["results"]] == sorted((r["score"] for r in body["results"]), reverse=True)
+        top = body["results"][0]
+        assert top["id"] == "chunk-11"
+        assert top["text"] == "retail sales were flat"
+        assert top["title"] == "Outlook 11"
+        assert top["page"] == 12
+        assert top["industries"] == ["energy"] and top["date"] == "2024-10-01"
+        assert top["document_id"] == "doc-1"
+        assert body["source"] == "search"
+
+    def test_pages_through_all_results(self, index):
+        ids, offset = [], 0
+        while offset is not None:
+            body = client.post("/search", json={"query": "oil prices", "top_k": 5, "offset": offset}).json()
+            ids += [r["id"] for r in body["results"]]
+            offset = body["next_offset"]
+
+        everything = client.post("/search", json={"query": "oil prices", "top_k": 20}).json()
+        assert ids == [r["id"] for r in everything["results"]]
+        assert len(ids) == len(TEXTS)
+
+    def test_repeated_requests_are_cached(self, index):
+        body = {"query": "oil prices", "top_k": 2}
+        first = client.post("/search", json=body).json()
+        second = client.post("/search", json={**body, "query": "Oil prices?"}).json()
+
+        assert index.queries == 1
+        assert second["source"] == "cache"
+        assert second["results"] == first["results"]
+
+        client.post("/search", json={**body, "alpha": 0.2})
+        client.post("/search", json={**body, "offset": 2})
+        assert index.queries == 3
+
+    def test_reload_clears_the_cache(self, index):
+        client.post("/search", json={"query": "oil prices"})
+        with patch("backend.router.reload_resources", return_value=resources._resources):
+            client.post("/reload")
+        client.post("/search", json={"query": "oil prices"})
+        assert index.queries == 2
+
+    def test_skips_the_query_when_no_chunk_matches(self, index):
+        resources._resources.metadata_index = MagicMock()
+        resources._resources.metadata_index.count.return_value = 0
+
+        body = client.post("/search", json={"query": "oil prices", "filters": {"industries": ["retail"]}}).json()
+        assert body["results"] == [] and body["next_offset"] is None
+        assert index.queries == 0
+
+    @pytest.mark.parametrize("body", [{"query": "oil", "top_k": 0}, {"query": "oil", "alpha": 1.5},
+                                      {"query": "oil", "offset": -1}, {"query": "oil", "offset": 1000, "top_k": 100},
+                                      {"query": "oil", "offset": 990, "top_k": 10}])
+    def test_rejects_invalid_parameters(self, body):
+        assert client.post("/search", json=body).status_code == 422
+
+    def test_accepts_the_deepest_page(self, index):
+        response = client.post("/search", json={"query": "oil prices", "offset": 899, "top_k": 100})
+        assert response.status_code == 200
+        assert response.json()["results"] == []
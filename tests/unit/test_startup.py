@@ -0,0 +1,45 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend import utils
+from benchmarks.bench_startup import HEAVY_MODULES
+
+
+class TestStartup:
+
+    @pytest.mark.parametrize("module", ["main", "backend.indexing"])
+    def test_entry_points_import_lazily(self, module):
+        """Importing an entry point loads none of the heavy client stacks"""
+        code = f"import json, sys, {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=project_root, stdin=subprocess.DEVNULL, capture_output=True, text=True, check=True,
+        ).stdout
+        assert json.loads(output) == []
+
+    def test_missing_key_fails_without_terminal(self, monkeypatch):
+        monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+        with patch.object(utils, "sys") as fake_sys, \
+             patch.object(utils.getpass, "getpass") as prompt:
+            fake_sys.stdin.isatty.return_value = False
+            with pytest.raises(RuntimeError, match="GOOGLE_API_KEY is not set"):
+                utils.validate_key("GOOGLE_API_KEY")
+        prompt.assert_not_called()
+
+    def test_missing_key_is_prompted_for_on_a_terminal(self, monkeypatch):
+        monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+        with patch.object(utils, "sys") as fake_sys, \
+             patch.object(utils.getpass, "getpass", return_value="secret"):
+            fake_sys.stdin.isatty.return_value = True
+            with patch.dict(utils.os.environ):
+                utils.validate_key("GOOGLE_API_KEY")
+                assert utils.os.environ["GOOGLE_API_KEY"] == "secret"
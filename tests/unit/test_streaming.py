@@ -0,0 +1,84 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.streaming import chunk_frame, coalesce_chunks, done_frame
+
+
+async def timed_chunks(schedule, state=None):
+    """Yield each chunk after its delay in seconds"""
+    try:
+        for delay, chunk in schedule:
+            await asyncio.sleep(delay)
+            yield chunk
+    finally:
+        if state is not None:
+            state["closed"] = True
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestFrames:
+
+    @pytest.mark.parametrize("chunk", ["Hello", '{"special": "chars"}', "\n\t\r", "naïve – ✓", ""])
+    def test_chunk_frame_matches_json_dumps(self, chunk):
+        assert chunk_frame(chunk) == f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
+
+    def test_done_frame(self):
+        assert json.loads(done_frame(error="boom")[6:]) == {"chunk": "", "done": True, "error": "boom"}
+
+
+class TestCoalesceChunks:
+
+    def test_first_chunk_then_time_windows(self):
+        """The first chunk goes out alone; later chunks are merged per window"""
+        schedule = [(0, "a"), (0, "b"), (0, "c"), (0.1, "d"), (0, "e")]
+        result = asyncio.run(collect(coalesce_chunks(timed_chunks(schedule), interval=0.05, max_chars=100)))
+        assert result == ["a", "bc", "de"]
+
+    def test_size_limit_flushes_early(self):
+        schedule = [(0, "x")] + [(0, "yy")] * 5
+        result = asyncio.run(collect(coalesce_chunks(timed_chunks(schedule), interval=10, max_chars=4)))
+        assert result == ["x", "yyyy", "yyyy", "yy"]
+
+    def test_zero_interval_passes_chunks_through(self):
+        schedule = [(0, "a"), (0, "b")]
+        assert asyncio.run(collect(coalesce_chunks(timed_chunks(schedule), interval=0))) == ["a", "b"]
+
+    def test_error_after_buffered_chunks(self):
+        async def failing():
+            yield "a"
+            yield "b"
+            raise ValueError("upstream failed")
+
+        async def run():
+            received = []
+            with pytest.raises(ValueError, match="upstream failed"):
+                async for chunk in coalesce_chunks(failing(), interval=10, max_chars=100):
+                    received.append(chunk)
+            return received
+
+        assert asyncio.run(run()) == ["a", "b"]
+
+    def test_stopping_early_cancels_upstream(self):
+        state = {"closed": False}
+        schedule = [(0.01, f"t{i}") for i in range(100)]
+
+        async def run():
+            stream = coalesce_chunks(timed_chunks(schedule, state), interval=0.05)
+            first = await stream.__anext__()
+            await stream.aclose()
+            await asyncio.sleep(0)
+            return first
+
+        assert asyncio.run(run()) == "t0"
+        assert state["closed"]
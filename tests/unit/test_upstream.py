@@ -0,0 +1,211 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.embeddings import QUERY_TASK_TYPE, aembed_queries
+from backend.upstream import (
+    MIN_HEDGE_SAMPLES,
+    CircuitBreaker,
+    CircuitOpenError,
+    UpstreamEmbeddings,
+    UpstreamIndex,
+    UpstreamPolicy,
+    is_retryable,
+)
+
+
+class Unavailable(Exception):
+    status_code = 503
+
+
+class FakeUpstream:
+    """
+    Answers after scripted latencies, or raises scripted errors, one entry
+    per request; once the script runs out it answers after ``default``.
+    """
+
+    def __init__(self, script=(), default=0.001):
+        self.script = list(script)
+        self.default = default
+        self.requests = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        step = self.script.pop(0) if self.script else self.default
+        self.requests += 1
+        try:
+            if isinstance(step, Exception):
+                raise step
+            await asyncio.sleep(step)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.requests
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def policy(**kwargs):
+    kwargs.setdefault("timeout", 1.0)
+    kwargs.setdefault("backoff", 0.001)
+    kwargs.setdefault("hedge_percentile", 0)
+    return UpstreamPolicy("test", **kwargs)
+
+
+def warm_up(p, latency=0.01):
+    for _ in range(MIN_HEDGE_SAMPLES):
+        p.latencies.add(latency)
+
+
+class TestUpstreamPolicy:
+
+    def test_hedge_answers_for_a_slow_request(self):
+        p = policy(hedge_percentile=95)
+        warm_up(p)
+        upstream = FakeUpstream([0.5, 0.001])
+
+        start = time.perf_counter()
+        assert asyncio.run(p.call(upstream)) == 2
+        assert time.perf_counter() - start < 0.2
+        assert upstream.requests == 2
+        assert upstream.cancelled == 1
+
+    def test_no_hedge_without_enough_samples(self):
+        p = policy(hedge_percentile=95)
+        upstream = FakeUpstream([0.05, 0.001])
+        asyncio.run(p.call(upstream))
+        assert upstream.requests == 1
+        assert len(p.latencies) == 1
+
+    def test_retries_transient_errors(self):
+        upstream = FakeUpstream([Unavailable("busy"), ConnectionError("reset")])
+        assert asyncio.run(policy(retries=2).call(upstream)) == 3
+
+    def test_other_errors_are_not_retried(self):
+        upstream = FakeUpstream([ValueError("bad request")])
+        with pytest.raises(ValueError):
+            asyncio.run(policy().call(upstream))
+        assert upstream.requests == 1
+
+    def test_deadline_covers_all_attempts(self):
+        upstream = FakeUpstream(default=1.0)
+        start = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            asyncio.run(policy(timeout=0.05, retries=3).call(upstream))
+        assert time.perf_counter() - start < 0.5
+        assert upstream.cancelled == upstream.requests
+
+    def test_breaker_opens_and_recovers(self):
+        clock = FakeClock()
+        p = policy(retries=0, breaker=CircuitBreaker(failures=2, cooldown=10, clock=clock))
+        failing = FakeUpstream([Unavailable("down")] * 2)
+
+        for _ in range(2):
+            with pytest.raises(Unavailable):
+                asyncio.run(p.call(failing))
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(p.call(failing))
+        assert failing.requests == 2
+
+        clock.now = 10
+        assert p.breaker.state == "half-open"
+        asyncio.run(p.call(failing))
+        assert p.breaker.state == "closed"
+
+    def test_cancelled_trial_frees_the_slot(self):
+        clock = FakeClock()
+        p = policy(retries=0, breaker=CircuitBreaker(failures=1, cooldown=10, clock=clock))
+        with pytest.raises(Unavailable):
+            asyncio.run(p.call(FakeUpstream([Unavailable("down")])))
+        clock.now = 10
+
+        async def cancel_trial():
+            task = asyncio.ensure_future(p.call(FakeUpstream(default=1.0)))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        assert asyncio.run(p.call(FakeUpstream())) == 1
+        assert p.breaker.state == "closed"
+
+    def test_failed_trial_reopens_the_circuit(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failures=1, cooldown=10, clock=clock)
+        breaker.failure()
+        clock.now = 10
+        assert breaker.allow() and not breaker.allow()
+        breaker.failure()
+        assert breaker.state == "open"
+
+    def test_retryable_errors(self):
+        wrapped = RuntimeError("Error embedding content")
+        wrapped.__cause__ = Unavailable("busy")
+        assert is_retryable(wrapped)
+        assert is_retryable(TimeoutError())
+        assert not is_retryable(ValueError("bad request"))
+
+
+class RecordingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    async def aembed_query(self, text, **kwargs):
+        self.calls.append(("query", text, kwargs))
+        return [1.0]
+
+    async def aembed_documents(self, texts, **kwargs):
+        self.calls.append(("documents", texts, kwargs))
+        return [[1.0] for _ in texts]
+
+
+class TestWrappers:
+
+    def test_embeddings_keep_batched_query_calls(self):
+        underlying = RecordingEmbeddings()
+        embeddings = UpstreamEmbeddings(underlying, policy())
+
+        assert asyncio.run(aembed_queries(embeddings, ["a", "b"])) == [[1.0], [1.0]]
+        asyncio.run(embeddings.aembed_query("c", output_dimensionality=768))
+        assert underlying.calls == [
+            ("documents", ["a", "b"], {"task_type": QUERY_TASK_TYPE}),
+            ("query", "c", {"output_dimensionality": 768}),
+        ]
+
+    def test_index_queries_are_retried(self):
+        class FlakyIndex:
+            queries = 0
+            closed = False
+
+            async def query(self, **kwargs):
+                self.queries += 1
+                if self.queries == 1:
+                    raise Unavailable("busy")
+                return {"matches": [], "top_k": kwargs["top_k"]}
+
+            async def close(self):
+                self.closed = True
+
+        index = UpstreamIndex(FlakyIndex(), policy())
+
+        async def run():
+            result = await index.query(top_k=3)
+            await index.close()
+            return result
+
+        assert asyncio.run(run()) == {"matches": [], "top_k": 3}
+        assert index.index.queries == 2 and index.index.closed